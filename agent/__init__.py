@@ -1,120 +1,336 @@
-import google.generativeai as genai
+import asyncio
 import json
 import time
-from config.logger import logger
-from secret import gemini_api_keys
+from config.logger import logger, sampled_logger
+from secret import gemini_api_keys, GEMINI_API_ENDPOINT, GEMINI_DEADLINE, GEMINI_HEDGE
+from agent.cache import comment_cache
+from agent.keypool import ApiKeyPool
+from agent.resilience import Backoff, EmptyResponse, Exhausted, Failure, HedgePolicy, RateLimited, classify
+from agent.schema import get_batch_schema
+from agent.streaming import CandidateStream
+from utils.metrics import metrics
+from utils.pacing import pacer
+
+# Shared by every caller so key health and quota usage are tracked across requests
+api_key_pool = ApiKeyPool(gemini_api_keys, api_endpoint=GEMINI_API_ENDPOINT)
+
+# Delay between retries of a call, and when a slow request gets a hedged copy on another key
+backoff = Backoff()
+hedge_policy = HedgePolicy(enabled=GEMINI_HEDGE)
+
+# Streamed responses still being read after their first candidate was returned
+_streams = set()
+
+def _response_text(response):
+    """Get the text of a GenerateContentResponse (or of a streamed chunk), empty if it has none"""
+    if not response.candidates:
+        return ""
+    return "".join(part.text for part in response.candidates[0].content.parts)
+
+def _count_tokens(key_state, response):
+    if response is not None and "usage_metadata" in response:
+        metrics.counter("agent_tokens_total", "Gemini tokens used",
+                        key=key_state.name).inc(response.usage_metadata.total_token_count)
+
+async def _finish_stream(candidates, schema, prompt, key_state, started, expires, cache_response):
+    """Read the rest of a streamed response in the background, cache it and release its key
+
+    The stream is cancelled if it is not complete by `expires` (the call's deadline).
+    """
+    latency = None
+    try:
+        data = await asyncio.wait_for(candidates.rest(), max(0, expires - time.monotonic()))
+        latency = time.monotonic() - started
+        # The last chunk carries the usage of the whole response
+        _count_tokens(key_state, candidates.last_chunk)
+        if data and cache_response:
+            comment_cache.put(schema, prompt, data)
+        logger.debug(f"Streamed response complete with {len(data)} candidate(s) after {latency:.2f}s")
+    except asyncio.TimeoutError:
+        logger.warning("Streamed response not complete by the call's deadline, cancelling it.")
+    except Exception as error:
+        logger.warning(f"Could not read the rest of a streamed response: {str(error)}")
+    finally:
+        if not candidates.done:
+            candidates.cancel()
+        api_key_pool.release(key_state, latency=latency)
+
+async def _generate(key_state, schema, prompt, stream, timeout):
+    """Send the request with the key's own client and parse the response
+
+    The client's own retries are turned off: a failed attempt is returned to
+    run_agent, which classifies it, backs off or switches keys, and feeds the key's
+    circuit breaker.
 
-def handle_error(error, current_api_key_index):
-    """Handle API errors and determine whether to retry or switch API keys
-    
-    Args:
-        error: The error that occurred
-        current_api_key_index: The index of the current API key
-        
     Returns:
-        int: The next index to try, or -1 if the error is not recoverable by switching keys,
-             or -2 for unknown errors.
+        tuple: (data or None if the response was empty, CandidateStream still being read when streaming)
     """
-    if isinstance(error, Exception):
-        if "429 Too Many Requests" in str(error):
-            logger.error(f"---GEMINI_API_KEY_{current_api_key_index + 1} limit exhausted, switching to the next API key...")
-            # Return the next index to try
-            return (current_api_key_index + 1) % len(gemini_api_keys)
-        elif "503 Service Unavailable" in str(error):
-            logger.error("Service is temporarily unavailable. Retrying after delay...")
-            time.sleep(5)  # Wait for 5 seconds before retrying
-            # Return the current index to retry with the same key after delay
-            return current_api_key_index
+    client = api_key_pool.get_client(key_state)
+    request = api_key_pool.build_request(schema, prompt)
+    if stream:
+        response = await client.stream_generate_content(request, retry=None, timeout=timeout)
+        items = schema.get("items", {})
+        candidates = CandidateStream(response, lambda item: matches_schema(items, item), text_of=_response_text)
+        try:
+            first = await candidates.first()
+        except BaseException:
+            # Failed, timed out or cancelled: don't leave the call open
+            candidates.cancel()
+            raise
+        if first is None:
+            candidates.cancel()
+            return None, None
+        return [first], candidates
+
+    response = await client.generate_content(request, retry=None, timeout=timeout)
+    _count_tokens(key_state, response)
+    text = _response_text(response)
+    if not text:
+        return None, None
+    return json.loads(text), None
+
+async def _request(key_state, schema, prompt, stream, timeout, attempt, cache_response):
+    """Send one request with a key reserved from the pool, then release the key
+
+    Returns:
+        The parsed response data, or a Failure
+    """
+    started = time.monotonic()
+    latency = None
+    failure = None
+    streaming = False  # The key is released by _finish_stream once the stream is read
+
+    try:
+        data, candidates = await asyncio.wait_for(_generate(key_state, schema, prompt, stream, timeout), timeout)
+        latency = time.monotonic() - started
+
+        if data is None:
+            failure = EmptyResponse(f"No or empty response received from API with key index {key_state.index}.")
+            logger.warning(str(failure))
+            return failure
+
+        if candidates is not None:
+            # Use the first candidate now and keep reading the others in the background
+            logger.info(f"First candidate streamed with key index {key_state.index} after {latency:.2f}s")
+            metrics.histogram("agent_first_candidate_seconds", "Time until the first valid candidate of a streamed response",
+                              key=key_state.name).observe(latency)
+            streaming = True
+            task = asyncio.ensure_future(_finish_stream(candidates, schema, prompt, key_state, started,
+                                                         started + timeout, cache_response))
+            _streams.add(task)
+            task.add_done_callback(_streams.discard)
         else:
-            logger.error(f"Unhandled error during API call: {str(error)}")
-            # Indicate an error occurred that isn't related to key limits or temporary unavailability
-            return -1
-    else:
-        logger.error(f"An unknown error occurred: {error}")
-        # Indicate an unknown error
-        return -2
-
-async def run_agent(schema, prompt):
+            logger.info(f"API call successful with key index {key_state.index}")
+            if cache_response:
+                comment_cache.put(schema, prompt, data)
+        hedge_policy.observe("stream" if stream else "plain", latency)
+        return data
+
+    except Exception as error:
+        failure = classify(error)
+        if isinstance(failure, RateLimited):
+            metrics.counter("agent_rate_limited_total", "Gemini requests rejected with a 429", key=key_state.name).inc()
+            logger.error(f"---{key_state.name} limit exhausted, switching to the next API key...")
+        else:
+            logger.error(f"{type(failure).__name__} error with key index {key_state.index}: {failure}")
+        return failure
+    finally:
+        if failure is not None:
+            outcome = failure.label
+        else:
+            outcome = "ok" if latency is not None else "cancelled"
+        if not streaming:
+            api_key_pool.release(key_state, latency=latency, rate_limited=isinstance(failure, RateLimited),
+                                 failed=failure is not None and failure.trips_breaker)
+        metrics.histogram("agent_request_seconds", "Duration of each Gemini request attempt", key=key_state.name,
+                          attempt=attempt + 1, outcome=outcome).observe(time.monotonic() - started)
+
+async def _attempt(schema, prompt, stream, timeout, attempt, tried, switch_key, cache_response):
+    """Run one attempt, with a hedged copy on another key if it is slower than usual
+
+    Args:
+        tried: Indexes of the keys used by earlier attempts (updated)
+        switch_key: Whether to prefer a key not in `tried`
+
+    Returns:
+        The parsed response data, a Failure, or None if no key is available
+    """
+    key_state = api_key_pool.acquire(exclude=tried) if switch_key else None
+    if key_state is None:
+        key_state = api_key_pool.acquire()
+    if key_state is None:
+        return None
+
+    tried.add(key_state.index)
+    sampled_logger.info(f"Attempting API call with key index {key_state.index}")
+    tasks = [asyncio.ensure_future(_request(key_state, schema, prompt, stream, timeout, attempt, cache_response))]
+    try:
+        hedge_delay = hedge_policy.delay("stream" if stream else "plain")
+        if hedge_delay is not None and hedge_delay < timeout:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            hedge_key = api_key_pool.acquire(exclude=(key_state.index,)) if not done else None
+            if hedge_key is not None:
+                logger.info(f"Request with key index {key_state.index} slower than p95 ({hedge_delay:.1f}s), "
+                            f"hedging with key index {hedge_key.index}")
+                metrics.counter("agent_hedged_total", "Gemini requests hedged on a second key").inc()
+                tried.add(hedge_key.index)
+                tasks.append(asyncio.ensure_future(_request(hedge_key, schema, prompt, stream, timeout - hedge_delay,
+                                                            attempt, cache_response)))
+
+        # First success wins; if every copy fails, report the last failure
+        result = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                result = task.result()
+                if not isinstance(result, Failure):
+                    if task is not tasks[0]:
+                        metrics.counter("agent_hedge_wins_total", "Hedged Gemini requests that answered first").inc()
+                    return result
+        return result
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+async def run_agent(schema, prompt, use_cache=True, stream=False, deadline=GEMINI_DEADLINE, cache_response=True):
     """Run the AI agent to generate content based on the provided schema and prompt
     
+    Failed attempts are retried until the deadline: on another key after a 429, a
+    timeout or a rejected key, otherwise after an exponential backoff with jitter.
+    Keys that keep failing are skipped by their circuit breaker, and an attempt slower
+    than the observed p95 latency gets a hedged copy on another key.
+    
     Args:
         schema: The schema defining the structure of the response
         prompt: The prompt to send to the AI model
+        use_cache: Whether a cached response for the same prompt may be returned.
+                   Fresh responses are cached either way unless cache_response is False.
+        stream: For array schemas, stream the response and return as soon as the first
+                schema-valid item has arrived, as a one-item list. The other items keep
+                streaming in the background and the full list is cached once complete.
+        deadline: Seconds the whole call, retries included, may take
+        cache_response: Whether to cache the fresh response, off for one-off prompts
+                        that will never be sent again
         
     Returns:
-        The generated content or an error message
+        The generated content, or a Failure (see agent.resilience) describing why there is none
     """
-    current_api_key_index = 0
+    if use_cache:
+        cached = comment_cache.get(schema, prompt)
+        if cached is not None:
+            logger.info("Using cached response for an identical prompt.")
+            return cached
+
+    stream = stream and schema.get("type") == "ARRAY"
+    expires = time.monotonic() + deadline
     max_retries = len(gemini_api_keys)  # Try each key once
+    tried = set()
+    failure = None
 
     for attempt in range(max_retries):
-        gemini_api_key = gemini_api_keys[current_api_key_index]
+        timeout = expires - time.monotonic()
+        if timeout <= 0:
+            logger.error(f"Deadline of {deadline:g}s reached, stopping retries.")
+            return Exhausted(f"No response within {deadline:g} seconds.", failure)
+        if attempt > 0:
+            metrics.counter("agent_retries_total", "Gemini requests retried after a failed attempt").inc()
 
-        if not gemini_api_key or gemini_api_key.startswith("API_KEY_"):  # Check for placeholder keys
-            logger.warning(f"Skipping invalid or placeholder API key at index {current_api_key_index}")
-            current_api_key_index = (current_api_key_index + 1) % len(gemini_api_keys)
-            continue  # Try the next key
+        result = await _attempt(schema, prompt, stream, timeout, attempt, tried,
+                                failure is not None and failure.switch_key, cache_response)
+        if result is None:
+            logger.error("No API key available: all keys are invalid, cooling down, failing or out of quota.")
+            return Exhausted("No API key available.", failure)
+        if not isinstance(result, Failure):
+            return result
 
-        logger.info(f"Attempting API call with key index {current_api_key_index}")
-        
-        # Configure the generative AI
-        genai.configure(api_key=gemini_api_key)
-        
-        # Set up the model
-        generation_config = {
-            "response_mime_type": "application/json",
-            "response_schema": schema,
-        }
-        
-        model = genai.GenerativeModel(
-            model_name="gemini-1.5-flash",
-            generation_config=generation_config
-        )
-
-        try:
-            # Generate content
-            response = await model.generate_content_async(prompt)
-
-            if not response or not response.text:
-                logger.warning(f"No response or empty response received from API with key index {current_api_key_index}.")
-                # Try the next key if available, similar to 503
-                next_index = handle_error(Exception("503 Service Unavailable"), current_api_key_index)
-                if next_index == current_api_key_index:  # 503 retry indication
-                    logger.info("Retrying with the same key after delay due to potential service issue.")
-                    # The delay is handled within handle_error
-                    continue  # Retry the loop with the same index
-                elif next_index >= 0:
-                    current_api_key_index = next_index
-                    continue  # Try next key
-                else:
-                    logger.error("Failed to get a valid response and error handling did not provide a retry index.")
-                    return "Service unavailable or failed after retries."
-
-            # Parse the response
-            response_text = response.text
-            data = json.loads(response_text)
-            logger.info(f"API call successful with key index {current_api_key_index}")
-            return data  # Success
-
-        except Exception as error:
-            next_index = handle_error(error, current_api_key_index)
-
-            if next_index >= 0 and next_index != current_api_key_index:
-                # Rate limit (429) or other error indicating key switch
-                current_api_key_index = next_index
-                logger.info(f"Switching to API key index {current_api_key_index}")
-            elif next_index == current_api_key_index:
-                # Service unavailable (503), retry with the same key after delay
-                logger.info(f"Retrying with API key index {current_api_key_index} after delay.")
-                # Delay is handled in handle_error, continue loop to retry
-            elif next_index == -1:
-                # Unhandled error, stop retrying
-                logger.error("Unhandled error occurred, stopping retries.")
-                return f"An error occurred: {str(error)}"
-            elif next_index == -2:
-                # Unknown error, stop retrying
-                logger.error("An unknown error occurred, stopping retries.")
-                return "An unknown error occurred."
+        failure = result
+        if not failure.retryable:
+            logger.error("Unrecoverable error, stopping retries.")
+            return failure
+        if failure.switch_key:
+            logger.info("Switching to the next healthiest API key")
+        elif attempt + 1 < max_retries:
+            delay = min(backoff.delay(attempt), expires - time.monotonic())
+            if delay > 0:
+                sampled_logger.info(f"Retrying in {delay:.1f}s after {failure.label} response (attempt {attempt + 1}/{max_retries}).")
+                await pacer.sleep(delay)
 
     logger.error("All API keys exhausted or failed.")
-    return "Failed to generate response after trying all API keys."
\ No newline at end of file
+    return Exhausted("Failed to generate response after trying all API keys.", failure)
+
+def matches_schema(schema, data):
+    """Shallow check that a parsed response has the shape described by the schema
+    
+    Arrays must be non-empty and object items must contain their required properties.
+    """
+    if schema.get("type") == "ARRAY":
+        if not isinstance(data, list) or len(data) == 0:
+            return False
+        items = schema.get("items", {})
+        return all(matches_schema(items, item) for item in data)
+    if schema.get("type") == "OBJECT":
+        return isinstance(data, dict) and all(key in data for key in schema.get("required", []))
+    return data is not None
+
+async def run_agent_batch(schema, prompts):
+    """Run the AI agent for several prompts with a single API request
+    
+    Prompts with a cached response are answered from the cache; the others are
+    packed into one request whose response is keyed by prompt, then split back
+    into one result per prompt. Prompts whose entry is missing or malformed are
+    retried with individual run_agent calls. If the batch request itself fails
+    (after run_agent's retries), its Failure is the result of every pending prompt.
+    
+    Args:
+        schema: The schema of a single prompt's response
+        prompts: List of prompts to send to the AI model
+        
+    Returns:
+        list: The generated content, or a Failure (see agent.resilience), for each prompt in order
+    """
+    results = [comment_cache.get(schema, prompt) for prompt in prompts]
+    pending = [index for index, result in enumerate(results) if result is None]
+    if len(pending) == 0:
+        return results
+    if len(pending) == 1:
+        results[pending[0]] = await run_agent(schema, prompts[pending[0]], use_cache=False)
+        return results
+    
+    keys = [f"post_{index}" for index in range(len(pending))]
+    batch_prompt = (
+        "Each entry below is a separate request about a different Instagram post. "
+        "Answer every request independently and return an object with one property per "
+        "entry id, holding the response for that entry only.\n"
+    )
+    for key, index in zip(keys, pending):
+        batch_prompt += f"\n[{key}]\n{prompts[index]}\n"
+    
+    logger.info(f"Generating responses for {len(pending)} prompts in one request...")
+    # The batch prompt is never sent twice, so only its entries are cached
+    data = await run_agent(get_batch_schema(schema, keys), batch_prompt, use_cache=False, cache_response=False)
+    if isinstance(data, Failure):
+        # Either unrecoverable or out of keys and time: N single requests would fail alike
+        logger.error(f"Batch request for {len(pending)} prompts failed: {data}")
+        for index in pending:
+            results[index] = data
+        return results
+    
+    fallback_indexes = []
+    for key, index in zip(keys, pending):
+        entry = data.get(key) if isinstance(data, dict) else None
+        if matches_schema(schema, entry):
+            results[index] = entry
+            comment_cache.put(schema, prompts[index], entry)
+        else:
+            fallback_indexes.append(index)
+    
+    if fallback_indexes:
+        logger.warning(f"Batch response missing or malformed for {len(fallback_indexes)}/{len(prompts)} prompts, "
+                       "falling back to single requests.")
+        fallbacks = await asyncio.gather(*(run_agent(schema, prompts[index], use_cache=False) for index in fallback_indexes))
+        for index, result in zip(fallback_indexes, fallbacks):
+            results[index] = result
+    
+    return results
@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from config.logger import logger
+from secret import COMMENT_CACHE_DIR
+from utils.ledger import interaction_ledger
+
+# Ledger action under which the hashes of posted comment texts are recorded
+POSTED_TEXT_ACTION = "comment_text"
+
+class CommentCache:
+    """Content-addressed cache of agent responses
+
+    Entries are keyed on the normalized prompt plus a hash of the response schema, so
+    reposts, sponsored posts and captionless posts reuse one generation. Recent entries
+    live in an in-memory LRU; if `cache_dir` is set, entries are also written to disk
+    and survive restarts. Both tiers expire entries after `ttl` seconds.
+
+    The texts each account posted are recorded by hash in `ledger` (if given), so a
+    restarted or resumed session does not post a cached comment a second time.
+    """
+
+    def __init__(self, max_entries=256, ttl=86400, cache_dir=None, max_disk_entries=2048, ledger=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self.ledger = ledger
+        self._entries = OrderedDict()  # key -> (created, data)
+        self._posted = {}  # account -> hashes of comments it already posted
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(schema, prompt):
+        """Build the cache key of a schema and prompt"""
+        normalized = re.sub(r"\s+", " ", prompt).strip().casefold()
+        schema_hash = hashlib.sha256(json.dumps(schema, sort_keys=True).encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{schema_hash}:{normalized}".encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, schema, prompt):
+        """Get the cached response for a schema and prompt
+
+        Returns:
+            The cached response, or None if there is no fresh entry
+        """
+        key = self.make_key(schema, prompt)
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            created, data = entry
+            if now - created <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+            del self._entries[key]
+
+        if self.cache_dir:
+            data = self._read_disk(key, now)
+            if data is not None:
+                self.disk_hits += 1
+                return data
+
+        self.misses += 1
+        return None
+
+    def _read_disk(self, key, now):
+        path = self._disk_path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as error:
+            logger.warning(f"Ignoring unreadable comment cache entry {path}: {error}")
+            return None
+
+        if now - entry["created"] > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        # Promote to the memory tier
+        self._store(key, entry["created"], entry["data"])
+        return entry["data"]
+
+    def put(self, schema, prompt, data):
+        """Cache the response for a schema and prompt"""
+        key = self.make_key(schema, prompt)
+        created = time.time()
+        self._store(key, created, data)
+
+        if self.cache_dir:
+            try:
+                tmp_path = self._disk_path(key) + ".tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump({"created": created, "data": data}, f)
+                os.replace(tmp_path, self._disk_path(key))
+                self._prune_disk()
+            except Exception as error:
+                logger.warning(f"Could not write comment cache entry: {error}")
+
+    def _store(self, key, created, data):
+        self._entries[key] = (created, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _prune_disk(self):
+        names = [name for name in os.listdir(self.cache_dir) if name.endswith(".json")]
+        if len(names) <= self.max_disk_entries:
+            return
+
+        # Drop the oldest entries first
+        paths = sorted((os.path.join(self.cache_dir, name) for name in names), key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except OSError:
+                pass
+
+    @staticmethod
+    def _text_hash(text):
+        return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+    def has_posted(self, account, text):
+        """Check if an account already posted a text"""
+        text_hash = self._text_hash(text)
+        if text_hash in self._posted.get(account, ()):
+            return True
+        return self.ledger is not None and self.ledger.has(account, text_hash, POSTED_TEXT_ACTION)
+
+    def pick(self, candidates, account, field="comment"):
+        """Pick the first candidate the account has not posted yet
+
+        Cached responses are shared, so this rotates among their candidates; once the
+        picked text is posted, `record_posted()` keeps the account from getting it again.
+
+        Args:
+            candidates: List of response objects
+            account: Username of the account that will post the text
+            field: Name of the property holding the text
+
+        Returns:
+            dict: The picked candidate, or None if the account already used all of them
+        """
+        for candidate in candidates:
+            text = candidate.get(field) if isinstance(candidate, dict) else None
+            if text and not self.has_posted(account, text):
+                return candidate
+        return None
+
+    def record_posted(self, account, text):
+        """Record that an account posted a text, once it is confirmed"""
+        text_hash = self._text_hash(text)
+        self._posted.setdefault(account, set()).add(text_hash)
+        if self.ledger is not None:
+            self.ledger.record(account, text_hash, POSTED_TEXT_ACTION)
+
+    def stats(self):
+        """Returns the hit and miss counters of the cache"""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+# Shared comment cache used by run_agent
+comment_cache = CommentCache(cache_dir=COMMENT_CACHE_DIR, ledger=interaction_ledger)
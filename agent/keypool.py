@@ -0,0 +1,197 @@
+import json
+import threading
+import time
+from collections import deque
+
+from config.logger import logger
+from agent.resilience import CircuitBreaker
+
+class ApiKeyState:
+    """Health and usage of a single Gemini API key"""
+
+    def __init__(self, index, api_key, breaker=None):
+        self.index = index
+        self.api_key = api_key
+        self.in_flight = 0
+        self.requests = deque()  # Timestamps of requests inside the quota window
+        self.rate_limits = deque()  # Timestamps of recent 429 responses
+        self.consecutive_rate_limits = 0
+        self.cooldown_until = 0.0
+        self.latency = None  # Exponentially weighted average latency in seconds
+        self.breaker = breaker or CircuitBreaker()  # Opens after repeated failures other than 429s
+        self.client = None  # GenerativeServiceAsyncClient using this key
+
+    @property
+    def name(self):
+        return f"GEMINI_API_KEY_{self.index + 1}"
+
+class ApiKeyPool:
+    """Pool of Gemini API keys that hands out the healthiest key for each request
+
+    Every key gets its own GenerativeService async client, and requests are sent
+    through it directly, so no request depends on process-wide SDK state. The pool
+    tracks each key's requests inside its quota window, recent 429 responses and
+    latency, and picks the least loaded key that is not cooling down after a 429 and
+    whose circuit breaker is not open after repeated 5xx errors or timeouts.
+    acquire() and release() hold a lock and never await, so concurrent coroutines
+    (and worker threads) can share one pool. `api_endpoint` points every client at
+    another Gemini endpoint; an "http://" endpoint is reached over a plaintext channel.
+    """
+
+    def __init__(self, api_keys, model_name="gemini-1.5-flash", quota=1500, quota_window=86400,
+                 rate_limit_cooldown=60, rate_limit_window=600, api_endpoint=None,
+                 breaker_threshold=3, breaker_reset=30.0):
+        self.model_name = model_name
+        self.api_endpoint = api_endpoint
+        self.quota = quota
+        self.quota_window = quota_window
+        self.rate_limit_cooldown = rate_limit_cooldown
+        self.rate_limit_window = rate_limit_window
+        self._lock = threading.Lock()
+        self._schemas = {}  # schema JSON -> glm.Schema
+        self.keys = []
+
+        for index, api_key in enumerate(api_keys):
+            if not api_key or api_key.startswith("API_KEY_"):  # Check for placeholder keys
+                logger.warning(f"Skipping invalid or placeholder API key at index {index}")
+                continue
+            self.keys.append(ApiKeyState(index, api_key, CircuitBreaker(breaker_threshold, breaker_reset)))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _prune(self, state, now):
+        while state.requests and now - state.requests[0] > self.quota_window:
+            state.requests.popleft()
+        while state.rate_limits and now - state.rate_limits[0] > self.rate_limit_window:
+            state.rate_limits.popleft()
+
+    def _is_available(self, state, now):
+        return state.cooldown_until <= now and len(state.requests) < self.quota and state.breaker.available(now)
+
+    def acquire(self, exclude=()):
+        """Reserve the healthiest available key
+
+        Args:
+            exclude: Indexes of keys that must not be returned
+
+        Returns:
+            ApiKeyState: The reserved key, or None if no key is available
+        """
+        with self._lock:
+            now = time.monotonic()
+            candidates = []
+            for state in self.keys:
+                if state.index in exclude:
+                    continue
+                self._prune(state, now)
+                if self._is_available(state, now):
+                    candidates.append(state)
+
+            if not candidates:
+                return None
+
+            # Least loaded first, then fewest recent 429s, then fastest, then least used
+            state = min(candidates, key=lambda s: (
+                s.in_flight,
+                len(s.rate_limits),
+                s.latency if s.latency is not None else 0.0,
+                len(s.requests),
+            ))
+            state.in_flight += 1
+            state.requests.append(now)
+            state.breaker.on_acquire(now)
+            return state
+
+    def release(self, state, latency=None, rate_limited=False, failed=False):
+        """Return a key reserved with acquire() and record how the request went
+
+        Args:
+            state: The key returned by acquire()
+            latency: Duration of the request in seconds, if it completed
+            rate_limited: Whether the request was rejected with a 429
+            failed: Whether the request failed in a way that counts against the key's
+                    circuit breaker (5xx, timeout, rejected key)
+        """
+        with self._lock:
+            now = time.monotonic()
+            state.in_flight = max(0, state.in_flight - 1)
+
+            if rate_limited:
+                state.rate_limits.append(now)
+                state.consecutive_rate_limits += 1
+                # Back off exponentially while the key keeps returning 429s
+                cooldown = min(self.rate_limit_cooldown * 2 ** (state.consecutive_rate_limits - 1), self.quota_window)
+                state.cooldown_until = now + cooldown
+                logger.warning(f"{state.name} rate limited, cooling down for {cooldown:.0f} seconds.")
+                state.breaker.abandon()
+            elif failed:
+                if state.breaker.record_failure(now):
+                    logger.warning(f"{state.name} failed {state.breaker.failures} times in a row, "
+                                   f"circuit open for {state.breaker.reset_timeout:.0f} seconds.")
+            elif latency is not None:
+                state.consecutive_rate_limits = 0
+                state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+                state.breaker.record_success()
+            else:
+                state.breaker.abandon()
+
+    def _create_client(self, state):
+        # The Gemini SDK is only loaded once a request is actually made
+        from google.ai import generativelanguage as glm
+
+        if self.api_endpoint and self.api_endpoint.startswith("http://"):
+            import grpc
+            from google.ai.generativelanguage_v1beta.services.generative_service.transports.grpc_asyncio import (
+                GenerativeServiceGrpcAsyncIOTransport,
+            )
+
+            # Local plaintext server such as the benchmark stub, which ignores the key
+            channel = grpc.aio.insecure_channel(self.api_endpoint[len("http://"):])
+            return glm.GenerativeServiceAsyncClient(transport=GenerativeServiceGrpcAsyncIOTransport(channel=channel))
+
+        client_options = {"api_key": state.api_key}
+        if self.api_endpoint:
+            client_options["api_endpoint"] = self.api_endpoint
+        return glm.GenerativeServiceAsyncClient(client_options=client_options)
+
+    def get_client(self, state):
+        """Get the async client of a key, creating it on first use
+
+        Args:
+            state: The key returned by acquire()
+
+        Returns:
+            GenerativeServiceAsyncClient: A client authenticated with the key
+        """
+        with self._lock:
+            if state.client is None:
+                state.client = self._create_client(state)
+            return state.client
+
+    def build_request(self, schema, prompt):
+        """Build a request for a JSON response following a schema
+
+        Args:
+            schema: The schema defining the structure of the response
+            prompt: The prompt to send to the AI model
+
+        Returns:
+            GenerateContentRequest: The request, for any key's client
+        """
+        from google.ai import generativelanguage as glm
+
+        schema_key = json.dumps(schema, sort_keys=True)
+        with self._lock:
+            response_schema = self._schemas.get(schema_key)
+            if response_schema is None:
+                response_schema = self._schemas[schema_key] = glm.Schema(schema)
+
+        return glm.GenerateContentRequest(
+            model=f"models/{self.model_name}",
+            contents=[glm.Content(role="user", parts=[glm.Part(text=prompt)])],
+            generation_config=glm.GenerationConfig(
+                response_mime_type="application/json",
+                response_schema=response_schema,
+            ),
+        )
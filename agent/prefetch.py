@@ -0,0 +1,174 @@
+import asyncio
+from collections import OrderedDict
+from config.logger import logger
+from agent import run_agent, run_agent_batch
+from agent.cache import comment_cache
+from agent.resilience import Failure
+
+class CommentPrefetcher:
+    """Generate comments for upcoming posts before the bot reaches them
+
+    The interaction loop schedules the captions of the next few posts ahead of its
+    cursor; each one starts its `run_agent` call right away. When the loop reaches a
+    post, `get()` returns the already running (or finished) generation. At most
+    `max_pending` generations are in flight, and posts that get skipped can be
+    cancelled so their results are never waited for. Posts scheduled together are
+    packed into shared requests of up to `batch_size` prompts; a shared request is
+    cancelled once none of its posts waits for it anymore.
+    """
+
+    def __init__(self, schema, max_pending=3, batch_size=3):
+        self.schema = schema
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self._tasks = OrderedDict()  # post key -> asyncio.Task
+        self._prompts = {}  # post key -> prompt
+        self._batch_waiters = {}  # shared batch task -> number of its posts not done or cancelled yet
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self._tasks
+
+    def __len__(self):
+        return len(self._tasks)
+
+    @property
+    def full(self):
+        return len(self._tasks) >= self.max_pending
+
+    def schedule(self, key, prompt):
+        """Start generating a comment for a post
+
+        Args:
+            key: Stable identifier of the post
+            prompt: The prompt to send to the AI model
+
+        Returns:
+            bool: True if a generation was started, False if the post is already
+                  scheduled or the queue is full
+        """
+        if key in self._tasks or self.full:
+            return False
+
+        logger.debug(f"Prefetching comment for post {key}")
+        self._tasks[key] = asyncio.ensure_future(run_agent(self.schema, prompt))
+        self._prompts[key] = prompt
+        return True
+
+    def schedule_many(self, items):
+        """Start generating comments for several posts, batching their prompts
+
+        Args:
+            items: List of (key, prompt) tuples
+
+        Returns:
+            int: Number of posts whose generation was started
+        """
+        items = [(key, prompt) for key, prompt in items if key not in self._tasks]
+        items = items[:max(0, self.max_pending - len(self._tasks))]
+
+        for start in range(0, len(items), max(1, self.batch_size)):
+            batch = items[start:start + max(1, self.batch_size)]
+            if len(batch) == 1:
+                self.schedule(*batch[0])
+                continue
+
+            logger.debug(f"Prefetching comments for posts {', '.join(key for key, _ in batch)} in one request")
+            batch_task = asyncio.ensure_future(run_agent_batch(self.schema, [prompt for _, prompt in batch]))
+            self._batch_waiters[batch_task] = len(batch)
+            for index, (key, prompt) in enumerate(batch):
+                task = asyncio.ensure_future(self._batch_result(batch_task, index))
+                # A done callback also runs for a task cancelled before it started
+                task.add_done_callback(lambda _, batch_task=batch_task: self._release_batch(batch_task))
+                self._tasks[key] = task
+                self._prompts[key] = prompt
+
+        return len(items)
+
+    async def _batch_result(self, batch_task, index):
+        # Shielded so cancelling one skipped post does not cancel the shared request
+        results = await asyncio.shield(batch_task)
+        return results[index]
+
+    def _release_batch(self, batch_task):
+        """Drop one waiter of a shared request, and cancel the request after the last one"""
+        waiters = self._batch_waiters.get(batch_task)
+        if waiters is None:
+            return
+        if waiters > 1:
+            self._batch_waiters[batch_task] = waiters - 1
+            return
+        del self._batch_waiters[batch_task]
+        if not batch_task.done():
+            logger.debug("No post waits for a prefetched batch anymore, cancelling it")
+            batch_task.cancel()
+
+    async def get(self, key, prompt):
+        """Get the comment data for a post, generating it inline if it was not prefetched
+
+        Args:
+            key: Stable identifier of the post
+            prompt: The prompt used when the post was not prefetched
+
+        Returns:
+            The generated content or a Failure, as returned by run_agent
+        """
+        task = self._tasks.pop(key, None)
+        self._prompts.pop(key, None)
+        if task is None or task.cancelled():
+            self.misses += 1
+            # On the critical path: stream and use the first comment as soon as it arrives
+            return await run_agent(self.schema, prompt, stream=True)
+
+        self.hits += 1
+        return await task
+
+    def cancel(self, key):
+        """Cancel the generation for a post that will not be commented on"""
+        task = self._tasks.pop(key, None)
+        self._prompts.pop(key, None)
+        if task is not None and not task.done():
+            logger.debug(f"Cancelling prefetched comment for skipped post {key}")
+            task.cancel()
+
+    def cancel_all(self):
+        """Cancel every pending generation"""
+        for key in list(self._tasks):
+            self.cancel(key)
+        for batch_task in list(self._batch_waiters):
+            batch_task.cancel()
+        self._batch_waiters.clear()
+
+    def export(self):
+        """Get the pending posts, with the comments already generated for them
+
+        Returns:
+            list: {"key", "prompt", "data"} per pending post; "data" is None while the
+                  generation is still running or if it failed
+        """
+        pending = []
+        for key, task in self._tasks.items():
+            data = None
+            if task.done() and not task.cancelled() and task.exception() is None:
+                data = task.result()
+            if isinstance(data, Failure):
+                data = None
+            pending.append({"key": key, "prompt": self._prompts.get(key), "data": data})
+        return pending
+
+    def restore(self, pending):
+        """Seed the comment cache with comments exported from an earlier session
+
+        The posts are scheduled again as the loop reaches them, and their generations
+        are then answered from the cache without an API call.
+
+        Returns:
+            int: Number of restored comments
+        """
+        restored = 0
+        for item in pending:
+            if item.get("prompt") and item.get("data"):
+                comment_cache.put(self.schema, item["prompt"], item["data"])
+                restored += 1
+        return restored
@@ -0,0 +1,211 @@
+import asyncio
+import json
+import random
+from utils.metrics import Histogram
+
+class Failure:
+    """Base class of the ways a Gemini request can fail
+
+    run_agent returns one of these instead of the response data, so callers can tell
+    a failure from a response with `isinstance(result, Failure)` and its kind from the
+    subclass. `str()` gives a readable message.
+
+    Class attributes:
+        retryable: Whether the request may succeed when sent again
+        switch_key: Whether the next attempt should use another key
+        trips_breaker: Whether the failure counts against the key's circuit breaker
+    """
+    retryable = False
+    switch_key = False
+    trips_breaker = False
+    label = "error"
+
+    def __init__(self, message, error=None):
+        self.message = message
+        self.error = error
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.message!r})"
+
+class RateLimited(Failure):
+    """The key is over its quota (429); the pool cools it down"""
+    retryable = True
+    switch_key = True
+    label = "rate_limited"
+
+class Unavailable(Failure):
+    """The service is temporarily unavailable or failed internally (5xx)"""
+    retryable = True
+    trips_breaker = True
+    label = "unavailable"
+
+class Timeout(Failure):
+    """The attempt took longer than the time left before the call's deadline"""
+    retryable = True
+    switch_key = True
+    trips_breaker = True
+    label = "timeout"
+
+class EmptyResponse(Failure):
+    """The response had no text or no valid candidate"""
+    retryable = True
+    label = "empty"
+
+class InvalidResponse(Failure):
+    """The response text was not valid JSON"""
+    retryable = True
+    label = "invalid"
+
+class KeyRejected(Failure):
+    """The key itself was refused (invalid, revoked or without permission)"""
+    retryable = True
+    switch_key = True
+    trips_breaker = True
+    label = "key_rejected"
+
+class Rejected(Failure):
+    """The request was refused and would be refused again (e.g. invalid argument)"""
+    label = "rejected"
+
+class Exhausted(Failure):
+    """The call gave up: deadline reached, attempts used up or no key available
+
+    Attributes:
+        last: The failure of the last attempt, if any
+    """
+    label = "exhausted"
+
+    def __init__(self, message, last=None):
+        super().__init__(message, last.error if last is not None else None)
+        self.last = last
+
+def classify(error):
+    """Turn an exception raised by a Gemini request into a Failure
+
+    google.api_core exceptions are mapped by type; other errors fall back to the
+    HTTP status in their message.
+    """
+    if isinstance(error, asyncio.TimeoutError):
+        return Timeout("The request timed out", error)
+    if isinstance(error, json.JSONDecodeError):
+        return InvalidResponse(f"The response is not valid JSON: {str(error)}", error)
+
+    # Loaded with the SDK, so only once a request has actually been made
+    from google.api_core import exceptions
+
+    if isinstance(error, exceptions.TooManyRequests):  # Includes ResourceExhausted
+        return RateLimited(str(error), error)
+    if isinstance(error, (exceptions.ServiceUnavailable, exceptions.InternalServerError,
+                          exceptions.GatewayTimeout, exceptions.DeadlineExceeded)):
+        return Unavailable(str(error), error)
+    if isinstance(error, (exceptions.Unauthenticated, exceptions.PermissionDenied)):
+        return KeyRejected(str(error), error)
+    if isinstance(error, exceptions.InvalidArgument) and "API key" in str(error):
+        return KeyRejected(str(error), error)
+    if isinstance(error, exceptions.GoogleAPICallError):
+        return Rejected(str(error), error)
+
+    message = str(error)
+    if "429" in message:
+        return RateLimited(message, error)
+    if any(status in message for status in ("500", "502", "503", "504")):
+        return Unavailable(message, error)
+    return Rejected(f"An error occurred: {message}", error)
+
+class Backoff:
+    """Exponential backoff with full jitter
+
+    The delay before retry n is uniform in [0, min(cap, base * factor ** n)], which
+    spreads the retries of concurrent callers instead of synchronizing them.
+    """
+
+    def __init__(self, base=1.0, factor=2.0, cap=30.0):
+        self.base = base
+        self.factor = factor
+        self.cap = cap
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.cap, self.base * self.factor ** attempt))
+
+class CircuitBreaker:
+    """Per-key circuit breaker
+
+    After `failure_threshold` consecutive failures the circuit opens and the key is
+    not handed out for `reset_timeout` seconds. It then lets a single trial request
+    through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False
+
+    def available(self, now):
+        """Whether a request may be sent through this circuit"""
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            return now - self.opened_at >= self.reset_timeout
+        return not self._trial
+
+    def on_acquire(self, now):
+        """Record that a request is being sent (claims the half-open trial)"""
+        if self.state == "open" and now - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open":
+            self._trial = True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._trial = False
+
+    def record_failure(self, now):
+        """Count a failure
+
+        Returns:
+            bool: True if this failure opened the circuit
+        """
+        self.failures += 1
+        self._trial = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            opened = self.state != "open"
+            self.state = "open"
+            self.opened_at = now
+            return opened
+        return False
+
+    def abandon(self):
+        """Record that a request ended without telling whether the key is healthy"""
+        self._trial = False
+
+class HedgePolicy:
+    """Decide when to send a hedged copy of a slow request on another key
+
+    Latencies of successful requests are kept per request kind (plain or streamed).
+    Once `min_samples` are known, a request still running after their p95 (never less
+    than `min_delay`) gets a second copy; whichever answers first is used.
+    """
+
+    def __init__(self, quantile=95, min_samples=20, min_delay=1.0, enabled=True):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.enabled = enabled
+        self._latencies = {}  # request kind -> Histogram
+
+    def observe(self, kind, latency):
+        self._latencies.setdefault(kind, Histogram()).observe(latency)
+
+    def delay(self, kind):
+        """Get the time after which a request of this kind is hedged, or None"""
+        histogram = self._latencies.get(kind)
+        if not self.enabled or histogram is None or len(histogram.samples) < self.min_samples:
+            return None
+        return max(self.min_delay, histogram.quantile(self.quantile))
@@ -1,5 +1,3 @@
-import google.generativeai as genai
-
 class InstagramCommentSchema:
     """Schema definition for Instagram comments generated by the AI"""
     
@@ -35,4 +33,18 @@ def get_instagram_comment_schema():
         "description": schema.description,
         "type": schema.type,
         "items": schema.items
-    }
\ No newline at end of file
+    }
+
+def get_batch_schema(schema, keys):
+    """Returns a schema holding one response per key, each following the given schema
+    
+    Args:
+        schema: The schema of a single response
+        keys: The ids used as property names, one per packed prompt
+    """
+    return {
+        "description": "Responses for several separate requests, keyed by request id.",
+        "type": "OBJECT",
+        "properties": {key: schema for key in keys},
+        "required": list(keys),
+    }
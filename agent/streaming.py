@@ -0,0 +1,160 @@
+import json
+
+class JsonArrayParser:
+    """Incremental parser for a JSON array that arrives in chunks
+
+    `feed()` returns the top-level items completed by each chunk, so the first item
+    of a streamed response can be used before the rest of the array is received.
+    Only the structure (strings, escapes and nesting) is tracked while scanning;
+    each completed item is decoded with json.loads.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._position = 0
+        self._started = False  # Inside the top-level array
+        self._finished = False  # Top-level array closed
+        self._depth = 0  # Nesting depth inside the current item
+        self._in_string = False
+        self._escaped = False
+        self._item_start = None
+
+    @property
+    def finished(self):
+        return self._finished
+
+    def _complete_item(self, end):
+        text = self.buffer[self._item_start:end].strip()
+        self._item_start = None
+        return json.loads(text) if text else None
+
+    def feed(self, text):
+        """Add a chunk of the response
+
+        Args:
+            text: Next part of the JSON text
+
+        Returns:
+            list: Items completed by this chunk
+
+        Raises:
+            ValueError: If a completed item is not valid JSON
+        """
+        self.buffer += text
+        items = []
+        while self._position < len(self.buffer) and not self._finished:
+            char = self.buffer[self._position]
+            position = self._position
+            self._position += 1
+
+            if not self._started:
+                if char == "[":
+                    self._started = True
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if self._item_start is None:
+                if char.isspace() or char == ",":
+                    continue
+                if char == "]":
+                    self._finished = True
+                    continue
+                self._item_start = position
+
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                if self._depth == 0:
+                    # Closing bracket of the top-level array right after a scalar item
+                    item = self._complete_item(position)
+                    if item is not None:
+                        items.append(item)
+                    self._finished = True
+                    continue
+                self._depth -= 1
+            elif char == "," and self._depth == 0:
+                item = self._complete_item(position)
+                if item is not None:
+                    items.append(item)
+                continue
+
+            # Objects and arrays are complete as soon as their closing bracket arrives
+            if self._depth == 0 and char in "]}":
+                items.append(self._complete_item(position + 1))
+
+        return items
+
+class CandidateStream:
+    """Read the candidates of a streamed JSON array response one at a time
+
+    Args:
+        response: Async iterable of response chunks
+        is_valid: Predicate telling whether a parsed item is a usable candidate
+        text_of: Function returning the text of a chunk, its `text` attribute by default
+    """
+
+    def __init__(self, response, is_valid=None, text_of=None):
+        self.response = response
+        self._chunks = response.__aiter__()
+        self.is_valid = is_valid or (lambda item: item is not None)
+        self.text_of = text_of or (lambda chunk: chunk.text)
+        self.last_chunk = None
+        self.parser = JsonArrayParser()
+        self.items = []
+        self.done = False
+
+    async def _read(self):
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            self.done = True
+            if not self.parser.finished and not self.items:
+                # Not a streamed array after all: decode whatever arrived at once
+                data = json.loads(self.parser.buffer)
+                self.items.extend(data if isinstance(data, list) else [data])
+            return
+        self.last_chunk = chunk
+        self.items.extend(self.parser.feed(self.text_of(chunk)))
+
+    async def first(self):
+        """Wait for the first valid candidate
+
+        Returns:
+            The first valid item, or None if the response had none
+        """
+        checked = 0
+        while True:
+            for item in self.items[checked:]:
+                if self.is_valid(item):
+                    return item
+            checked = len(self.items)
+            if self.done:
+                return None
+            await self._read()
+
+    def cancel(self):
+        """Stop reading and cancel the underlying call, if it can be cancelled"""
+        self.done = True
+        cancel = getattr(self.response, "cancel", None)
+        if cancel is not None:
+            cancel()
+
+    async def rest(self):
+        """Read the response to its end
+
+        Returns:
+            list: Every valid candidate, in order
+        """
+        while not self.done:
+            await self._read()
+        return [item for item in self.items if self.is_valid(item)]
@@ -0,0 +1,184 @@
+import itertools
+import json
+import random
+import threading
+import time
+from concurrent import futures
+
+import grpc
+from google.ai import generativelanguage as glm
+
+SERVICE_NAME = "google.ai.generativelanguage.v1beta.GenerativeService"
+
+# Building blocks of the synthetic comments (150-250 characters, some with apostrophes)
+COMMENT_OPENERS = [
+    "This is absolutely stunning",
+    "I can't stop looking at this",
+    "What a beautiful way to capture the moment",
+    "Honestly one of the best posts on my feed today",
+    "The colors in this one are unreal",
+]
+COMMENT_MIDDLES = [
+    "the light, the mood and the composition all come together perfectly",
+    "it's the kind of shot that makes you want to pack a bag and go",
+    "you clearly put a lot of care into every detail of this",
+    "every time I scroll past your posts I end up staying a little longer",
+]
+COMMENT_CLOSERS = [
+    "Keep sharing work like this, it really brightens the day!",
+    "Saving this for inspiration, thank you for posting it!",
+    "Can't wait to see what you share next, this is great!",
+]
+
+class FakeGemini:
+    """Local stand-in for the Gemini GenerativeService gRPC API
+
+    Answers GenerateContent and StreamGenerateContent with JSON that follows the
+    request's response schema, after a configurable latency. Requests without a
+    response schema are rejected with INVALID_ARGUMENT, so a client that does not
+    send one shows up as failed requests. A share of the requests fails with 429
+    (Too Many Requests) or 503 (Service Unavailable), like the real API does under load.
+    Every request is recorded with its duration and status.
+    """
+
+    def __init__(self, latency=0.8, jitter=0.2, rate_limit_rate=0.0, unavailable_rate=0.0,
+                 stream_chunks=4, seed=None, max_workers=32):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.unavailable_rate = unavailable_rate
+        self.stream_chunks = stream_chunks
+        self.max_workers = max_workers
+        self.requests = []  # {"method", "started", "duration", "status"}
+        self._random = random.Random(seed)
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = None
+        self.port = None
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, port=0):
+        """Start serving on 127.0.0.1 in background threads"""
+        self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=self.max_workers))
+        handler = grpc.method_handlers_generic_handler(SERVICE_NAME, {
+            "GenerateContent": grpc.unary_unary_rpc_method_handler(
+                self._generate_content,
+                request_deserializer=glm.GenerateContentRequest.deserialize,
+                response_serializer=glm.GenerateContentResponse.serialize,
+            ),
+            "StreamGenerateContent": grpc.unary_stream_rpc_method_handler(
+                self._stream_generate_content,
+                request_deserializer=glm.GenerateContentRequest.deserialize,
+                response_serializer=glm.GenerateContentResponse.serialize,
+            ),
+        })
+        self._server.add_generic_rpc_handlers((handler,))
+        self.port = self._server.add_insecure_port(f"127.0.0.1:{port}")
+        self._server.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.stop(grace=None)
+            self._server = None
+
+    def _record(self, method, started, status):
+        with self._lock:
+            self.requests.append({
+                "method": method,
+                "started": started,
+                "duration": time.monotonic() - started,
+                "status": status,
+            })
+
+    def _draw(self):
+        """Draw the latency and the injected failure (if any) of one request"""
+        with self._lock:
+            latency = max(0.0, self._random.gauss(self.latency, self.jitter))
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return latency / 4, grpc.StatusCode.RESOURCE_EXHAUSTED, "Too Many Requests"
+        if roll < self.rate_limit_rate + self.unavailable_rate:
+            return latency / 4, grpc.StatusCode.UNAVAILABLE, "Service Unavailable"
+        return latency, None, None
+
+    def _comment(self):
+        with self._lock:
+            number = next(self._counter)
+            parts = [self._random.choice(COMMENT_OPENERS), self._random.choice(COMMENT_MIDDLES),
+                     self._random.choice(COMMENT_CLOSERS)]
+        return f"{parts[0]}, {parts[1]}. {parts[2]} #{number}"
+
+    def _value(self, schema):
+        """Build a value that follows a glm.Schema"""
+        if schema.type_ == glm.Type.OBJECT:
+            if "comment" in schema.properties:
+                return self._value_for_comment()
+            return {name: self._value(property_schema) for name, property_schema in schema.properties.items()}
+        if schema.type_ == glm.Type.ARRAY:
+            return [self._value(schema.items) for _ in range(3)]
+        if schema.type_ in (glm.Type.NUMBER, glm.Type.INTEGER):
+            return self._random.randint(0, 100)
+        if schema.type_ == glm.Type.BOOLEAN:
+            return True
+        return self._comment()
+
+    def _value_for_comment(self):
+        comment = self._comment()
+        return {"comment": comment, "viralRate": self._random.randint(40, 95), "commentTokenCount": len(comment.split())}
+
+    @staticmethod
+    def _schema(request):
+        """Get the request's response schema, or None if it has none"""
+        config = request.generation_config
+        if config.response_mime_type != "application/json" or "response_schema" not in config:
+            return None
+        return config.response_schema
+
+    def _response_text(self, schema):
+        return json.dumps(self._value(schema))
+
+    @staticmethod
+    def _response(text):
+        return glm.GenerateContentResponse(candidates=[
+            glm.Candidate(content=glm.Content(role="model", parts=[glm.Part(text=text)]), finish_reason="STOP", index=0),
+        ])
+
+    def _generate_content(self, request, context):
+        started = time.monotonic()
+        schema = self._schema(request)
+        if schema is None:
+            self._record("GenerateContent", started, grpc.StatusCode.INVALID_ARGUMENT.name)
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "A JSON response_schema is required")
+        latency, status, details = self._draw()
+        time.sleep(latency)
+        if status is not None:
+            self._record("GenerateContent", started, status.name)
+            context.abort(status, details)
+
+        response = self._response(self._response_text(schema))
+        self._record("GenerateContent", started, "OK")
+        return response
+
+    def _stream_generate_content(self, request, context):
+        started = time.monotonic()
+        schema = self._schema(request)
+        if schema is None:
+            self._record("StreamGenerateContent", started, grpc.StatusCode.INVALID_ARGUMENT.name)
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, "A JSON response_schema is required")
+        latency, status, details = self._draw()
+        if status is not None:
+            time.sleep(latency)
+            self._record("StreamGenerateContent", started, status.name)
+            context.abort(status, details)
+
+        # The text arrives in a few chunks spread over the request's latency
+        text = self._response_text(schema)
+        size = -(-len(text) // self.stream_chunks)
+        for offset in range(0, len(text), size):
+            time.sleep(latency / self.stream_chunks)
+            yield self._response(text[offset:offset + size])
+        self._record("StreamGenerateContent", started, "OK")
@@ -0,0 +1,322 @@
+import hashlib
+import json
+import threading
+import time
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Captions of the synthetic posts (some with apostrophes and quotes, like real ones)
+CAPTIONS = [
+    "Golden hour over the bay, day {number}. Can't get enough of this view! #sunset #travel",
+    "Tried a new recipe tonight: roasted peppers, feta and lots of basil. Who's hungry? #food",
+    "Morning run done before the city woke up. {number} km and counting. #running",
+    "New studio setup finally finished, swipe to see the before and after. #design",
+    "Our dog met the ocean for the first time and didn't know what to think. #dogsofinstagram",
+    "Reading list for the weekend, any recommendations? Post {number}. #books",
+]
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><title>Login • Instagram</title></head>
+<body>
+<form method="post" action="/accounts/login/">
+  <input name="username" type="text">
+  <input name="password" type="password">
+  <button type="submit">Log in</button>
+</form>
+</body></html>
+"""
+
+# The feed page loads posts from the timeline API as the page is scrolled, and mimics
+# Instagram's markup: like/comment buttons in `_aamw`/`_aamx` divs, the caption in a
+# `_a9zs` div, and a comment dialog whose Post button is disabled until text is entered.
+FEED_PAGE = """<!DOCTYPE html>
+<html><head><title>Instagram</title>
+<style>
+  article { height: 720px; border-bottom: 1px solid #ddd; }
+  .media { height: 480px; background: #eee; }
+  div[role=dialog] { position: fixed; left: 0; right: 0; bottom: 0; height: 180px; background: #fff; border-top: 1px solid #ccc; }
+</style>
+</head>
+<body>
+<nav><a href="/direct/inbox/">Messages</a></nav>
+<main id="feed"></main>
+<div role="dialog" id="comment-dialog" hidden>
+  <ul class="dialog-comments"></ul>
+  <div role="textbox" aria-label="Add a comment…">
+    <textarea aria-label="Add a comment…" placeholder="Add a comment…"></textarea>
+  </div>
+  <div role="button" aria-disabled="true">Post</div>
+</div>
+<script>
+let nextMaxId = null;
+let moreAvailable = true;
+let loading = false;
+let activeMedia = null;
+
+const dialog = document.getElementById('comment-dialog');
+const textarea = dialog.querySelector('textarea');
+const postButton = dialog.querySelector("div[role=button]");
+
+function svg(label) {
+  const element = document.createElementNS('http://www.w3.org/2000/svg', 'svg');
+  element.setAttribute('aria-label', label);
+  element.setAttribute('width', '24');
+  element.setAttribute('height', '24');
+  return element;
+}
+
+function renderPost(media) {
+  const article = document.createElement('article');
+  article.dataset.mediaId = media.id;
+  article.innerHTML = `
+    <header><a href="/${media.user.username}/">${media.user.username}</a></header>
+    <a href="/p/${media.code}/"><div class="media"></div></a>
+    <section>
+      <div class="x1 _aamw"><button type="button"></button></div>
+      <div class="x1 _aamx"><button type="button"></button></div>
+    </section>
+    <div class="x2 _a9zs"></div>
+    <ul class="comments"></ul>`;
+  article.querySelector('._a9zs').innerText = media.caption ? media.caption.text : '';
+  const likeButton = article.querySelector('._aamw > button');
+  likeButton.appendChild(svg(media.has_liked ? 'Unlike' : 'Like'));
+  likeButton.addEventListener('click', async () => {
+    const icon = likeButton.querySelector('svg');
+    const liked = icon.getAttribute('aria-label') === 'Unlike';
+    icon.setAttribute('aria-label', liked ? 'Like' : 'Unlike');
+    await fetch(`/api/v1/web/likes/${media.id}/${liked ? 'unlike' : 'like'}/`, { method: 'POST' });
+  });
+  const commentButton = article.querySelector('._aamx > button');
+  commentButton.appendChild(svg('Comment'));
+  commentButton.addEventListener('click', () => openDialog(media, article));
+  document.getElementById('feed').appendChild(article);
+}
+
+function openDialog(media, article) {
+  activeMedia = { media, article };
+  dialog.querySelector('.dialog-comments').innerHTML = article.querySelector('.comments').innerHTML;
+  textarea.value = '';
+  postButton.setAttribute('aria-disabled', 'true');
+  dialog.hidden = false;
+}
+
+textarea.addEventListener('input', () => {
+  postButton.setAttribute('aria-disabled', textarea.value.trim() ? 'false' : 'true');
+});
+
+postButton.addEventListener('click', async () => {
+  if (!activeMedia || postButton.getAttribute('aria-disabled') === 'true') {
+    return;
+  }
+  const { media, article } = activeMedia;
+  const text = textarea.value;
+  postButton.setAttribute('aria-disabled', 'true');
+  const response = await fetch(`/api/v1/web/comments/${media.id}/add/`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/x-www-form-urlencoded' },
+    body: new URLSearchParams({ comment_text: text }),
+  });
+  if (!response.ok) {
+    return;
+  }
+  for (const list of [article.querySelector('.comments'), dialog.querySelector('.dialog-comments')]) {
+    const item = document.createElement('li');
+    const body = document.createElement('div');
+    body.innerText = text;
+    item.appendChild(body);
+    list.appendChild(item);
+  }
+  textarea.value = '';
+  setTimeout(() => { dialog.hidden = true; }, 300);
+});
+
+async function loadMore() {
+  if (loading || !moreAvailable) {
+    return;
+  }
+  loading = true;
+  try {
+    const query = nextMaxId ? `?max_id=${encodeURIComponent(nextMaxId)}` : '';
+    const response = await fetch(`/api/v1/feed/timeline/${query}`);
+    const data = await response.json();
+    data.feed_items.forEach((item) => renderPost(item.media_or_ad));
+    moreAvailable = data.more_available;
+    nextMaxId = data.next_max_id;
+  } finally {
+    loading = false;
+  }
+}
+
+// Like Instagram, the next page is requested well before the end of the feed is reached
+window.addEventListener('scroll', () => {
+  if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 3000) {
+    loadMore();
+  }
+});
+loadMore();
+</script>
+</body></html>
+"""
+
+class FakeInstagram:
+    """Local HTTP server imitating the parts of Instagram the bot relies on
+
+    Serves a login form, a feed page that loads synthetic posts from a JSON timeline
+    API while scrolling, and the like and comment endpoints. Each account (identified
+    by its `sessionid` cookie) gets `posts_per_account` posts, or the same shared
+    posts when `shared_feed` is set. Every request that matters to the benchmark is
+    recorded as an event with its timestamp.
+    """
+
+    def __init__(self, posts_per_account=30, page_size=6, response_delay=0.05, shared_feed=False):
+        self.posts_per_account = posts_per_account
+        self.page_size = page_size
+        self.response_delay = response_delay
+        self.shared_feed = shared_feed
+        self.events = []  # {"type", "account", "time", ...}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self, port=0):
+        """Start serving on 127.0.0.1 in a background thread"""
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def record(self, event_type, account, **data):
+        with self._lock:
+            self.events.append({"type": event_type, "account": account, "time": time.monotonic(), **data})
+
+    def events_of(self, event_type):
+        with self._lock:
+            return [event for event in self.events if event["type"] == event_type]
+
+    def media(self, account, number):
+        """Build the timeline entry of an account's n-th post"""
+        owner = "shared" if self.shared_feed else account
+        media_id = int(hashlib.sha1(f"{owner}:{number}".encode()).hexdigest()[:15], 16)
+        code = hashlib.sha1(f"code:{owner}:{number}".encode()).hexdigest()[:11]
+        return {
+            "id": str(media_id),
+            "pk": media_id,
+            "code": code,
+            "taken_at": 1700000000 + number * 60,
+            "caption": {"text": CAPTIONS[number % len(CAPTIONS)].format(number=number)},
+            "user": {"username": f"creator_{number % 7}", "pk": 1000 + number % 7},
+            "has_liked": number % 5 == 4,
+            "like_count": 10 + number * 3,
+            "comment_count": number % 4,
+        }
+
+    def timeline(self, account, max_id):
+        start = int(max_id or 0)
+        end = min(start + self.page_size, self.posts_per_account)
+        return {
+            "feed_items": [{"media_or_ad": self.media(account, number)} for number in range(start, end)],
+            "more_available": end < self.posts_per_account,
+            "next_max_id": str(end) if end < self.posts_per_account else None,
+            "num_results": end - start,
+            "status": "ok",
+        }
+
+    def _handler_class(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _account(self):
+                cookie = SimpleCookie(self.headers.get("Cookie", ""))
+                return cookie["sessionid"].value if "sessionid" in cookie else None
+
+            def _send(self, status, body, content_type="text/html; charset=utf-8", headers=None):
+                payload = body.encode() if isinstance(body, str) else body
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_json(self, data, status=200):
+                self._send(status, json.dumps(data), "application/json")
+
+            def _redirect(self, location, headers=None):
+                self._send(302, "", headers={"Location": location, **(headers or {})})
+
+            def _form(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode()).items()}
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                account = self._account()
+                if url.path == "/accounts/login/":
+                    self._send(200, LOGIN_PAGE)
+                elif url.path == "/favicon.ico":
+                    self._send(404, "")
+                elif account is None:
+                    self._redirect("/accounts/login/")
+                elif url.path == "/":
+                    site.record("feed_page", account)
+                    self._send(200, FEED_PAGE)
+                elif url.path == "/api/v1/feed/timeline/":
+                    time.sleep(site.response_delay)
+                    max_id = parse_qs(url.query).get("max_id", [None])[0]
+                    site.record("timeline", account, max_id=max_id)
+                    self._send_json(site.timeline(account, max_id))
+                elif url.path == "/direct/inbox/":
+                    self._send(200, "<html><body>Inbox</body></html>")
+                else:
+                    self._send(404, "Not found")
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path == "/accounts/login/":
+                    form = self._form()
+                    username = form.get("username", "")
+                    site.record("login", username)
+                    # A year-long session cookie named after the account
+                    self._redirect("/", headers={
+                        "Set-Cookie": f"sessionid={username}; Path=/; Max-Age=31536000; HttpOnly",
+                    })
+                    return
+
+                account = self._account()
+                if account is None:
+                    self._send_json({"status": "fail", "message": "login_required"}, status=403)
+                    return
+
+                parts = url.path.strip("/").split("/")
+                time.sleep(site.response_delay)
+                if url.path.startswith("/api/v1/web/likes/"):
+                    site.record(parts[-1], account, media_id=parts[-2])
+                    self._send_json({"status": "ok"})
+                elif url.path.startswith("/api/v1/web/comments/"):
+                    text = self._form().get("comment_text", "")
+                    site.record("comment", account, media_id=parts[-2], text=text)
+                    self._send_json({
+                        "id": str(int(time.time() * 1000)),
+                        "text": text,
+                        "status": "ok",
+                    })
+                else:
+                    self._send(404, "Not found")
+
+        return Handler
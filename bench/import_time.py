@@ -0,0 +1,67 @@
+"""Import-time budget check for the CLI entry point
+
+Imports main.py in a fresh interpreter with `-X importtime` and fails (exit code 1)
+when the import takes longer than the budget, or when it loads a dependency that
+must only be imported once a browser session or an LLM call is needed.
+
+    python -m bench.import_time --budget-ms 250
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+from bench.run import REPO_DIR
+
+# Dependencies that must stay out of a plain `import main`
+DEFERRED_MODULES = ["selenium", "webdriver_manager", "user_agents", "google.ai", "grpc"]
+
+def measure(module="main"):
+    """Import a module in a fresh interpreter
+
+    Returns:
+        tuple: (cumulative import time of the module in microseconds, {module: cumulative microseconds})
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR, capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = int(cumulative)
+    return modules.get(module, 0), modules
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the import time of main.py")
+    parser.add_argument("--budget-ms", type=float, default=250, help="Maximum import time of main.py")
+    parser.add_argument("--runs", type=int, default=3, help="Imports to run; the fastest one is checked")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest modules to list")
+    args = parser.parse_args(argv)
+
+    runs = [measure() for _ in range(max(1, args.runs))]
+    total, modules = min(runs, key=lambda run: run[0])
+
+    print(f"import main: {total / 1000:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    for name, cumulative in sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if total / 1000 > args.budget_ms:
+        failures.append(f"import main took {total / 1000:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+    for deferred in DEFERRED_MODULES:
+        loaded = [name for name in modules if name == deferred or name.startswith(f"{deferred}.")]
+        if loaded:
+            failures.append(f"import main loaded {deferred}, which must only be imported when needed")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Offline end-to-end benchmark of the Instagram agent
+
+Runs the real bot (browser pool, feed tracking, prefetching, key pool...) for M
+accounts against a local fake Instagram and a local Gemini stub, then reports
+posts/min and p50/p95 per stage. Nothing leaves the machine; Chrome runs headless
+with the lean profile and needs a local chromedriver (CHROMEDRIVER_PATH or PATH).
+
+    python -m bench.run --posts 30 --accounts 2 --llm-latency 0.8 --rate-limit-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from bench.fake_gemini import FakeGemini
+from bench.fake_instagram import FakeInstagram
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers, or None if it is empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the Instagram agent")
+    parser.add_argument("--posts", type=int, default=30, help="Posts in each account's feed")
+    parser.add_argument("--accounts", type=int, default=2, help="Number of accounts to run")
+    parser.add_argument("--sessions", type=int, default=2, help="Concurrent browser sessions")
+    parser.add_argument("--shared-feed", action="store_true", help="Show every account the same posts")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="Mean Gemini stub latency in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.2, help="Standard deviation of the stub latency")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of Gemini requests failing with 429")
+    parser.add_argument("--unavailable-rate", type=float, default=0.0, help="Share of Gemini requests failing with 503")
+    parser.add_argument("--ig-delay", type=float, default=0.05, help="Latency of the fake Instagram API in seconds")
+    parser.add_argument("--pace-scale", type=float, default=0.0,
+                        help="Multiplier of the bot's humanizing delays (0 measures the bot alone)")
+    parser.add_argument("--network-feed", action="store_true", help="Read captions from the feed's network responses")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the Gemini stub")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args(argv)
+
+def configure_environment(args, workdir, instagram, gemini):
+    """Point the bot at the fake servers and a throwaway data directory
+
+    Must run before any project module is imported, since secret.py reads the
+    environment at import time.
+    """
+    driver_path = os.getenv("CHROMEDRIVER_PATH") or shutil.which("chromedriver")
+    if not driver_path:
+        sys.exit("chromedriver not found: set CHROMEDRIVER_PATH or put it on PATH (the benchmark never downloads it).")
+
+    os.environ.update({
+        "IG_BASE_URL": instagram.base_url,
+        "GEMINI_API_ENDPOINT": gemini.endpoint,
+        "CHROMEDRIVER_PATH": driver_path,
+        "IG_LEAN_PROFILE": "true",
+        "IG_NETWORK_FEED": "true" if args.network_feed else "false",
+        "IG_WARM_BROWSERS": str(max(1, args.sessions - 1)),
+        "COMMENT_CACHE_DIR": "",
+        "LEDGER_PATH": os.path.join(workdir, "data", "ledger.sqlite3"),
+        "RATE_LIMIT_DIR": os.path.join(workdir, "data", "ratelimits"),
+    })
+    for index in range(5):
+        os.environ[f"GEMINI_API_KEY_{index + 1}"] = f"bench-key-{index + 1}"
+
+def build_report(args, results, wall_time, instagram, gemini, metrics):
+    totals = results["totals"]
+    # Client-side spans of every stage (see utils/metrics.py)
+    stages = metrics.stage_summary()
+    # Gemini requests as seen by the agent, every key and attempt together
+    stages["llm_request"] = metrics.summarize("agent_request_seconds", "outcome", outcome="ok").get(
+        "ok", {"count": 0, "p50": None, "p95": None})
+
+    # Gemini requests as seen by the stub
+    stages["llm_request (server)"] = summarize([request["duration"] for request in gemini.requests if request["status"] == "OK"])
+
+    # Login form submissions until the feed page is served
+    login_times = []
+    for login in instagram.events_of("login"):
+        feed_pages = [event["time"] for event in instagram.events_of("feed_page")
+                      if event["account"] == login["account"] and event["time"] >= login["time"]]
+        if feed_pages:
+            login_times.append(min(feed_pages) - login["time"])
+    stages["login (server)"] = summarize(login_times)
+
+    # From the feed page to the account's first comment, and between consecutive comments
+    first_comment_times = []
+    comment_intervals = []
+    for account in {event["account"] for event in instagram.events_of("feed_page")}:
+        feed_page = min(event["time"] for event in instagram.events_of("feed_page") if event["account"] == account)
+        comments = sorted(event["time"] for event in instagram.events_of("comment") if event["account"] == account)
+        if comments:
+            first_comment_times.append(comments[0] - feed_page)
+        comment_intervals.extend(later - earlier for earlier, later in zip(comments, comments[1:]))
+    stages["time_to_first_comment"] = summarize(first_comment_times)
+    stages["comment_interval"] = summarize(comment_intervals)
+
+    statuses = {}
+    for request in gemini.requests:
+        statuses[request["status"]] = statuses.get(request["status"], 0) + 1
+
+    return {
+        "config": {
+            "posts": args.posts,
+            "accounts": args.accounts,
+            "sessions": args.sessions,
+            "llm_latency": args.llm_latency,
+            "rate_limit_rate": args.rate_limit_rate,
+            "unavailable_rate": args.unavailable_rate,
+            "pace_scale": args.pace_scale,
+        },
+        "wall_time": wall_time,
+        "posts_per_minute": totals["posts"] / wall_time * 60 if wall_time > 0 else 0.0,
+        "totals": totals,
+        "comments_received": len(instagram.events_of("comment")),
+        "llm_requests": statuses,
+        "stages": stages,
+        "metrics": metrics.snapshot(),
+    }
+
+def print_report(report):
+    totals = report["totals"]
+    print(f"\n{report['config']['accounts']} accounts x {report['config']['posts']} posts "
+          f"in {report['wall_time']:.1f}s: {report['posts_per_minute']:.1f} posts/min")
+    print(f"posts {totals['posts']}, liked {totals['liked']}, commented {totals['commented']}, "
+          f"errors {totals['errors']}, failed accounts {totals['failed']}")
+    print(f"comments received by the server: {report['comments_received']}")
+    print("LLM requests: " + ", ".join(f"{status} {count}" for status, count in sorted(report["llm_requests"].items())))
+    print(f"\n{'stage':<24}{'count':>8}{'p50 (s)':>12}{'p95 (s)':>12}")
+    for name, stage in report["stages"].items():
+        p50 = f"{stage['p50']:.3f}" if stage["p50"] is not None else "-"
+        p95 = f"{stage['p95']:.3f}" if stage["p95"] is not None else "-"
+        print(f"{name:<24}{stage['count']:>8}{p50:>12}{p95:>12}")
+
+def check_report(report):
+    """Get the reasons the run did not measure what it is meant to
+
+    Returns:
+        list: Problems found, empty when the run is usable
+    """
+    problems = []
+    requests = sum(report["llm_requests"].values())
+    if requests == 0:
+        problems.append("the Gemini stub received no request, so the LLM path was not exercised")
+    elif report["llm_requests"].get("OK", 0) == 0:
+        problems.append(f"none of the {requests} Gemini requests succeeded")
+    if report["totals"]["posts"] > 0 and report["comments_received"] == 0:
+        problems.append("the fake Instagram received no comment")
+    return problems
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = tempfile.mkdtemp(prefix="ig-bench-")
+    instagram = FakeInstagram(posts_per_account=args.posts, response_delay=args.ig_delay, shared_feed=args.shared_feed).start()
+    gemini = FakeGemini(latency=args.llm_latency, jitter=args.llm_jitter, rate_limit_rate=args.rate_limit_rate,
+                        unavailable_rate=args.unavailable_rate, seed=args.seed).start()
+    configure_environment(args, workdir, instagram, gemini)
+    # Screenshots and the driver path cache land in the working directory
+    previous_dir = os.getcwd()
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(workdir)
+
+    try:
+        from config.logger import setup_logger
+        from client.runner import run_instagram_accounts
+        from utils.action_log import action_log
+        from utils.metrics import metrics
+        from utils.pacing import pacer
+        from utils.rate_limit import rate_limiter
+
+        setup_logger()
+        pacer.scale = args.pace_scale
+        # The fake feed has no quotas; keep the benchmark's actions out of the real log
+        rate_limiter.policies = {}
+        action_log.path = os.path.join(workdir, "data", "actions.jsonl")
+        # Leave the real tweet history alone instead of migrating it into the throwaway log
+        action_log.legacy_tweets_path = None
+
+        accounts = [{
+            "username": f"bench_user_{index}",
+            "password": "bench",
+            "cookies_path": os.path.join(workdir, "cookies", f"bench_user_{index}_session.json"),
+        } for index in range(args.accounts)]
+
+        started = time.monotonic()
+        results = asyncio.run(run_instagram_accounts(accounts, args.sessions))
+        wall_time = time.monotonic() - started
+
+        report = build_report(args, results, wall_time, instagram, gemini, metrics)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_report(report)
+        problems = check_report(report)
+        for problem in problems:
+            print(f"FAIL: {problem}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+        return report
+    finally:
+        os.chdir(previous_dir)
+        instagram.stop()
+        gemini.stop()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
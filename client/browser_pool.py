@@ -0,0 +1,311 @@
+import asyncio
+import json
+import os
+from config.logger import logger
+from secret import CHROMEDRIVER_PATH, IG_WARM_BROWSERS, IG_LEAN_PROFILE, IG_NETWORK_FEED
+from utils.fileio import atomic_write_json
+from utils.session_store import session_store
+
+# Where the resolved driver path is remembered between runs
+DRIVER_CACHE_PATH = "./data/chromedriver.json"
+
+_driver_path = None
+
+# Regular, visible browser (the bot's historical behaviour)
+DEFAULT_PROFILE = {
+    "headless": False,
+    "window_size": None,
+    "block_images": False,
+    "block_media": False,
+    "blocked_urls": [],
+    "performance_log": False,  # Network events for client/ingest.py, see IG_NETWORK_FEED
+}
+
+# Headless browser with a small viewport that skips images, video and trackers.
+# The bot only reads captions and clicks buttons, so none of them are needed.
+LEAN_PROFILE = {
+    "headless": True,
+    "window_size": "800,1000",
+    "block_images": True,
+    "block_media": True,
+    "blocked_urls": [
+        "*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.heic*",
+        "*.mp4*", "*.m4s*", "*.m4a*", "*.webm*",
+        "*.woff*", "*.ttf*",
+        "*/logging_client_events*", "*/ajax/bz*", "*/falco*",
+        "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*facebook.com/tr*",
+    ],
+    "performance_log": False,
+}
+
+def get_browser_profile(account=None):
+    """Get the browser profile of an account
+
+    Accounts use the lean profile when their roster entry sets `"lean": true` (or
+    IG_LEAN_PROFILE is set and the entry does not say otherwise). The performance
+    log is enabled when IG_NETWORK_FEED is set. A `"profile"` object in the entry
+    overrides individual settings.
+
+    Args:
+        account: Account dict from the roster
+
+    Returns:
+        dict: The profile settings
+    """
+    account = account or {}
+    base = LEAN_PROFILE if account.get("lean", IG_LEAN_PROFILE) else DEFAULT_PROFILE
+    return {**base, "performance_log": IG_NETWORK_FEED, **account.get("profile", {})}
+
+def resolve_driver_path():
+    """Resolve the chromedriver binary once and remember it
+
+    A pinned local driver (CHROMEDRIVER_PATH) is used as is and never touches the
+    network. Otherwise the path resolved by webdriver-manager is cached in memory
+    and on disk, so later runs skip version resolution entirely.
+
+    Returns:
+        str: Path of the chromedriver binary
+    """
+    global _driver_path
+    if _driver_path:
+        return _driver_path
+
+    if CHROMEDRIVER_PATH:
+        _driver_path = CHROMEDRIVER_PATH
+        return _driver_path
+
+    try:
+        with open(DRIVER_CACHE_PATH, "r") as f:
+            cached_path = json.load(f).get("path")
+        if cached_path and os.access(cached_path, os.X_OK):
+            _driver_path = cached_path
+            return _driver_path
+    except (FileNotFoundError, ValueError):
+        pass
+
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    logger.info("Resolving chromedriver...")
+    _driver_path = ChromeDriverManager().install()
+    try:
+        atomic_write_json(DRIVER_CACHE_PATH, {"path": _driver_path})
+    except Exception as error:
+        logger.warning(f"Could not cache chromedriver path: {error}")
+    return _driver_path
+
+def forget_driver_path():
+    """Drop the resolved chromedriver path from memory and disk"""
+    global _driver_path
+    _driver_path = None
+    try:
+        os.remove(DRIVER_CACHE_PATH)
+    except FileNotFoundError:
+        pass
+
+def build_chrome_options(profile):
+    """Build the Chrome options of a browser profile"""
+    from selenium.webdriver.chrome.options import Options
+
+    # Setup Chrome options
+    chrome_options = Options()
+    if profile["headless"]:
+        chrome_options.add_argument("--headless=new")
+    if profile["window_size"]:
+        chrome_options.add_argument(f"--window-size={profile['window_size']}")
+    else:
+        chrome_options.add_argument("--start-maximized")
+
+    if profile["block_images"]:
+        # Neither download nor decode images
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    if profile["block_media"]:
+        chrome_options.add_argument("--autoplay-policy=user-gesture-required")
+        chrome_options.add_argument("--mute-audio")
+    if profile.get("performance_log"):
+        # Lets FeedIngestor read the feed responses instead of scraping captions
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+    # Set up proxy if needed
+    # chrome_options.add_argument(f'--proxy-server=http://localhost:8000')
+
+    return chrome_options
+
+def apply_profile(browser, profile):
+    """Block the profile's URL patterns in a browser session through CDP"""
+    if not profile["blocked_urls"]:
+        return
+    try:
+        browser.execute_cdp_cmd("Network.enable", {})
+        browser.execute_cdp_cmd("Network.setBlockedURLs", {"urls": profile["blocked_urls"]})
+    except Exception as error:
+        logger.warning(f"Could not block URLs through CDP: {str(error)}")
+
+def create_browser(profile=None):
+    """Create a new Chrome browser instance (blocking)
+
+    Args:
+        profile: Browser profile settings, defaults to DEFAULT_PROFILE
+    """
+    # Selenium is only loaded once a browser is actually started
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
+    from selenium.common.exceptions import SessionNotCreatedException
+
+    profile = profile or DEFAULT_PROFILE
+    try:
+        browser = webdriver.Chrome(service=Service(resolve_driver_path()), options=build_chrome_options(profile))
+    except SessionNotCreatedException:
+        if CHROMEDRIVER_PATH:
+            raise
+        # Chrome was updated past the cached driver; resolve a matching one once
+        logger.warning("Cached chromedriver does not match Chrome, resolving it again...")
+        forget_driver_path()
+        browser = webdriver.Chrome(service=Service(resolve_driver_path()), options=build_chrome_options(profile))
+    apply_profile(browser, profile)
+    return browser
+
+def is_healthy(browser):
+    """Check that a browser session still responds"""
+    try:
+        browser.execute_script("return document.readyState;")
+        return True
+    except Exception:
+        return False
+
+def reset_browser(browser, profile):
+    """Drop the previous account's session before handing the browser out again"""
+    browser.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    browser.get("about:blank")
+    if profile.get("performance_log"):
+        # Discard the previous account's network events
+        browser.get_log("performance")
+
+class BrowserPool:
+    """Pool of warm Chrome sessions handed out to account runs
+
+    Sessions can be pre-launched for an account with its cookies already applied
+    (`warm()`). Released sessions that pass a health check have their cookies
+    cleared and are kept for the next account using the same browser profile, up
+    to `max_idle` of them, so back-to-back runs skip Chrome's cold start. Blocking
+    WebDriver calls run in worker threads (asyncio.to_thread).
+    """
+
+    def __init__(self, max_idle=1):
+        self.max_idle = max_idle
+        self._idle = {}  # profile key -> sessions without cookies
+        self._warm = {}  # cookies path -> session with that account's cookies applied
+        self._profile_keys = {}  # session id -> profile key
+        self._warming = 0
+
+    @staticmethod
+    def _profile_key(profile):
+        return json.dumps(profile, sort_keys=True)
+
+    @property
+    def idle_count(self):
+        return sum(len(browsers) for browsers in self._idle.values())
+
+    @property
+    def can_warm(self):
+        """Whether another session can be pre-launched without exceeding max_idle"""
+        return self.idle_count + len(self._warm) + self._warming < self.max_idle
+
+    @staticmethod
+    async def _is_healthy(browser):
+        return await asyncio.to_thread(is_healthy, browser)
+
+    async def _create(self, profile):
+        browser = await asyncio.to_thread(create_browser, profile)
+        self._profile_keys[browser.session_id] = self._profile_key(profile)
+        return browser
+
+    async def _take(self, profile):
+        """Get a healthy idle session of the profile, or start a new one"""
+        idle = self._idle.get(self._profile_key(profile), [])
+        while idle:
+            browser = idle.pop()
+            if await self._is_healthy(browser):
+                return browser
+            await self._quit(browser)
+        return await self._create(profile)
+
+    async def _quit(self, browser):
+        self._profile_keys.pop(browser.session_id, None)
+        try:
+            await asyncio.to_thread(browser.quit)
+        except Exception as error:
+            logger.warning(f"Error closing browser: {str(error)}")
+
+    async def _apply_session(self, browser, cookies_path):
+        if await session_store.has_valid_session(cookies_path):
+            logger.info("Loading cookies...:🚧")
+            await session_store.inject(browser, cookies_path)
+
+    async def warm(self, account):
+        """Pre-launch a session for an account with its cookies applied
+
+        Args:
+            account: Account dict with username, password and cookies_path
+        """
+        cookies_path = account["cookies_path"]
+        if cookies_path in self._warm:
+            return
+
+        self._warming += 1
+        try:
+            browser = await self._take(get_browser_profile(account))
+            await self._apply_session(browser, cookies_path)
+        finally:
+            self._warming -= 1
+        self._warm[cookies_path] = browser
+        logger.info(f"Warm browser session ready for {account['username']}.")
+
+    async def acquire(self, account):
+        """Get a healthy session for an account, with its cookies applied
+
+        Args:
+            account: Account dict with username, password and cookies_path
+
+        Returns:
+            WebDriver: The browser session
+        """
+        cookies_path = account["cookies_path"]
+
+        browser = self._warm.pop(cookies_path, None)
+        if browser is not None:
+            if await self._is_healthy(browser):
+                return browser
+            await self._quit(browser)
+
+        browser = await self._take(get_browser_profile(account))
+        await self._apply_session(browser, cookies_path)
+        return browser
+
+    async def release(self, browser):
+        """Return a session; it is kept for reuse if it is healthy and the pool has room
+
+        Args:
+            browser: Session returned by acquire()
+        """
+        profile_key = self._profile_keys.get(browser.session_id)
+        if profile_key is not None and self.idle_count < self.max_idle and await self._is_healthy(browser):
+            try:
+                await asyncio.to_thread(reset_browser, browser, json.loads(profile_key))
+                self._idle.setdefault(profile_key, []).append(browser)
+                return
+            except Exception as error:
+                logger.warning(f"Could not reset browser for reuse: {str(error)}")
+
+        await self._quit(browser)
+
+    async def close(self):
+        """Quit every pooled session"""
+        browsers = [browser for idle in self._idle.values() for browser in idle] + list(self._warm.values())
+        self._idle = {}
+        self._warm = {}
+        await asyncio.gather(*(self._quit(browser) for browser in browsers))
+
+# Shared browser pool used by every account run
+browser_pool = BrowserPool(max_idle=IG_WARM_BROWSERS)
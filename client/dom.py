@@ -0,0 +1,68 @@
+from selenium.common.exceptions import NoSuchElementException
+
+# Placeholder caption used for posts without text
+NO_POST_CONTENT = "No text content found in this post."
+
+# Collects everything the interaction loop needs from one article. Shared by every
+# script that returns article snapshots.
+SNAPSHOT_ARTICLE_FUNCTION = """
+function snapshotArticle(article) {
+    const viewportHeight = window.innerHeight || document.documentElement.clientHeight;
+    const permalink = article.querySelector("a[href*='/p/'], a[href*='/reel/']");
+    const href = permalink ? permalink.getAttribute('href') : null;
+    const match = href ? href.match(/\\/(?:p|reel)\\/([^\\/?#]+)/) : null;
+
+    const likeSvg = article.querySelector(
+        "div[class*='_aamw'] > button svg[aria-label='Like'], div[class*='_aamw'] > button svg[aria-label='Unlike']");
+    const commentSvg = article.querySelector("div[class*='_aamx'] > button svg[aria-label='Comment']");
+    const caption = article.querySelector("div[class*='_a9zs']");
+    const rect = article.getBoundingClientRect();
+
+    return {
+        article: article,
+        shortcode: match ? match[1] : null,
+        href: href,
+        like_label: likeSvg ? likeSvg.getAttribute('aria-label') : null,
+        like_button: likeSvg ? likeSvg.closest('button') : null,
+        comment_button: commentSvg ? commentSvg.closest('button') : null,
+        caption: caption ? caption.innerText : null,
+        visible: rect.bottom > 0 && rect.top < viewportHeight,
+    };
+}
+"""
+
+# Snapshots the given list of article elements, or every article in the page
+SNAPSHOT_ARTICLES_SCRIPT = SNAPSHOT_ARTICLE_FUNCTION + """
+const articles = arguments[0] || Array.from(document.querySelectorAll('article'));
+return articles.filter((article) => article && article.isConnected).map(snapshotArticle);
+"""
+
+def snapshot_articles(browser, articles=None):
+    """Get a structured snapshot of feed articles with a single WebDriver call
+
+    Args:
+        browser: Selenium WebDriver instance
+        articles: Article elements to snapshot, or None for every article in the page
+
+    Returns:
+        list: One dict per article with `article`, `shortcode`, `href`, `like_label`,
+              `like_button`, `comment_button`, `caption` and `visible`. Element values
+              are WebElements, or None when the element was not found.
+    """
+    return browser.execute_script(SNAPSHOT_ARTICLES_SCRIPT, articles) or []
+
+def get_snapshot_content(snapshot):
+    """Get the caption of a snapshotted post, or a placeholder if it has none"""
+    caption = (snapshot["caption"] or "").strip()
+    return caption or NO_POST_CONTENT
+
+def require_element(snapshot, name, post_index):
+    """Get an element handle from a snapshot
+
+    Raises:
+        NoSuchElementException: If the element was not found in the article
+    """
+    element = snapshot.get(name)
+    if element is None:
+        raise NoSuchElementException(f"{name} not found in snapshot of post {post_index}")
+    return element
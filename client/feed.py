@@ -0,0 +1,136 @@
+from collections import deque
+from config.logger import logger
+from client.dom import SNAPSHOT_ARTICLE_FUNCTION, snapshot_articles
+
+# Installs a MutationObserver that queues every article attached to the feed, plus the
+# articles already in the page. Each article element is queued at most once.
+INSTALL_FEED_OBSERVER_SCRIPT = """
+if (window.__igFeedTracker) {
+    return false;
+}
+
+const tracker = { queue: [] };
+const enqueue = (node) => {
+    if (!(node instanceof Element)) {
+        return;
+    }
+    const articles = node.tagName === 'ARTICLE' ? [node] : Array.from(node.querySelectorAll('article'));
+    for (const article of articles) {
+        if (!article.__igFeedQueued) {
+            article.__igFeedQueued = true;
+            tracker.queue.push(article);
+        }
+    }
+};
+
+document.querySelectorAll('article').forEach(enqueue);
+tracker.observer = new MutationObserver((mutations) => {
+    for (const mutation of mutations) {
+        mutation.addedNodes.forEach(enqueue);
+    }
+});
+tracker.observer.observe(document.body, { childList: true, subtree: true });
+window.__igFeedTracker = tracker;
+return true;
+"""
+
+# Takes up to arguments[0] newly attached articles off the queue and snapshots them.
+# Returns null when the observer is gone (e.g. after a navigation).
+DRAIN_FEED_SCRIPT = SNAPSHOT_ARTICLE_FUNCTION + """
+const tracker = window.__igFeedTracker;
+if (!tracker) {
+    return null;
+}
+return tracker.queue.splice(0, arguments[0])
+    .filter((article) => article.isConnected)
+    .map(snapshotArticle);
+"""
+
+class FeedTracker:
+    """Incrementally track feed posts by their shortcode
+
+    A page-side MutationObserver queues articles as Instagram attaches them, so each
+    drain only returns articles that were not seen before, no matter how deep the
+    feed has been scrolled. Posts are identified by their permalink shortcode and
+    kept in a seen-set, so re-rendered or re-attached posts are never processed twice.
+    Posts for which `skip(key)` returns True are dropped before they are queued.
+    """
+
+    def __init__(self, browser, batch_size=10, skip=None):
+        self.browser = browser
+        self.batch_size = batch_size
+        self.skip = skip
+        self.skipped = 0
+        self.seen = set()
+        self._pending = deque()
+        self._anonymous_count = 0
+
+    def install(self):
+        """Install the page-side observer (again after a navigation)"""
+        if self.browser.execute_script(INSTALL_FEED_OBSERVER_SCRIPT):
+            logger.debug("Feed observer installed.")
+
+    def _fill(self):
+        """Move newly attached, unseen posts into the pending queue
+
+        Returns:
+            int: Number of posts added
+        """
+        while True:
+            snapshots = self.browser.execute_script(DRAIN_FEED_SCRIPT, self.batch_size)
+            if snapshots is None:
+                self.install()
+                snapshots = self.browser.execute_script(DRAIN_FEED_SCRIPT, self.batch_size) or []
+            if not snapshots:
+                return 0
+
+            added = 0
+            for snapshot in snapshots:
+                key = snapshot["shortcode"]
+                if not key:
+                    self._anonymous_count += 1
+                    key = f"anonymous-{self._anonymous_count}"
+                if key in self.seen:
+                    continue
+                self.seen.add(key)
+                if self.skip is not None and self.skip(key):
+                    self.skipped += 1
+                    logger.debug(f"Skipping already processed post {key}")
+                    continue
+                snapshot["key"] = key
+                self._pending.append(snapshot)
+                added += 1
+
+            # Keep draining when the whole batch was already seen or skipped
+            if added:
+                return added
+
+    def next_post(self):
+        """Get the next unprocessed post
+
+        Returns:
+            dict: The post's snapshot with its `key`, or None if no new post is attached
+        """
+        while not self._pending:
+            if self._fill() == 0:
+                return None
+        return self._pending.popleft()
+
+    def peek(self, count):
+        """Get up to `count` upcoming posts without consuming them"""
+        while len(self._pending) < count:
+            if self._fill() == 0:
+                break
+        return list(self._pending)[:count]
+
+    def refresh(self, snapshot):
+        """Re-snapshot a post, keeping its key"""
+        fresh = snapshot_articles(self.browser, [snapshot["article"]])
+        if not fresh:
+            return snapshot
+        fresh[0]["key"] = snapshot["key"]
+        return fresh[0]
+
+    def mark_seen(self, key):
+        """Mark a post as processed without draining it from the page"""
+        self.seen.add(key)
@@ -0,0 +1,168 @@
+import base64
+import json
+import re
+from collections import OrderedDict
+from selenium.common.exceptions import WebDriverException
+from config.logger import logger
+from utils.metrics import metrics
+
+# Responses that carry feed posts: the v1 timeline API and GraphQL queries
+FEED_URL_PATTERN = re.compile(r"/api/v1/feed/timeline/|/graphql/query|/api/graphql")
+
+def _caption_text(media):
+    caption = media.get("caption")
+    if isinstance(caption, dict):
+        return caption.get("text")
+    if isinstance(caption, str):
+        return caption
+    # Older GraphQL shape
+    edges = (media.get("edge_media_to_caption") or {}).get("edges") or []
+    if edges:
+        return (edges[0].get("node") or {}).get("text")
+    return None
+
+def _to_record(media):
+    """Build a post record from a media object, or None if it is not one"""
+    shortcode = media.get("code") or media.get("shortcode")
+    media_id = media.get("pk") or media.get("id")
+    if not shortcode or not media_id or not isinstance(shortcode, str):
+        return None
+    if not any(key in media for key in ("caption", "edge_media_to_caption", "user", "owner")):
+        return None
+    author = media.get("user") or media.get("owner") or {}
+    return {
+        "id": str(media_id).split("_")[0],
+        "shortcode": shortcode,
+        "caption": _caption_text(media),
+        "author": author.get("username"),
+        "has_liked": bool(media.get("has_liked", media.get("viewer_has_liked", False))),
+    }
+
+def parse_feed_response(data):
+    """Extract the posts of a feed response
+
+    Walks the whole payload for media objects, so the v1 timeline
+    (`feed_items[].media_or_ad`) and the GraphQL connection shapes
+    (`edges[].node.media`) are handled alike. Carousel children are not reported
+    on their own.
+
+    Args:
+        data: Parsed JSON of a feed response
+
+    Returns:
+        list: Post records with `id`, `shortcode`, `caption`, `author` and `has_liked`, in feed order
+    """
+    records = []
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            record = _to_record(node)
+            if record is not None:
+                records.append(record)
+                continue
+            stack.extend(reversed(list(node.values())))
+    return records
+
+class FeedIngestor:
+    """Read feed posts from the network responses the page already receives
+
+    Chrome's performance log (enabled by the `performance_log` browser profile
+    setting) reports every response; the bodies of feed responses are fetched with
+    CDP Network.getResponseBody and parsed into post records keyed by shortcode.
+    Captions are therefore known for a whole feed page as soon as it is loaded,
+    before its posts are attached or scrolled into view, and without DOM queries.
+    If the log is not available the ingestor disables itself and the DOM snapshots
+    are used as before.
+    """
+
+    def __init__(self, browser, url_pattern=FEED_URL_PATTERN):
+        self.browser = browser
+        self.url_pattern = url_pattern
+        self.enabled = True
+        self.records = OrderedDict()  # shortcode -> record, in feed order
+        self.discarded = set()  # shortcodes left out of upcoming()
+        self._pending = {}  # request id -> URL of feed responses still loading
+
+    def __contains__(self, shortcode):
+        return shortcode in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, shortcode):
+        """Get the record of a post, or None if it was not seen on the network"""
+        return self.records.get(shortcode)
+
+    def _read_body(self, request_id):
+        body = self.browser.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        text = body.get("body") or ""
+        if body.get("base64Encoded"):
+            text = base64.b64decode(text).decode("utf-8", errors="replace")
+        # Some endpoints prefix their JSON with an anti-hijacking guard
+        if text.startswith("for (;;);"):
+            text = text[len("for (;;);"):]
+        return json.loads(text)
+
+    def poll(self):
+        """Ingest the feed responses received since the last poll
+
+        Returns:
+            list: Records of posts that were not known yet
+        """
+        if not self.enabled:
+            return []
+        try:
+            entries = self.browser.get_log("performance")
+        except (WebDriverException, ValueError) as error:
+            logger.warning(f"Performance log unavailable, reading captions from the page instead: {str(error).strip()}")
+            self.enabled = False
+            return []
+
+        new_records = []
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            method = message.get("method")
+            params = message.get("params", {})
+
+            if method == "Network.responseReceived":
+                url = params.get("response", {}).get("url", "")
+                if self.url_pattern.search(url):
+                    self._pending[params.get("requestId")] = url
+            elif method == "Network.loadingFinished" and params.get("requestId") in self._pending:
+                url = self._pending.pop(params["requestId"])
+                try:
+                    records = parse_feed_response(self._read_body(params["requestId"]))
+                except (WebDriverException, ValueError) as error:
+                    logger.debug(f"Could not read feed response {url}: {str(error).strip()}")
+                    continue
+                for record in records:
+                    if record["shortcode"] not in self.records:
+                        self.records[record["shortcode"]] = record
+                        new_records.append(record)
+            elif method == "Network.loadingFailed":
+                self._pending.pop(params.get("requestId"), None)
+
+        if new_records:
+            metrics.counter("instagram_feed_records_total", "Posts read from feed network responses").inc(len(new_records))
+            logger.debug(f"Ingested {len(new_records)} post(s) from feed responses.")
+        return new_records
+
+    def discard(self, shortcode):
+        """Leave a post out of upcoming(), e.g. one that is never attached to the feed"""
+        self.discarded.add(shortcode)
+
+    def upcoming(self, count, exclude=()):
+        """Get up to `count` known posts, in feed order, whose shortcode is not excluded or discarded"""
+        upcoming = []
+        for shortcode, record in self.records.items():
+            if len(upcoming) >= count:
+                break
+            if shortcode not in exclude and shortcode not in self.discarded:
+                upcoming.append(record)
+        return upcoming
@@ -1,60 +1,75 @@
+import asyncio
 import os
-import time
 import random
 import json
-from selenium import webdriver
+from urllib.parse import urlparse
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-from user_agents import parse as user_agent_parse
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
 
-from config.logger import logger
-from secret import IGusername, IGpassword
-from utils import instagram_cookies_exist, load_cookies, save_cookies
+from config.logger import logger, sampled_logger, bind_context, reset_context
+from secret import IGusername, IGpassword, IG_BASE_URL, IG_TYPING_MODE, IG_NETWORK_FEED
+from utils import get_cookies_path
 from agent import run_agent
+from agent.cache import comment_cache
+from agent.prefetch import CommentPrefetcher
+from agent.resilience import Failure
 from agent.schema import get_instagram_comment_schema
+from client.browser_pool import browser_pool
+from client.dom import get_snapshot_content, require_element
+from client.feed import FeedTracker
+from client.ingest import FeedIngestor
+from client.text_input import enter_text
+from client.waits import DomWait, presence_of_element_located, element_to_be_clickable, page_clock, wait_for_comment
+from utils.action_log import action_log
+from utils.checkpoint import checkpoint_store
+from utils.ledger import interaction_ledger
+from utils.metrics import metrics
+from utils.pacing import pacer
+from utils.rate_limit import rate_limiter
+from utils.session_store import session_store
 
-async def run_instagram():
-    """Main function to run the Instagram bot"""
-    # Setup Chrome options
-    chrome_options = Options()
-    chrome_options.add_argument("--start-maximized")
-    # chrome_options.add_argument("--headless")  # Uncomment for headless mode
+# Host the browser must be on after logging in
+IG_HOST = urlparse(IG_BASE_URL).netloc
+
+# Console prompts of concurrent sessions are asked one at a time
+console_lock = asyncio.Lock()
+
+def default_account():
+    """Returns the single account configured in secret.py"""
+    return {
+        "username": IGusername,
+        "password": IGpassword,
+        "cookies_path": get_cookies_path(),
+    }
+
+async def run_instagram(account=None, resume=False):
+    """Main function to run the Instagram bot
     
-    # Set up proxy if needed
-    # chrome_options.add_argument(f'--proxy-server=http://localhost:8000')
+    Args:
+        account: Account dict with username, password and cookies_path.
+                 Defaults to the account configured in secret.py
+        resume: Continue from the account's last checkpoint, if it has one
+                 
+    Returns:
+        dict: Interaction results for the account
+    """
+    account = account or default_account()
+    cookies_path = account["cookies_path"]
+    result = {"username": account["username"], "posts": 0, "liked": 0, "commented": 0, "errors": 0, "ok": False}
+    context_token = bind_context(account=account["username"])
+    checkpoint = checkpoint_store.load(account["username"]) if resume else None
+    rate_limiter.configure(account)
+    if resume and checkpoint is None:
+        logger.info("No checkpoint to resume from, starting a new session.")
     
-    # Create a new Chrome browser instance
-    service = Service(ChromeDriverManager().install())
-    browser = webdriver.Chrome(service=service, options=chrome_options)
+    # Get a warm browser (or start one off the event loop) with the account's cookies applied
+    browser = await browser_pool.acquire(account)
     
     try:
-        # Check if cookies exist and load them
-        if await instagram_cookies_exist():
-            logger.info("Loading cookies...:🚧")
-            cookies = await load_cookies("./cookies/Instagramcookies.json")
-            
-            # Navigate to Instagram domain first (required to set cookies)
-            browser.get("https://www.instagram.com")
-            
-            # Add cookies to browser
-            for cookie in cookies:
-                # Some cookie attributes might cause issues, so we only set the essential ones
-                cookie_dict = {
-                    'name': cookie['name'],
-                    'value': cookie['value'],
-                    'domain': cookie['domain'],
-                    'path': cookie['path']
-                }
-                # Add expiry if it exists
-                if 'expires' in cookie:
-                    cookie_dict['expiry'] = cookie['expires']
-                    
-                browser.add_cookie(cookie_dict)
+        # Cookies are read once and cached by the session store
+        has_session = await session_store.has_valid_session(cookies_path)
         
         # Set a random PC user-agent
         user_agent = random.choice(["Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
@@ -63,84 +78,93 @@ async def run_instagram():
         logger.info(f"Using user-agent: {user_agent}")
         
         # Check if cookies are valid
-        if await instagram_cookies_exist():
-            logger.info("Cookies loaded, skipping login...")
-            browser.get("https://www.instagram.com")
-            
-            # Check if login was successful by verifying page content
-            try:
-                WebDriverWait(browser, 10).until(
-                    EC.presence_of_element_located((By.XPATH, "//a[contains(@href, '/direct/inbox/')]")))                
-                logger.info("Login verified with cookies.")
-            except TimeoutException:
-                logger.warning("Cookies invalid or expired. Logging in again...")
-                await login_with_credentials(browser)
-        else:
-            # If no cookies are available, perform login with credentials
-            await login_with_credentials(browser)
+        with metrics.span("login", account=account["username"]):
+            if has_session:
+                logger.info("Cookies loaded, skipping login...")
+                await asyncio.to_thread(browser.get, IG_BASE_URL)
+                
+                # Check if login was successful by verifying page content
+                try:
+                    await asyncio.to_thread(DomWait(browser, 10).until,
+                        presence_of_element_located((By.XPATH, "//a[contains(@href, '/direct/inbox/')]")))
+                    logger.info("Login verified with cookies.")
+                except TimeoutException:
+                    logger.warning("Cookies invalid or expired. Logging in again...")
+                    await login_with_credentials(browser, account)
+            else:
+                # If no cookies are available, perform login with credentials
+                await login_with_credentials(browser, account)
         
         # Take a screenshot after loading the page (with error handling)
         try:
-            browser.save_screenshot("logged_in.png")
+            await asyncio.to_thread(browser.save_screenshot, f"logged_in_{account['username']}.png")
             logger.info("Screenshot saved successfully.")
         except Exception as screenshot_error:
             logger.warning(f"Could not save screenshot: {str(screenshot_error)}. Continuing anyway...")
             # Continue with the rest of the functionality
         
         # Navigate to the Instagram homepage
-        browser.get("https://www.instagram.com/")
+        await asyncio.to_thread(browser.get, f"{IG_BASE_URL}/")
         
         # Interact with posts
-        await interact_with_posts(browser)
+        result.update(await interact_with_posts(browser, account["username"], checkpoint=checkpoint))
+        result["ok"] = True
         
     except Exception as e:
         logger.error(f"Error in Instagram automation: {str(e)}")
     finally:
-        # Close the browser
-        browser.quit()
+        # Hand the browser back to the pool, which reuses or closes it
+        await browser_pool.release(browser)
+        reset_context(context_token)
+    
+    return result
 
-async def login_with_credentials(browser):
+async def login_with_credentials(browser, account=None):
     """Login to Instagram with credentials
     
     Args:
         browser: Selenium WebDriver instance
+        account: Account dict with username, password and cookies_path
     """
+    account = account or default_account()
     try:
-        browser.get("https://www.instagram.com/accounts/login/")
-        WebDriverWait(browser, 10).until(
-            EC.presence_of_element_located((By.NAME, "username")))
+        await asyncio.to_thread(browser.get, f"{IG_BASE_URL}/accounts/login/")
+        await asyncio.to_thread(DomWait(browser, 10).until,
+            presence_of_element_located((By.NAME, "username")))
         
         # Fill out the login form
-        username_input = browser.find_element(By.NAME, "username")
-        password_input = browser.find_element(By.NAME, "password")
+        username_input = await asyncio.to_thread(browser.find_element, By.NAME, "username")
+        password_input = await asyncio.to_thread(browser.find_element, By.NAME, "password")
         
-        username_input.send_keys(IGusername)
-        password_input.send_keys(IGpassword)
+        await asyncio.to_thread(username_input.send_keys, account["username"])
+        await asyncio.to_thread(password_input.send_keys, account["password"])
         
         # Click login button
-        login_button = browser.find_element(By.XPATH, "//button[@type='submit']")
-        login_button.click()
+        login_button = await asyncio.to_thread(browser.find_element, By.XPATH, "//button[@type='submit']")
+        await asyncio.to_thread(login_button.click)
         
         try:
             # Wait for potential 2FA challenge
-            verification_code_input = WebDriverWait(browser, 10).until(
-                EC.presence_of_element_located((By.NAME, "verificationCode")))
+            verification_code_input = await asyncio.to_thread(DomWait(browser, 10).until,
+                presence_of_element_located((By.NAME, "verificationCode")))
             
             logger.info("2FA code required. Please enter the code sent to your device:")
             
-            # Get 2FA code from user input
-            verification_code = input('Enter 2FA code: ').strip()
+            # Get 2FA code from user input, without blocking the other sessions
+            async with console_lock:
+                verification_code = await asyncio.to_thread(input, f"Enter 2FA code for {account['username']}: ")
+            verification_code = verification_code.strip()
             
             if not verification_code:
                 raise Exception("No 2FA code entered.")
             
-            verification_code_input.send_keys(verification_code)
-            confirm_button = browser.find_element(By.XPATH, "//button[contains(text(), 'Confirm')]")
-            confirm_button.click()
+            await asyncio.to_thread(verification_code_input.send_keys, verification_code)
+            confirm_button = await asyncio.to_thread(browser.find_element, By.XPATH, "//button[contains(text(), 'Confirm')]")
+            await asyncio.to_thread(confirm_button.click)
             
             # Wait for navigation after submitting 2FA code
-            WebDriverWait(browser, 15).until(
-                EC.url_contains("instagram.com/"))
+            await asyncio.to_thread(WebDriverWait(browser, 15).until,
+                EC.url_contains(f"{IG_HOST}/"))
             logger.info("2FA code submitted successfully.")
             
         except TimeoutException:
@@ -149,15 +173,15 @@ async def login_with_credentials(browser):
             
             # Wait for navigation after login
             try:
-                WebDriverWait(browser, 15).until(
-                    EC.url_contains("instagram.com/"))
+                await asyncio.to_thread(WebDriverWait(browser, 15).until,
+                    EC.url_contains(f"{IG_HOST}/"))
                 logger.info("Navigation successful after login attempt.")
             except TimeoutException:
                 logger.warning("Navigation after login attempt failed or timed out.")
                 
                 # Check if login actually succeeded despite navigation issues
                 try:
-                    inbox_link = browser.find_element(By.XPATH, "//a[contains(@href, '/direct/inbox/')]")
+                    inbox_link = await asyncio.to_thread(browser.find_element, By.XPATH, "//a[contains(@href, '/direct/inbox/')]")
                     if not inbox_link:
                         logger.error("Login failed. Please check credentials or account status.")
                         raise Exception("Instagram login failed.")
@@ -168,185 +192,400 @@ async def login_with_credentials(browser):
         
         # Save cookies after successful login
         logger.info("Saving cookies...")
-        cookies = browser.get_cookies()
-        await save_cookies("./cookies/Instagramcookies.json", cookies)
-        logger.info("Cookies saved successfully.")
+        cookies = await asyncio.to_thread(browser.get_cookies)
+        await session_store.save(account["cookies_path"], cookies)
         
     except Exception as error:
         logger.error(f"Error during login process: {str(error)}")
         raise error
 
-async def interact_with_posts(browser):
+def build_comment_prompt(post_content):
+    """Build the comment generation prompt for a post's caption"""
+    return f"Generate an engaging comment for this Instagram post. Post content: {post_content}"
+
+def get_post_content(post, ingestor=None):
+    """Get a post's caption, from its feed network record when there is one
+
+    Args:
+        post: Post snapshot from the page, or record from the FeedIngestor
+        ingestor: FeedIngestor of the session, if network ingestion is enabled
+    """
+    record = ingestor.get(post.get("key") or post.get("shortcode")) if ingestor is not None else None
+    return get_snapshot_content(record or post)
+
+async def interact_with_posts(browser, username=None, checkpoint=None):
     """Interact with Instagram posts
     
+    The session state is checkpointed periodically and when the loop stops, and
+    the checkpoint is deleted once the loop has finished.
+    
     Args:
         browser: Selenium WebDriver instance
+        username: Username of the logged in account, used to avoid repeating comments
+        checkpoint: State saved by an earlier, interrupted session to continue from
+        
+    Returns:
+        dict: Counts of processed, liked and commented posts and errors
     """
+    username = username or IGusername
     post_index = 1  # Start with the first post
     max_posts = 50  # Limit to prevent infinite scrolling
+    prefetch_depth = 6  # Number of upcoming posts whose comments are generated ahead
+    prefetch_batch_size = 3  # Number of posts packed into one comment generation request
+    rate_limit_max_wait = 900  # Skip an action instead of waiting longer than this for its budget
+    stats = {"posts": 0, "liked": 0, "commented": 0, "errors": 0}
+    prefetcher = CommentPrefetcher(get_instagram_comment_schema(), max_pending=prefetch_depth, batch_size=prefetch_batch_size)
     
-    while post_index <= max_posts:
-        try:
-            # Wait for posts to load
-            WebDriverWait(browser, 10).until(
-                EC.presence_of_element_located((By.TAG_NAME, "article")))
-            
-            # Get all posts
-            posts = browser.find_elements(By.TAG_NAME, "article")
-            
-            # Check if we've reached the end of posts
-            if post_index > len(posts):
-                logger.info("No more posts found. Exiting loop...")
-                break
-            
-            # Get the current post
-            post = posts[post_index - 1]
-            
-            # --- Like Button Logic ---
-            max_retries = 3
-            retry_count = 0
-            
-            while retry_count < max_retries:
-                try:
-                    # Find the like button within the post
-                    like_button = post.find_element(By.XPATH, ".//div[contains(@class, '_aamw')]/button[.//*[name()='svg'][@aria-label='Like' or @aria-label='Unlike']]")
-                    like_svg = like_button.find_element(By.XPATH, ".//svg[@aria-label='Like' or @aria-label='Unlike']")
-                    
-                    aria_label = like_svg.get_attribute("aria-label")
+    post_contents = {}  # post key -> caption, for posts extracted ahead of the cursor
+    # Posts this account already commented on in an earlier run are skipped up front
+    tracker = FeedTracker(browser, skip=lambda key: interaction_ledger.has(username, key, "comment"))
+    # Captions of whole feed pages, read from the network before their posts are on screen
+    ingestor = FeedIngestor(browser) if IG_NETWORK_FEED else None
+    network_ahead = {}  # post key -> post_index when a post not attached yet was prefetched
+    processed = []  # Keys of the posts handled by this session, in order
+    stopped = False  # Stopped before the end of the feed, so the session can be resumed
+    finished = False
+    
+    if checkpoint:
+        # Continue where the interrupted session stopped: its posts are not visited
+        # again and the comments it generated ahead are served from the cache
+        post_index = checkpoint["post_index"]
+        stats.update(checkpoint["stats"])
+        processed = list(checkpoint["processed"])
+        for key in processed:
+            tracker.mark_seen(key)
+        restored = prefetcher.restore(checkpoint["pending_comments"])
+        logger.info(f"Resuming after post {checkpoint['last_post']} at post {post_index} "
+                    f"({len(processed)} posts done, {restored} generated comments restored).")
+    
+    def session_state():
+        return {
+            "last_post": processed[-1] if processed else None,
+            "post_index": post_index,
+            "stats": stats,
+            "processed": processed,
+            "pending_comments": prefetcher.export(),
+        }
+    
+    context_token = bind_context(post=None)
+    
+    try:
+        while post_index <= max_posts:
+            post_key = None
+            if checkpoint_store.due(username):
+                checkpoint_store.save(username, session_state())
+            try:
+                with metrics.span("feed_wait", account=username):
+                    # Wait for posts to load
+                    await asyncio.to_thread(DomWait(browser, 10).until,
+                        presence_of_element_located((By.TAG_NAME, "article")))
                     
-                    if aria_label == "Like":
-                        logger.info(f"Liking post {post_index} (attempt {retry_count + 1}/{max_retries})...")
-                        like_button.click()
-                        logger.info(f"Post {post_index} liked successfully.")
-                        break
-                    elif aria_label == "Unlike":
-                        logger.info(f"Post {post_index} is already liked.")
-                        break
-                    else:
-                        logger.warning(f"Like button SVG found but label is unexpected for post {post_index}: {aria_label}")
+                    # Get the next post that was attached to the feed and not processed yet
+                    post = await asyncio.to_thread(tracker.next_post)
+                    if post is None:
+                        # Scroll so Instagram attaches more posts, then check once more
+                        await asyncio.to_thread(browser.execute_script, "window.scrollBy(0, window.innerHeight);")
+                        await pacer.jitter(1, 2)
+                        post = await asyncio.to_thread(tracker.next_post)
+                
+                # Check if we've reached the end of posts
+                if post is None:
+                    logger.info("No more posts found. Exiting loop...")
+                    break
+                
+                post_key = post["key"]
+                bind_context(post=post_key)
+                
+                # Network records that never got attached as a feed post (suggestions,
+                # stories, hovercards...) would hold their prefetch slot forever
+                for ahead_key, scheduled_at in list(network_ahead.items()):
+                    if ahead_key in tracker.seen:
+                        del network_ahead[ahead_key]
+                    elif post_index - scheduled_at >= prefetch_depth:
+                        logger.debug(f"Post {ahead_key} was not attached within {prefetch_depth} posts, dropping it.")
+                        prefetcher.cancel(ahead_key)
+                        post_contents.pop(ahead_key, None)
+                        ingestor.discard(ahead_key)
+                        del network_ahead[ahead_key]
+                
+                # Start generating comments for this post and the next few ones, waiting
+                # until a whole batch fits unless the current post has nothing pending
+                ahead_items = []
+                refill = post_key not in prefetcher or prefetch_depth - len(prefetcher) >= prefetch_batch_size
+                upcoming = await asyncio.to_thread(tracker.peek, min(prefetch_depth - 1, max_posts - post_index))
+                ahead_posts = [(ahead_post["key"], ahead_post) for ahead_post in [post] + upcoming]
+                if ingestor is not None:
+                    await asyncio.to_thread(ingestor.poll)
+                    # Posts received over the network but not attached to the page yet
+                    ahead_posts += [
+                        (record["shortcode"], record)
+                        for record in ingestor.upcoming(min(prefetch_depth, max_posts - post_index - len(upcoming)), exclude=tracker.seen)
+                        if not interaction_ledger.has(username, record["shortcode"], "comment")
+                    ]
+                for ahead_key, ahead_post in ahead_posts:
+                    if not refill or len(prefetcher) + len(ahead_items) >= prefetch_depth:
                         break
-                except NoSuchElementException as error:
-                    retry_count += 1
-                    logger.warning(f"Like button not found for post {post_index} (attempt {retry_count}/{max_retries}): {str(error)}")
-                    if retry_count < max_retries:
-                        time.sleep(random.uniform(2, 5))
-                        browser.execute_script("window.scrollBy(0, 100);")  # Small scroll to potentially reveal button
-                    else:
-                        logger.error(f"Failed to find like button for post {post_index} after {max_retries} attempts")
+                    if ahead_key in prefetcher or ahead_key in post_contents:
                         continue
-                except Exception as error:
-                    retry_count += 1
-                    logger.warning(f"Attempt {retry_count}/{max_retries} failed for post {post_index}: {str(error)}")
-                    if retry_count < max_retries:
-                        time.sleep(random.uniform(2, 5))
-                    else:
-                        logger.error(f"Failed to like post {post_index} after {max_retries} attempts: {str(error)}")
-                        continue
-            
-            # --- Comment Logic ---
-            max_retries = 3
-            retry_count = 0
-            
-            while retry_count < max_retries:
-                try:
-                    # Find the comment button
-                    comment_button = post.find_element(By.XPATH, ".//div[contains(@class, '_aamx')]/button[.//*[name()='svg'][@aria-label='Comment']]")
-                    comment_button.click()
-                    
-                    # Wait for comment box to appear
-                    WebDriverWait(browser, 5).until(
-                        EC.presence_of_element_located((By.XPATH, "//div[contains(@role, 'textbox')][@aria-label='Add a comment…']")))
-                    
-                    # Get post content for context
+                    post_contents[ahead_key] = get_post_content(ahead_post, ingestor)
+                    ahead_items.append((ahead_key, build_comment_prompt(post_contents[ahead_key])))
+                prefetcher.schedule_many(ahead_items)
+                network_ahead.update((ahead_key, post_index) for ahead_key, _ in ahead_items
+                                     if ahead_key not in tracker.seen and ahead_key in prefetcher)
+                
+                # The post's feed network record, if it was read from a feed response
+                record = ingestor.get(post_key) if ingestor is not None else None
+                own_post = record is not None and record["author"] == username
+                
+                # --- Like Button Logic ---
+                max_retries = 3
+                retry_count = 0
+                should_like = True
+                if record is not None and record["has_liked"]:
+                    # Known from the feed response, no need to look at the button
+                    logger.info(f"Post {post_index} is already liked.")
+                    should_like = False
+                
+                while should_like and retry_count < max_retries:
                     try:
-                        post_text = post.find_element(By.XPATH, ".//div[contains(@class, '_a9zs')]")
-                        post_content = post_text.text
-                    except:
-                        post_content = "No text content found in this post."
-                    
-                    # Generate comment using AI
-                    prompt = f"Generate an engaging comment for this Instagram post. Post content: {post_content}"
-                    logger.info(f"Generating comment for post {post_index} (attempt {retry_count + 1}/{max_retries})...")
-                    
-                    schema = get_instagram_comment_schema()
-                    comment_data = await run_agent(schema, prompt)
-                    
-                    if comment_data and isinstance(comment_data, list) and len(comment_data) > 0:
-                        # Get the first comment from the list
-                        comment = comment_data[0].get('comment', '')
+                        # Like button and its state come from the post snapshot
+                        like_button = require_element(post, "like_button", post_index)
+                        aria_label = post["like_label"]
                         
-                        # Sanitize comment (remove quotes, etc.)
-                        comment = comment.strip().replace('"', '')
-                        
-                        if comment:
-                            # Find comment textarea and post button
-                            comment_textarea = browser.find_element(By.XPATH, "//textarea[@aria-label='Add a comment…' or @placeholder='Add a comment…']")
-                            
-                            logger.info(f"Typing comment on post {post_index}...")
-                            comment_textarea.click()
-                            comment_textarea.clear()
-                            comment_textarea.send_keys(comment)
+                        if aria_label == "Like":
+                            if not await rate_limiter.acquire(username, "like", max_wait=rate_limit_max_wait):
+                                logger.info(f"Skipping like on post {post_index}, like budget exhausted.")
+                                break
+                            sampled_logger.info(f"Liking post {post_index} (attempt {retry_count + 1}/{max_retries})...")
+                            with metrics.span("like", account=username):
+                                await asyncio.to_thread(like_button.click)
+                            stats["liked"] += 1
+                            metrics.counter("instagram_likes_total", "Posts liked", account=username).inc()
+                            action_log.append("like", username, post=post_key)
+                            if post["shortcode"]:
+                                interaction_ledger.record(username, post_key, "like")
+                            logger.info(f"Post {post_index} liked successfully.")
+                            break
+                        elif aria_label == "Unlike":
+                            logger.info(f"Post {post_index} is already liked.")
+                            break
+                        else:
+                            logger.warning(f"Like button SVG found but label is unexpected for post {post_index}: {aria_label}")
+                            break
+                    except NoSuchElementException as error:
+                        retry_count += 1
+                        metrics.counter("instagram_retries_total", "Retried like and comment attempts", account=username, action="like").inc()
+                        sampled_logger.warning(f"Like button not found for post {post_index} (attempt {retry_count}/{max_retries}): {str(error)}")
+                        if retry_count < max_retries:
+                            await pacer.jitter(2, 5)
+                            await asyncio.to_thread(browser.execute_script, "window.scrollBy(0, 100);")  # Small scroll to potentially reveal button
+                            post = await asyncio.to_thread(tracker.refresh, post)
+                        else:
+                            logger.error(f"Failed to find like button for post {post_index} after {max_retries} attempts")
+                            continue
+                    except Exception as error:
+                        retry_count += 1
+                        metrics.counter("instagram_retries_total", "Retried like and comment attempts", account=username, action="like").inc()
+                        sampled_logger.warning(f"Attempt {retry_count}/{max_retries} failed for post {post_index}: {str(error)}")
+                        if retry_count < max_retries:
+                            await pacer.jitter(2, 5)
+                        else:
+                            logger.error(f"Failed to like post {post_index} after {max_retries} attempts: {str(error)}")
+                            continue
+                
+                # --- Comment Logic ---
+                max_retries = 3
+                retry_count = 0
+                
+                # Only spend an LLM call when the comment fits the account's budget. The budget
+                # itself is taken right before typing, so a comment that is never posted costs none.
+                if own_post:
+                    logger.info(f"Skipping comment on post {post_index}, it was posted by this account.")
+                    can_comment = False
+                else:
+                    can_comment = await rate_limiter.wait_available(username, "comment", max_wait=rate_limit_max_wait)
+                    if not can_comment:
+                        logger.info(f"Skipping comment on post {post_index}, comment budget exhausted.")
+                comment_budget_taken = False  # Kept across retries of the same comment
+                
+                while can_comment and retry_count < max_retries:
+                    try:
+                        # Comment button comes from the post snapshot
+                        comment_button = require_element(post, "comment_button", post_index)
+                        with metrics.span("comment_box", account=username):
+                            await asyncio.to_thread(comment_button.click)
                             
-                            # Find and click post button
-                            post_button = WebDriverWait(browser, 5).until(
-                                EC.element_to_be_clickable((By.XPATH, "//div[contains(text(), 'Post') and @role='button']")))                        
+                            # Wait for comment box to appear
+                            await asyncio.to_thread(DomWait(browser, 5).until,
+                                presence_of_element_located((By.XPATH, "//div[contains(@role, 'textbox')][@aria-label='Add a comment…']")))
+                        
+                        # Get post content for context
+                        if post_key not in post_contents:
+                            post_contents[post_key] = get_post_content(post, ingestor)
+                        
+                        # Generate comment using AI (usually already prefetched)
+                        prompt = build_comment_prompt(post_contents[post_key])
+                        sampled_logger.info(f"Generating comment for post {post_index} (attempt {retry_count + 1}/{max_retries})...")
+                        
+                        # Only the part of the generation the loop actually waits for
+                        with metrics.span("comment_generation", account=username):
+                            comment_data = await prefetcher.get(post_key, prompt)
+                        
+                        if comment_data and isinstance(comment_data, list) and len(comment_data) > 0:
+                            # Get the first comment this account has not posted yet, since
+                            # identical prompts share cached responses
+                            candidate = comment_cache.pick(comment_data, username)
+                            if candidate is None:
+                                logger.info(f"Cached comments for post {post_index} were all used by this account, generating new ones...")
+                                comment_data = await run_agent(prefetcher.schema, prompt, use_cache=False, stream=True)
+                                if isinstance(comment_data, Failure):
+                                    logger.warning(f"Failed to generate new comments for post {post_index}: {comment_data}")
+                                    break
+                                candidate = comment_cache.pick(comment_data, username)
+                            comment = (candidate or {}).get('comment', '')
                             
-                            logger.info(f"Posting comment on post {post_index}...")
-                            post_button.click()
+                            # Sanitize comment (remove quotes, etc.)
+                            comment = comment.strip().replace('"', '')
                             
-                            # Verify comment was posted
-                            try:
-                                WebDriverWait(browser, 5).until(
-                                    EC.presence_of_element_located((By.XPATH, f"//div[contains(text(), '{comment[:20]}')]")))
-                                logger.info(f"Comment posted on post {post_index} successfully.")
+                            if comment:
+                                if not comment_budget_taken:
+                                    if await asyncio.to_thread(rate_limiter.try_acquire, username, "comment") > 0:
+                                        # Taken meanwhile by another run of this account; never wait with the box open
+                                        logger.info(f"Skipping comment on post {post_index}, comment budget exhausted.")
+                                        break
+                                    comment_budget_taken = True
+                                
+                                # Find comment textarea and post button
+                                comment_textarea = await asyncio.to_thread(
+                                    browser.find_element, By.XPATH, "//textarea[@aria-label='Add a comment…' or @placeholder='Add a comment…']")
+                                
+                                logger.info(f"Typing comment on post {post_index}...")
+                                with metrics.span("typing", account=username):
+                                    await enter_text(browser, comment_textarea, comment, mode=IG_TYPING_MODE)
+                                
+                                # Find and click post button
+                                with metrics.span("posting", account=username):
+                                    post_button = await asyncio.to_thread(DomWait(browser, 5).until,
+                                        element_to_be_clickable((By.XPATH, "//div[contains(text(), 'Post') and @role='button']")))
+                                    
+                                    logger.info(f"Posting comment on post {post_index}...")
+                                    submitted_at = await asyncio.to_thread(page_clock, browser)
+                                    await asyncio.to_thread(post_button.click)
+                                
+                                # Verify comment was posted, from the comment endpoint's response or the post's own comments.
+                                # A comment that cannot be confirmed is not posted again, so it costs no further LLM call.
+                                try:
+                                    with metrics.span("verification", account=username):
+                                        confirmation = await asyncio.to_thread(
+                                            wait_for_comment, browser, post["article"], comment, submitted_at, 5)
+                                except WebDriverException as error:  # Includes TimeoutException
+                                    logger.warning(f"Could not verify comment was posted for post {post_index}: {str(error).strip()}")
+                                    metrics.counter("instagram_comments_unverified_total", "Comments that could not be confirmed",
+                                                    account=username).inc()
+                                    break
+                                
+                                if not confirmation["posted"]:
+                                    logger.warning(f"Comment on post {post_index} was rejected (HTTP {confirmation['status']}).")
+                                    metrics.counter("instagram_comments_rejected_total", "Comments rejected by Instagram",
+                                                    account=username).inc()
+                                    break
+                                
+                                stats["commented"] += 1
+                                metrics.counter("instagram_comments_total", "Comments posted", account=username).inc()
+                                action_log.append("comment", username, post=post_key)
+                                comment_cache.record_posted(username, candidate["comment"])
+                                if post["shortcode"]:
+                                    interaction_ledger.record(username, post_key, "comment")
+                                logger.info(f"Comment posted on post {post_index} successfully (confirmed by {confirmation['via']}).")
+                                break
+                            else:
+                                logger.warning(f"Generated comment for post {post_index} was empty after sanitization.")
                                 break
-                            except TimeoutException:
-                                logger.warning(f"Could not verify comment was posted for post {post_index}")
-                                continue
                         else:
-                            logger.warning(f"Generated comment for post {post_index} was empty after sanitization.")
+                            logger.warning(f"Failed to generate a valid comment for post {post_index}. Received: {comment_data if isinstance(comment_data, Failure) else json.dumps(comment_data)}")
                             break
-                    else:
-                        logger.warning(f"Failed to generate a valid comment for post {post_index}. Received: {json.dumps(comment_data)}")
-                        break
-                except NoSuchElementException as error:
-                    retry_count += 1
-                    logger.warning(f"Comment button not found for post {post_index} (attempt {retry_count}/{max_retries}): {str(error)}")
-                    if retry_count < max_retries:
-                        time.sleep(random.uniform(2, 5))
-                        browser.execute_script("window.scrollBy(0, 100);")
-                    else:
-                        logger.error(f"Failed to find comment button for post {post_index} after {max_retries} attempts")
-                        continue
-                except Exception as error:
-                    retry_count += 1
-                    logger.warning(f"Attempt {retry_count}/{max_retries} failed for post {post_index}: {str(error)}")
-                    if retry_count < max_retries:
-                        time.sleep(random.uniform(2, 5))
-                    else:
-                        logger.error(f"Failed to comment on post {post_index} after {max_retries} attempts: {str(error)}")
-                        continue
-            
-            # Scroll to the next post
-            browser.execute_script("arguments[0].scrollIntoView();", posts[min(post_index, len(posts) - 1)])
-            
-            # Random delay between 3-7 seconds
-            delay = random.uniform(3000, 7000)
-            logger.info(f"Waiting {(delay / 1000):.1f} seconds before scrolling to the next post...")
-            time.sleep(delay / 1000)
-            
-            # Increment post index
-            post_index += 1
-            
-        except Exception as error:
-            logger.error(f"Error interacting with post {post_index}: {str(error)}")
-            # Save screenshot of failed interaction for debugging
-            try:
-                browser.save_screenshot(f"error_post_{post_index}.png")
-                logger.info(f"Saved screenshot of failed post interaction: error_post_{post_index}.png")
-            except Exception as screenshot_error:
-                logger.warning(f"Could not save screenshot of failed interaction: {str(screenshot_error)}")
-            
-            # Random delay before retrying or moving to next post
-            time.sleep(random.uniform(3, 7))
-            post_index += 1  # Move to the next post even if there's an error
\ No newline at end of file
+                    except NoSuchElementException as error:
+                        retry_count += 1
+                        metrics.counter("instagram_retries_total", "Retried like and comment attempts", account=username, action="comment").inc()
+                        sampled_logger.warning(f"Comment button not found for post {post_index} (attempt {retry_count}/{max_retries}): {str(error)}")
+                        if retry_count < max_retries:
+                            await pacer.jitter(2, 5)
+                            await asyncio.to_thread(browser.execute_script, "window.scrollBy(0, 100);")
+                            post = await asyncio.to_thread(tracker.refresh, post)
+                        else:
+                            logger.error(f"Failed to find comment button for post {post_index} after {max_retries} attempts")
+                            continue
+                    except Exception as error:
+                        retry_count += 1
+                        metrics.counter("instagram_retries_total", "Retried like and comment attempts", account=username, action="comment").inc()
+                        sampled_logger.warning(f"Attempt {retry_count}/{max_retries} failed for post {post_index}: {str(error)}")
+                        if retry_count < max_retries:
+                            await pacer.jitter(2, 5)
+                        else:
+                            logger.error(f"Failed to comment on post {post_index} after {max_retries} attempts: {str(error)}")
+                            continue
+                
+                stats["posts"] += 1
+                metrics.counter("instagram_posts_total", "Posts processed", account=username).inc()
+                
+                # Drop a generation that was not consumed because the post was skipped
+                prefetcher.cancel(post_key)
+                post_contents.pop(post_key, None)
+                processed.append(post_key)
+                
+                # Scroll to the next post, or further down so more posts get attached
+                upcoming = await asyncio.to_thread(tracker.peek, 1)
+                if upcoming:
+                    await asyncio.to_thread(browser.execute_script, "arguments[0].scrollIntoView();", upcoming[0]["article"])
+                else:
+                    await asyncio.to_thread(browser.execute_script, "window.scrollBy(0, window.innerHeight);")
+                
+                # Random delay between 3-7 seconds
+                delay = random.uniform(3000, 7000)
+                logger.info(f"Waiting {(delay / 1000):.1f} seconds before scrolling to the next post...")
+                if not await pacer.sleep(delay / 1000):
+                    logger.info("Pacing cancelled, stopping interaction loop.")
+                    stopped = True
+                    break
+                
+                # Increment post index
+                post_index += 1
+                
+            except Exception as error:
+                logger.error(f"Error interacting with post {post_index}: {str(error)}")
+                stats["errors"] += 1
+                metrics.counter("instagram_errors_total", "Posts that failed with an error", account=username).inc()
+                if post_key is not None:
+                    prefetcher.cancel(post_key)
+                    post_contents.pop(post_key, None)
+                    processed.append(post_key)
+                # Save screenshot of failed interaction for debugging
+                try:
+                    screenshot_path = f"error_{username}_post_{post_index}.png"
+                    await asyncio.to_thread(browser.save_screenshot, screenshot_path)
+                    logger.info(f"Saved screenshot of failed post interaction: {screenshot_path}")
+                except Exception as screenshot_error:
+                    logger.warning(f"Could not save screenshot of failed interaction: {str(screenshot_error)}")
+                
+                # Random delay before retrying or moving to next post
+                if not await pacer.jitter(3, 7):
+                    logger.info("Pacing cancelled, stopping interaction loop.")
+                    stopped = True
+                    break
+                post_index += 1  # Move to the next post even if there's an error
+        finished = not stopped
+    finally:
+        if finished:
+            checkpoint_store.clear(username)
+        else:
+            # Interrupted (crash, cancellation): keep what is needed to resume
+            checkpoint_store.save(username, session_state())
+        # Stop generations for posts the loop never reached
+        prefetcher.cancel_all()
+        reset_context(context_token)
+    
+    stats["skipped"] = tracker.skipped
+    metrics.counter("instagram_posts_skipped_total", "Posts skipped because they were already processed",
+                    account=username).inc(tracker.skipped)
+    
+    return stats
@@ -0,0 +1,58 @@
+import asyncio
+
+from config.logger import logger
+from client.browser_pool import browser_pool
+from client.instagram import run_instagram
+from utils.pacing import pacer
+
+async def run_instagram_accounts(accounts, max_sessions=2, resume=False):
+    """Run the Instagram bot for several accounts in parallel
+    
+    At most `max_sessions` accounts run at any time on this host; the remaining
+    accounts wait for a free slot, and the next one gets a warm browser from the
+    pool while it waits.
+    
+    Args:
+        accounts: List of account dicts with username, password and cookies_path
+        max_sessions: Maximum number of concurrent browser sessions on this host
+        resume: Continue each account from its last checkpoint, if it has one
+        
+    Returns:
+        dict: Per-account results and their totals
+    """
+    sessions = asyncio.Semaphore(max(1, max_sessions))
+    
+    async def run_account(account):
+        # While every session slot is busy, pre-launch this account's browser
+        if sessions.locked() and browser_pool.can_warm:
+            try:
+                await browser_pool.warm(account)
+            except Exception as error:
+                logger.warning(f"Could not warm a browser for {account['username']}: {str(error)}")
+        
+        async with sessions:
+            if pacer.cancelled:
+                logger.info(f"Run stopped, not starting the session for {account['username']}.")
+                return {"username": account["username"], "posts": 0, "liked": 0, "commented": 0, "errors": 0, "ok": False}
+            logger.info(f"Starting Instagram session for {account['username']}...")
+            try:
+                result = await run_instagram(account, resume=resume)
+            except Exception as error:
+                logger.error(f"Instagram session for {account['username']} failed: {str(error)}")
+                result = {"username": account["username"], "posts": 0, "liked": 0, "commented": 0, "errors": 1, "ok": False}
+            logger.info(f"Instagram session for {account['username']} finished.")
+            return result
+    
+    try:
+        results = await asyncio.gather(*(run_account(account) for account in accounts))
+    finally:
+        await browser_pool.close()
+    
+    totals = {"accounts": len(results), "failed": 0, "posts": 0, "liked": 0, "commented": 0, "errors": 0}
+    for result in results:
+        if not result["ok"]:
+            totals["failed"] += 1
+        for key in ("posts", "liked", "commented", "errors"):
+            totals[key] += result[key]
+    
+    return {"accounts": results, "totals": totals}
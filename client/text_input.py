@@ -0,0 +1,88 @@
+import asyncio
+import random
+from selenium.common.exceptions import WebDriverException
+from utils.pacing import pacer
+
+# Focuses a text field and empties it through the native value setter, so React sees
+# the change; replaces the click() and clear() round trips.
+FOCUS_AND_CLEAR_SCRIPT = """
+const field = arguments[0];
+field.scrollIntoView({block: 'center'});
+field.focus();
+if (field.value) {
+    const setter = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(field), 'value').set;
+    setter.call(field, '');
+    field.dispatchEvent(new Event('input', {bubbles: true}));
+}
+return document.activeElement === field;
+"""
+
+# Sets the text through the native value setter and fires the events a keyboard
+# would, for drivers without CDP. Returns the resulting value.
+SET_VALUE_SCRIPT = """
+const [field, text] = arguments;
+const setter = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(field), 'value').set;
+field.focus();
+setter.call(field, text);
+field.dispatchEvent(new InputEvent('input', {bubbles: true, inputType: 'insertText', data: text}));
+field.dispatchEvent(new Event('change', {bubbles: true}));
+return field.value;
+"""
+
+def _insert(browser, text):
+    # Input.insertText inserts at the caret of the focused element like an IME commit,
+    # which fires beforeinput/input just as typing would
+    browser.execute_cdp_cmd("Input.insertText", {"text": text})
+
+def _chunks(text, chunk_size):
+    position = 0
+    while position < len(text):
+        size = random.randint(*chunk_size)
+        yield text[position:position + size]
+        position += size
+
+async def enter_text(browser, field, text, mode="fast", chunk_size=(4, 12), chunk_delay=(0.08, 0.35)):
+    """Replace the content of a text field
+
+    Modes:
+    - "fast": focus and clear the field with one script, then insert the whole text
+      with a single CDP Input.insertText command
+    - "human": same, but insert the text in chunks of `chunk_size` characters with a
+      `chunk_delay` pause between them, so the field fills up at a typing-like pace
+    - "keys": click(), clear() and WebDriver send_keys(), one key event per character
+
+    Without CDP (or if the inserted text did not land in the field) the value is set
+    through the native setter and the input events are fired from JavaScript.
+
+    Args:
+        browser: Selenium WebDriver instance
+        field: The textarea or input element
+        text: Text to enter
+        mode: "fast", "human" or "keys"
+
+    Returns:
+        str: The mode that was actually used ("fast", "human", "keys" or "script")
+    """
+    if mode == "keys":
+        await asyncio.to_thread(field.click)
+        await asyncio.to_thread(field.clear)
+        await asyncio.to_thread(field.send_keys, text)
+        return "keys"
+
+    await asyncio.to_thread(browser.execute_script, FOCUS_AND_CLEAR_SCRIPT, field)
+    try:
+        if mode == "human":
+            for index, chunk in enumerate(_chunks(text, chunk_size)):
+                if index > 0:
+                    await pacer.jitter(*chunk_delay)
+                await asyncio.to_thread(_insert, browser, chunk)
+        else:
+            await asyncio.to_thread(_insert, browser, text)
+        if await asyncio.to_thread(field.get_attribute, "value") == text:
+            return mode
+    except (AttributeError, WebDriverException):
+        # Not a Chromium driver, or the command was rejected
+        pass
+
+    await asyncio.to_thread(browser.execute_script, SET_VALUE_SCRIPT, field, text)
+    return "script"
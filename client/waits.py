@@ -0,0 +1,280 @@
+import time
+from contextlib import contextmanager
+from selenium.common.exceptions import (NoSuchFrameException, StaleElementReferenceException, TimeoutException,
+                                        WebDriverException)
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from config.logger import logger
+
+# Resolves as soon as the element matching the locator exists (and, in "clickable"
+# mode, is visible and enabled), using a MutationObserver instead of polling.
+# Resolves with null once the timeout elapses.
+WAIT_FOR_ELEMENT_SCRIPT = """
+const [by, value, mode, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+
+const find = () => {
+    let element = null;
+    if (by === 'xpath') {
+        element = document.evaluate(value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    } else {
+        element = document.querySelector(value);
+    }
+    if (element && mode === 'clickable') {
+        const visible = element.getClientRects().length > 0 && getComputedStyle(element).visibility !== 'hidden';
+        const enabled = !element.disabled && element.getAttribute('aria-disabled') !== 'true';
+        if (!visible || !enabled) {
+            return null;
+        }
+    }
+    return element;
+};
+
+const found = find();
+if (found) {
+    done(found);
+    return;
+}
+
+let finished = false;
+const finish = (element) => {
+    if (finished) {
+        return;
+    }
+    finished = true;
+    observer.disconnect();
+    clearTimeout(timer);
+    done(element);
+};
+const observer = new MutationObserver(() => {
+    const element = find();
+    if (element) {
+        finish(element);
+    }
+});
+observer.observe(document, { childList: true, subtree: true, attributes: true, characterData: true });
+const timer = setTimeout(() => finish(null), timeoutMs);
+"""
+
+# Selenium's default script timeout; longer waits raise it first
+DEFAULT_SCRIPT_TIMEOUT = 30
+
+# Messages of the errors raised when the page navigates away while a script runs
+NAVIGATION_ERROR_MARKERS = (
+    "document unloaded",
+    "execution context was destroyed",
+    "cannot find context",
+    "target frame detached",
+    "frame was detached",
+)
+
+def _interrupted_by_navigation(error):
+    """Whether a WebDriver error comes from the page or frame going away mid-script"""
+    if isinstance(error, (StaleElementReferenceException, NoSuchFrameException)):
+        return True
+    message = (error.msg or "").lower()
+    return any(marker in message for marker in NAVIGATION_ERROR_MARKERS)
+
+@contextmanager
+def _script_timeout(driver, timeout):
+    """Raise the driver's script timeout for a wait longer than the default, then restore it"""
+    if timeout < DEFAULT_SCRIPT_TIMEOUT:
+        yield
+        return
+    driver.set_script_timeout(timeout + 5)
+    try:
+        yield
+    finally:
+        driver.set_script_timeout(DEFAULT_SCRIPT_TIMEOUT)
+
+class DomCondition:
+    """Element condition evaluated page-side by DomWait
+
+    Calling it with a driver evaluates it the Selenium way, so it can also be passed
+    to a regular WebDriverWait.
+    """
+
+    def __init__(self, locator, mode):
+        self.locator = locator
+        self.mode = mode
+
+    def to_selenium(self):
+        if self.mode == "clickable":
+            return EC.element_to_be_clickable(self.locator)
+        return EC.presence_of_element_located(self.locator)
+
+    def __call__(self, driver):
+        return self.to_selenium()(driver)
+
+def presence_of_element_located(locator):
+    """Drop-in for EC.presence_of_element_located usable with DomWait"""
+    return DomCondition(locator, "present")
+
+def element_to_be_clickable(locator):
+    """Drop-in for EC.element_to_be_clickable usable with DomWait"""
+    return DomCondition(locator, "clickable")
+
+def _to_page_locator(locator):
+    """Translate a Selenium locator into an XPath or a CSS selector"""
+    by, value = locator
+    if by == By.XPATH:
+        return "xpath", value
+    if by == By.CSS_SELECTOR:
+        return "css", value
+    if by == By.TAG_NAME:
+        return "css", value
+    if by == By.ID:
+        return "css", f'[id="{value}"]'
+    if by == By.NAME:
+        return "css", f'[name="{value}"]'
+    if by == By.CLASS_NAME:
+        return "css", f".{value}"
+    raise ValueError(f"Unsupported locator strategy for DomWait: {by}")
+
+class DomWait:
+    """Event-driven replacement for WebDriverWait
+
+    `until()` issues one execute_async_script call that resolves the moment the
+    condition holds, instead of polling over the WebDriver protocol every 500 ms.
+    Timeouts raise TimeoutException like WebDriverWait does. Conditions other than
+    the ones from this module (e.g. EC.url_contains) fall back to WebDriverWait, as
+    does a wait interrupted by a navigation; other WebDriver errors are raised.
+    The call blocks, so async code runs it in a thread.
+    """
+
+    def __init__(self, driver, timeout):
+        self.driver = driver
+        self.timeout = timeout
+
+    def until(self, condition, message=""):
+        """Wait until the condition holds
+
+        Args:
+            condition: A condition from this module, or any WebDriverWait condition
+            message: Message of the TimeoutException
+
+        Returns:
+            The matching WebElement, or the condition's return value on fallback
+        """
+        if not isinstance(condition, DomCondition):
+            return WebDriverWait(self.driver, self.timeout).until(condition, message)
+
+        started = time.monotonic()
+        by, value = _to_page_locator(condition.locator)
+        try:
+            with _script_timeout(self.driver, self.timeout):
+                element = self.driver.execute_async_script(
+                    WAIT_FOR_ELEMENT_SCRIPT, by, value, condition.mode, int(self.timeout * 1000))
+        except TimeoutException:
+            raise
+        except WebDriverException as error:
+            if not _interrupted_by_navigation(error):
+                logger.warning(f"Waiting for {condition.locator} failed: {str(error).strip()}")
+                raise
+            # The page navigated away mid-wait; keep waiting the classic way
+            remaining = max(0, self.timeout - (time.monotonic() - started))
+            return WebDriverWait(self.driver, remaining).until(condition.to_selenium(), message)
+
+        if element is None:
+            raise TimeoutException(message or f"Timed out after {self.timeout}s waiting for {condition.locator}")
+        return element
+
+# Resolves once a just-posted comment is confirmed, either by the response of the
+# comment endpoint (Resource Timing entries started after `since`) or by the text
+# showing up in the post's own comment lists (the article and an open comment dialog).
+# Resolves with {posted: false} on an error response and with null on timeout.
+WAIT_FOR_COMMENT_SCRIPT = """
+const [article, text, since, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+const normalize = (value) => (value || '').replace(/\\s+/g, ' ').trim();
+const needle = normalize(text).slice(0, 60);
+const commentEndpoint = /\\/api\\/v1\\/web\\/comments\\/[^/]+\\/add\\/?/;
+
+const scopes = () => {
+    const roots = [article, ...document.querySelectorAll("div[role='dialog']")].filter((root) => root && root.isConnected);
+    const lists = roots.flatMap((root) => Array.from(root.querySelectorAll('ul')));
+    return lists.length > 0 ? lists : roots;
+};
+const checkDom = () => needle !== '' && scopes().some((scope) => normalize(scope.textContent).includes(needle));
+const checkNetwork = (entries) => {
+    for (const entry of entries) {
+        if (entry.startTime < since || !commentEndpoint.test(entry.name) || !entry.responseStatus) {
+            continue;
+        }
+        return {posted: entry.responseStatus < 400, via: 'network', status: entry.responseStatus};
+    }
+    return null;
+};
+
+let finished = false;
+let observer = null;
+let resources = null;
+let timer = null;
+const finish = (result) => {
+    if (finished) {
+        return;
+    }
+    finished = true;
+    if (observer) observer.disconnect();
+    if (resources) resources.disconnect();
+    clearTimeout(timer);
+    done(result);
+};
+
+const initial = checkNetwork(performance.getEntriesByType('resource'));
+if (initial) {
+    finish(initial);
+    return;
+}
+if (checkDom()) {
+    finish({posted: true, via: 'dom', status: null});
+    return;
+}
+
+observer = new MutationObserver(() => {
+    if (checkDom()) {
+        finish({posted: true, via: 'dom', status: null});
+    }
+});
+observer.observe(document, { childList: true, subtree: true, characterData: true });
+resources = new PerformanceObserver((list) => {
+    const result = checkNetwork(list.getEntries());
+    if (result) {
+        finish(result);
+    }
+});
+resources.observe({ type: 'resource' });
+timer = setTimeout(() => finish(null), timeoutMs);
+"""
+
+def page_clock(driver):
+    """Current time of the page's performance clock, in milliseconds"""
+    return driver.execute_script("return performance.now();")
+
+def wait_for_comment(driver, article, text, since, timeout):
+    """Wait until a posted comment is confirmed by the network or the post's comment list
+
+    Replaces a document-wide XPath on the comment text: the check only looks at the
+    article (and an open comment dialog), matches plain text so quotes need no
+    escaping, and also resolves on the comment endpoint's response.
+
+    Args:
+        driver: Selenium WebDriver instance
+        article: The post's article element
+        text: The comment that was posted
+        since: page_clock() value taken before the comment was submitted
+        timeout: Seconds to wait
+
+    Returns:
+        dict: {"posted": bool, "via": "network" or "dom", "status": HTTP status or None}.
+              "posted" is False when the comment endpoint answered with an error.
+
+    Raises:
+        TimeoutException: If neither confirmation arrived in time
+    """
+    with _script_timeout(driver, timeout):
+        result = driver.execute_async_script(WAIT_FOR_COMMENT_SCRIPT, article, text, since, int(timeout * 1000))
+    if result is None:
+        raise TimeoutException(f"Timed out after {timeout}s waiting for the comment to be confirmed")
+    return result
@@ -1,30 +1,148 @@
+import contextvars
+import json
 import os
 import sys
 from loguru import logger
 
-# Remove default logger
-logger.remove()
-
-# Add console logger with color formatting
-logger.add(
-    sys.stderr,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-    level="DEBUG" if os.getenv("NODE_ENV") != "production" else "INFO",
-    colorize=True
-)
-
-# Add file logger
-log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
-os.makedirs(log_dir, exist_ok=True)
-
-logger.add(
-    os.path.join(log_dir, "app.log"),
-    rotation="10 MB",  # Rotate when file reaches 10 MB
-    retention="1 week",  # Keep logs for 1 week
-    compression="zip",  # Compress rotated logs
-    format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - {message}",
-    level="DEBUG"
-)
+# Context (account, post...) attached to every record logged from the current task
+_log_context = contextvars.ContextVar("log_context", default={})
+
+def bind_context(**values):
+    """Attach values to every record logged from the current asyncio task
+
+    Returns:
+        Token: Pass it to reset_context() to restore the previous context
+    """
+    return _log_context.set({**_log_context.get(), **values})
+
+def reset_context(token):
+    """Restore the context that was active before bind_context()"""
+    _log_context.reset(token)
+
+def _add_context(record):
+    context = _log_context.get()
+    if context:
+        record["extra"].update(context)
+
+def parse_sample_rates(value):
+    """Parse "LEVEL=rate,..." into {level: rate}"""
+    rates = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        level, rate = item.split("=", 1)
+        rates[level.strip().upper()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+class SamplingFilter:
+    """Keep one in every 1/rate sampled records of each level
+
+    Only records logged through `sampled_logger` are sampled; every other record
+    passes. Sampling is deterministic, so a rate of 0.1 keeps the 1st, 11th, 21st...
+    sampled message of that level.
+    """
+
+    def __init__(self, rates):
+        self.rates = rates
+        self._counts = {}
+
+    def __call__(self, record):
+        if not record["extra"].get("sampled"):
+            return True
+        rate = self.rates.get(record["level"].name, 1.0)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        count = self._counts.get(record["level"].name, 0)
+        self._counts[record["level"].name] = count + 1
+        return count % round(1 / rate) == 0
+
+def _json_format(record):
+    """Format a record as one JSON line (stored in extra so loguru does not re-format it)"""
+    extra = {key: value for key, value in record["extra"].items() if key not in ("sampled", "_json")}
+    entry = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "module": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        **extra,
+    }
+    if record["exception"] is not None:
+        entry["exception"] = str(record["exception"].value)
+    record["extra"]["_json"] = json.dumps(entry, default=str)
+    return "{extra[_json]}\n"
+
+def _text_format(record):
+    context = " ".join(f"{key}={record['extra'][key]}" for key in ("account", "post") if record["extra"].get(key) is not None)
+    context = f"[{context}] ".replace("{", "{{").replace("}", "}}") if context else ""
+    return "{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function}:{line} - " + context + "{message}\n{exception}"
+
+_configured = False
+
+def setup_logger():
+    """Configure the console and file sinks (once)
+
+    Called by the entry points rather than at import time, so importing a module
+    never creates the log directory or opens files. Until then records go to
+    loguru's default stderr sink.
+
+    Logging mode:
+    - LOG_ASYNC: queue records to a background writer thread, which also rotates and
+      compresses the log file, so logging never blocks the event loop on file I/O
+    - LOG_FORMAT: "json" writes one JSON object per line (with the account/post
+      context) to the log file instead of plain text
+    - LOG_SAMPLE_RATES: keep only a share of the sampled (retry) messages per level,
+      e.g. "INFO=0.1,WARNING=0.5"
+    """
+    global _configured
+    if _configured:
+        return
+    _configured = True
+
+    # The logger is configured before secret.py runs, so read .env here too
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    log_async = (os.getenv("LOG_ASYNC") or "false").lower() in ("1", "true", "yes")
+    log_format = (os.getenv("LOG_FORMAT") or "text").lower()
+    sample_rates = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES") or "")
+
+    # Remove default logger
+    logger.remove()
+
+    # Add console logger with color formatting
+    logger.add(
+        sys.stderr,
+        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
+        level="DEBUG" if os.getenv("NODE_ENV") != "production" else "INFO",
+        colorize=True,
+        filter=SamplingFilter(sample_rates),
+        enqueue=log_async,
+    )
+
+    # Add file logger
+    log_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
+    os.makedirs(log_dir, exist_ok=True)
+
+    logger.add(
+        os.path.join(log_dir, "app.jsonl" if log_format == "json" else "app.log"),
+        rotation="10 MB",  # Rotate when file reaches 10 MB
+        retention="1 week",  # Keep logs for 1 week
+        compression="zip",  # Compress rotated logs
+        format=_json_format if log_format == "json" else _text_format,
+        level="DEBUG",
+        filter=SamplingFilter(sample_rates),
+        enqueue=log_async,  # Writes, rotation and compression happen in loguru's writer thread
+    )
+
+# Context is attached to records whether or not the sinks are configured yet
+logger.configure(patcher=_add_context)
+
+# Logger for noisy retry messages, thinned out according to LOG_SAMPLE_RATES
+sampled_logger = logger.bind(sampled=True)
 
 # Setup error handlers
 def setup_error_handlers():
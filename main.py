@@ -1,21 +1,144 @@
+import argparse
 import asyncio
 import os
-from config.logger import logger
-from client.instagram import run_instagram
-from utils import setup_handle_error
+import signal
+import sys
+from config.logger import logger, setup_logger
+from secret import IG_ACCOUNTS_FILE, IG_MAX_SESSIONS, METRICS_PORT, METRICS_DUMP_PATH, METRICS_DUMP_INTERVAL
+from utils import setup_handle_error, load_instagram_accounts
 
-# Ensure the cookies directory exists
-os.makedirs('./cookies', exist_ok=True)
+# Selenium, the Gemini SDK and the browser pool are only imported by run_agents(), so
+# --dry-run, --check-config and --quota start without loading them.
 
-async def run_agents():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the social media agents")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Show which accounts would run and how, without starting a browser or calling Gemini")
+    parser.add_argument("--check-config", action="store_true",
+                        help="Validate the account roster, API keys and paths, then exit")
+    parser.add_argument("--quota", action="store_true",
+                        help="Show each account's recent actions and remaining like/comment budget, then exit")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue each account from its last checkpoint instead of starting over")
+    return parser.parse_args(argv)
+
+async def dry_run():
+    """Log the accounts that would run and their settings"""
+    from client.browser_pool import get_browser_profile
+
+    accounts = await load_instagram_accounts(IG_ACCOUNTS_FILE)
+    logger.info(f"Dry run: {len(accounts)} account(s), {IG_MAX_SESSIONS} concurrent session(s).")
+    for account in accounts:
+        profile = get_browser_profile(account)
+        logger.info(f"{account['username']}: cookies {account['cookies_path']}, "
+                    f"{'headless' if profile['headless'] else 'visible'} browser")
+
+async def check_config():
+    """Check the configuration without starting a browser
+
+    Returns:
+        bool: True if no problem was found
+    """
+    from secret import gemini_api_keys, CHROMEDRIVER_PATH, IG_TYPING_MODE, RATE_LIMIT_BUDGETS
+
+    problems = []
+    try:
+        accounts = await load_instagram_accounts(IG_ACCOUNTS_FILE)
+        if not accounts:
+            problems.append(f"No usable account in {IG_ACCOUNTS_FILE}.")
+        for account in accounts:
+            if account["username"].startswith("default_") or account["password"].startswith("default_"):
+                problems.append(f"Account {account['username']} uses placeholder credentials.")
+            for action, budget in account.get("rate_limits", {}).items():
+                if (action not in RATE_LIMIT_BUDGETS or not isinstance(budget, dict)
+                        or not set(budget) <= {"per_hour", "burst", "per_day"}):
+                    problems.append(f"Account {account['username']} has an unknown rate limit: {action} {budget}.")
+    except Exception as error:
+        problems.append(f"Could not load the account roster: {error}")
+
+    valid_keys = [key for key in gemini_api_keys if key and not key.startswith("API_KEY_")]
+    if not valid_keys:
+        problems.append("No Gemini API key is configured.")
+    if CHROMEDRIVER_PATH and not os.access(CHROMEDRIVER_PATH, os.X_OK):
+        problems.append(f"CHROMEDRIVER_PATH {CHROMEDRIVER_PATH} is not an executable file.")
+    if IG_MAX_SESSIONS < 1:
+        problems.append("IG_MAX_SESSIONS must be at least 1.")
+    if IG_TYPING_MODE not in ("fast", "human", "keys"):
+        problems.append(f"IG_TYPING_MODE must be fast, human or keys, not {IG_TYPING_MODE}.")
+
+    for problem in problems:
+        logger.error(problem)
+    if not problems:
+        logger.info(f"Configuration OK: {len(valid_keys)} Gemini API key(s).")
+    return not problems
+
+async def show_quota():
+    """Log each account's actions over the last 24 hours and when its next ones are allowed"""
+    from utils.action_log import action_log
+    from utils.rate_limit import rate_limiter
+    from utils.session_store import session_store
+
+    accounts = await load_instagram_accounts(IG_ACCOUNTS_FILE)
+    for account in accounts:
+        username = account["username"]
+        rate_limiter.configure(account)
+        budgets = []
+        for action in ("like", "comment"):
+            wait = rate_limiter.wait_time(username, action)
+            budgets.append(f"{action_log.count(action, username)} {action}s in 24h "
+                           f"(next {'now' if wait == 0 else f'in {wait:.0f}s'})")
+        session = "valid session" if await session_store.has_valid_session(account["cookies_path"]) else "no valid session"
+        logger.info(f"{username}: {', '.join(budgets)}, {session}")
+
+async def run_agents(resume=False):
     """
     Main function to run all social media agents
     Currently only Instagram is implemented
+    
+    Args:
+        resume: Continue interrupted account sessions from their checkpoints
     """
+    from client.runner import run_instagram_accounts
+    from utils.metrics import metrics
+    from utils.pacing import pacer
+    
+    # Ctrl+C or a scheduler's SIGTERM wakes every pending delay, so each session stops
+    # at its next pause, saves its checkpoint and closes its browser
+    loop = asyncio.get_running_loop()
+    stop_signals = []
+    
+    def stop(signum):
+        logger.warning(f"Received {signal.Signals(signum).name}, stopping the sessions...")
+        pacer.cancel()
+        # A second signal interrupts at once
+        for sig in stop_signals:
+            loop.remove_signal_handler(sig)
+        stop_signals.clear()
+    
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop, sig)
+            stop_signals.append(sig)
+        except (NotImplementedError, RuntimeError):
+            pass  # Not supported by this platform's event loop
+    
+    # Ensure the cookies directory exists
+    os.makedirs('./cookies', exist_ok=True)
+    
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT)
+    dump_task = asyncio.create_task(metrics.run_dump(METRICS_DUMP_PATH, METRICS_DUMP_INTERVAL)) if METRICS_DUMP_PATH else None
+    
     try:
-        logger.info("Starting Instagram agent...")
-        await run_instagram()
-        logger.info("Instagram agent finished.")
+        accounts = await load_instagram_accounts(IG_ACCOUNTS_FILE)
+        logger.info(f"Starting Instagram agent for {len(accounts)} account(s)...")
+        results = await run_instagram_accounts(accounts, IG_MAX_SESSIONS, resume=resume)
+        for result in results["accounts"]:
+            logger.info(f"{result['username']}: {result['posts']} posts, {result['liked']} liked, "
+                        f"{result['commented']} commented, {result['errors']} errors")
+        totals = results["totals"]
+        logger.info(f"Instagram agent finished: {totals['accounts']} accounts ({totals['failed']} failed), "
+                    f"{totals['liked']} likes, {totals['commented']} comments.")
         
         # Future implementations for other social media platforms
         # logger.info("Starting Twitter agent...")
@@ -28,6 +151,25 @@ async def run_agents():
         
     except Exception as error:
         setup_handle_error(error, "Error running agents")
+    finally:
+        for sig in stop_signals:
+            loop.remove_signal_handler(sig)
+        if dump_task is not None:
+            dump_task.cancel()
+            await asyncio.gather(dump_task, return_exceptions=True)
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logger()
+
+    if args.check_config:
+        sys.exit(0 if asyncio.run(check_config()) else 1)
+    if args.quota:
+        asyncio.run(show_quota())
+    elif args.dry_run:
+        asyncio.run(dry_run())
+    else:
+        asyncio.run(run_agents(resume=args.resume))
 
 if __name__ == "__main__":
-    asyncio.run(run_agents())
\ No newline at end of file
+    main()
@@ -8,6 +8,63 @@ load_dotenv()
 IGusername = os.getenv("IGusername") or "default_IGusername"
 IGpassword = os.getenv("IGpassword") or "default_IGpassword"
 
+# Base URL of Instagram (overridden by the offline benchmark's fake server)
+IG_BASE_URL = (os.getenv("IG_BASE_URL") or "https://www.instagram.com").rstrip("/")
+
+# Instagram account roster and the number of browser sessions allowed on this host
+IG_ACCOUNTS_FILE = os.getenv("IG_ACCOUNTS_FILE") or "./accounts.json"
+IG_MAX_SESSIONS = int(os.getenv("IG_MAX_SESSIONS") or 2)
+
+# Pinned local chromedriver (skips webdriver-manager, works offline) and the number
+# of idle browsers kept warm for the next account
+CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH") or None
+IG_WARM_BROWSERS = int(os.getenv("IG_WARM_BROWSERS") or 1)
+
+# Run accounts headless without images, video and trackers unless their roster entry says otherwise
+IG_LEAN_PROFILE = (os.getenv("IG_LEAN_PROFILE") or "false").lower() in ("1", "true", "yes")
+
+# Read feed posts (captions, authors, like state) from the feed's network responses through
+# Chrome's performance log instead of scraping them from the page
+IG_NETWORK_FEED = (os.getenv("IG_NETWORK_FEED") or "false").lower() in ("1", "true", "yes")
+
+# How comments are entered: "fast" (one CDP insertText), "human" (chunked insertText with
+# pauses) or "keys" (WebDriver send_keys, one key event per character)
+IG_TYPING_MODE = (os.getenv("IG_TYPING_MODE") or "fast").lower()
+
+# Directory of the on-disk comment cache tier (disabled when empty)
+COMMENT_CACHE_DIR = os.getenv("COMMENT_CACHE_DIR") or None
+
+# Ledger of posts each account already interacted with, and how long entries are kept
+LEDGER_PATH = os.getenv("LEDGER_PATH") or "./data/ledger.sqlite3"
+LEDGER_RETENTION_DAYS = int(os.getenv("LEDGER_RETENTION_DAYS") or 30)
+
+# Directory holding the per-account rate limit state shared by every process on this host
+RATE_LIMIT_DIR = os.getenv("RATE_LIMIT_DIR") or "./data/ratelimits"
+
+# Default like/comment budgets of every account: sustained rate per hour, burst allowed on top
+# of it, and hard cap per 24 hours (a roster entry's "rate_limits" overrides them per account)
+RATE_LIMIT_BUDGETS = {
+    "like": {
+        "per_hour": float(os.getenv("RATE_LIMIT_LIKES_PER_HOUR") or 60),
+        "burst": int(os.getenv("RATE_LIMIT_LIKE_BURST") or 10),
+        "per_day": int(os.getenv("RATE_LIMIT_LIKES_PER_DAY") or 500),
+    },
+    "comment": {
+        "per_hour": float(os.getenv("RATE_LIMIT_COMMENTS_PER_HOUR") or 20),
+        "burst": int(os.getenv("RATE_LIMIT_COMMENT_BURST") or 3),
+        "per_day": int(os.getenv("RATE_LIMIT_COMMENTS_PER_DAY") or 150),
+    },
+}
+
+# Per-account session checkpoints used by --resume, and how often they are saved (seconds)
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR") or "./data/checkpoints"
+CHECKPOINT_INTERVAL = int(os.getenv("CHECKPOINT_INTERVAL") or 30)
+
+# Per-stage metrics: Prometheus endpoint port (disabled when empty) and periodic JSON dump
+METRICS_PORT = int(os.getenv("METRICS_PORT")) if os.getenv("METRICS_PORT") else None
+METRICS_DUMP_PATH = os.getenv("METRICS_DUMP_PATH") or None
+METRICS_DUMP_INTERVAL = int(os.getenv("METRICS_DUMP_INTERVAL") or 60)
+
 # Twitter credentials
 Xusername = os.getenv("Xusername") or "default_Xusername"
 Xpassword = os.getenv("Xpassword") or "default_Xpassword"
@@ -28,4 +85,13 @@ gemini_api_keys = [
     os.getenv("GEMINI_API_KEY_3") or "API_KEY_3",
     os.getenv("GEMINI_API_KEY_4") or "API_KEY_4",
     os.getenv("GEMINI_API_KEY_5") or "API_KEY_5",
-]
\ No newline at end of file
+]
+
+# Custom Gemini endpoint, e.g. a proxy ("host:port") or a plaintext local server
+# ("http://127.0.0.1:50051", such as the benchmark stub). Defaults to Google's endpoint.
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT") or None
+
+# Seconds a Gemini call may take including retries, and whether requests slower than the
+# observed p95 latency get a hedged copy on another key
+GEMINI_DEADLINE = float(os.getenv("GEMINI_DEADLINE") or 60)
+GEMINI_HEDGE = (os.getenv("GEMINI_HEDGE") or "true").lower() in ("1", "true", "yes")
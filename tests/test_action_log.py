@@ -0,0 +1,80 @@
+import json
+import sys
+import time
+from types import SimpleNamespace
+
+from utils.action_log import ActionLog
+
+def freeze_time(monkeypatch, now):
+    # utils exports the shared log under the module's name, so patch the module object
+    monkeypatch.setattr(sys.modules[ActionLog.__module__], "time", SimpleNamespace(time=lambda: now, strptime=time.strptime))
+
+def test_count_only_includes_actions_inside_the_window(tmp_path, monkeypatch):
+    log = ActionLog(str(tmp_path / "actions.jsonl"), window=3600)
+    freeze_time(monkeypatch, 10000.0)
+    log.append("like", "account", timestamp=5000.0)
+    log.append("like", "account", timestamp=9000.0)
+    log.append("like", "other", timestamp=9500.0)
+    log.append("comment", "account", timestamp=9900.0)
+
+    assert log.count("like", "account") == 1
+    assert log.count("like", "other") == 1
+    assert log.count("comment", "account") == 1
+    assert log.oldest("like", "account") == 9000.0
+
+    # Entries expire as the window moves on
+    freeze_time(monkeypatch, 12700.0)
+    assert log.count("like", "account") == 0
+    assert log.count("comment", "account") == 1
+
+def test_counts_are_reloaded_from_the_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "actions.jsonl")
+    freeze_time(monkeypatch, 10000.0)
+    log = ActionLog(path, window=3600)
+    log.append("comment", "account", timestamp=9000.0, post="abc")
+    log.append("comment", "account", timestamp=1000.0)
+
+    reloaded = ActionLog(path, window=3600)
+    assert reloaded.count("comment", "account") == 1
+
+def test_compact_drops_expired_lines(tmp_path, monkeypatch):
+    path = tmp_path / "actions.jsonl"
+    freeze_time(monkeypatch, 10000.0)
+    log = ActionLog(str(path), window=3600)
+    log.append("like", "account", timestamp=1000.0)
+    log.append("like", "account", timestamp=9000.0)
+
+    log.compact()
+    entries = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [entry["timestamp"] for entry in entries] == [9000.0]
+    assert log.count("like", "account") == 1
+
+def test_malformed_lines_are_skipped(tmp_path, monkeypatch):
+    path = tmp_path / "actions.jsonl"
+    path.write_text('not json\n{"action": "like"}\n[1, 2]\n{"action": "like", "timestamp": "soon"}\n'
+                    '{"action": "like", "account": "account", "timestamp": 9000.0}\n')
+    freeze_time(monkeypatch, 10000.0)
+
+    log = ActionLog(str(path), window=3600)
+    assert log.count("like", "account") == 1
+
+    # Compacting drops them instead of failing
+    log.compact()
+    assert len(path.read_text().splitlines()) == 1
+    assert log.count("like", "account") == 1
+
+def test_legacy_tweets_are_migrated_once(tmp_path, monkeypatch):
+    legacy_path = tmp_path / "tweetData.json"
+    legacy_path.write_text(json.dumps([
+        {"tweetContent": "old", "imageUrl": None, "timeTweeted": "1970-01-01T00:16:40.000Z"},
+        {"tweetContent": "recent", "imageUrl": None, "timeTweeted": "1970-01-01T02:30:00.000Z"},
+    ]))
+    path = str(tmp_path / "actions.jsonl")
+    freeze_time(monkeypatch, 10000.0)
+
+    log = ActionLog(path, window=3600, legacy_tweets_path=str(legacy_path))
+    assert log.count("tweet") == 1
+    assert not legacy_path.exists()
+
+    reloaded = ActionLog(path, window=3600, legacy_tweets_path=str(legacy_path))
+    assert reloaded.count("tweet") == 1
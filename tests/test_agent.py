@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+import agent
+from agent.cache import CommentCache
+from agent.keypool import ApiKeyPool
+from agent.resilience import Backoff, Exhausted, Unavailable
+from agent.schema import get_instagram_comment_schema
+from bench.fake_gemini import FakeGemini
+
+@pytest.fixture
+def gemini():
+    server = FakeGemini(latency=0.01, jitter=0.0, unavailable_rate=1.0, seed=1).start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def key_pool(gemini, monkeypatch):
+    keys = ["bench-key-1", "bench-key-2"]
+    pool = ApiKeyPool(keys, api_endpoint=gemini.endpoint, breaker_threshold=1)
+    monkeypatch.setattr(agent, "api_key_pool", pool)
+    monkeypatch.setattr(agent, "gemini_api_keys", keys)
+    monkeypatch.setattr(agent, "backoff", Backoff(base=0.01, cap=0.01))
+    return pool
+
+def test_unavailable_responses_reach_the_retry_loop(gemini, key_pool):
+    result = asyncio.run(agent.run_agent(get_instagram_comment_schema(), "A 503 test", use_cache=False, deadline=10))
+
+    assert isinstance(result, Exhausted)
+    assert isinstance(result.last, Unavailable)
+    # One request per attempt, none retried inside the client
+    assert [request["status"] for request in gemini.requests] == ["UNAVAILABLE", "UNAVAILABLE"]
+    assert all(state.breaker.state == "open" for state in key_pool.keys)
+
+def comments(text):
+    return [{"comment": text, "viralRate": 50, "commentTokenCount": 3}]
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Replace run_agent: a batch answers its first entry only, single prompts answer themselves"""
+    calls = []
+
+    async def run_agent(schema, prompt, use_cache=True, cache_response=True):
+        calls.append((schema, prompt, use_cache, cache_response))
+        if schema.get("type") == "OBJECT":
+            return {"post_0": comments("from batch"), "post_1": [{"comment": "incomplete"}]}
+        return comments(f"single {prompt}")
+
+    monkeypatch.setattr(agent, "run_agent", run_agent)
+    monkeypatch.setattr(agent, "comment_cache", CommentCache())
+    return calls
+
+def test_batch_splits_the_response_and_falls_back_for_malformed_entries(calls):
+    schema = get_instagram_comment_schema()
+    results = asyncio.run(agent.run_agent_batch(schema, ["first", "second", "third"]))
+
+    assert results == [comments("from batch"), comments("single second"), comments("single third")]
+    batch_schema, batch_prompt, use_cache, cache_response = calls[0]
+    assert batch_schema["required"] == ["post_0", "post_1", "post_2"]
+    assert "[post_2]\nthird" in batch_prompt
+    assert (use_cache, cache_response) == (False, False)
+    assert sorted(prompt for _, prompt, _, _ in calls[1:]) == ["second", "third"]
+    # Entries are cached per prompt, so the next batch only asks for the others
+    assert agent.comment_cache.get(schema, "first") == comments("from batch")
+
+def test_batch_skips_cached_prompts(calls):
+    schema = get_instagram_comment_schema()
+    agent.comment_cache.put(schema, "first", comments("cached"))
+
+    results = asyncio.run(agent.run_agent_batch(schema, ["first", "second"]))
+
+    assert results == [comments("cached"), comments("single second")]
+    assert [prompt for _, prompt, _, _ in calls] == ["second"]
+
+def test_failed_batch_fails_every_pending_prompt(calls, monkeypatch):
+    failure = Exhausted("No API key available.")
+
+    async def run_agent(schema, prompt, use_cache=True, cache_response=True):
+        calls.append(prompt)
+        return failure
+
+    monkeypatch.setattr(agent, "run_agent", run_agent)
+    results = asyncio.run(agent.run_agent_batch(get_instagram_comment_schema(), ["first", "second"]))
+
+    assert results == [failure, failure]
+    assert len(calls) == 1
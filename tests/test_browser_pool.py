@@ -0,0 +1,54 @@
+import json
+import sys
+import types
+
+import pytest
+from selenium import webdriver
+from selenium.common.exceptions import SessionNotCreatedException
+
+from client import browser_pool
+
+@pytest.fixture
+def driver_cache(tmp_path, monkeypatch):
+    stale = tmp_path / "stale-chromedriver"
+    fresh = tmp_path / "fresh-chromedriver"
+    for driver in (stale, fresh):
+        driver.write_text("")
+        driver.chmod(0o755)
+    cache_path = tmp_path / "chromedriver.json"
+    cache_path.write_text(json.dumps({"path": str(stale)}))
+
+    monkeypatch.setattr(browser_pool, "DRIVER_CACHE_PATH", str(cache_path))
+    monkeypatch.setattr(browser_pool, "_driver_path", None)
+    monkeypatch.setattr(browser_pool, "CHROMEDRIVER_PATH", None)
+    manager = types.SimpleNamespace(ChromeDriverManager=lambda: types.SimpleNamespace(install=lambda: str(fresh)))
+    monkeypatch.setitem(sys.modules, "webdriver_manager.chrome", manager)
+    return types.SimpleNamespace(cache_path=cache_path, stale=str(stale), fresh=str(fresh))
+
+def fake_chrome(monkeypatch, stale_paths):
+    started = []
+
+    def chrome(service, options):
+        started.append(service.path)
+        if service.path in stale_paths:
+            raise SessionNotCreatedException("This version of ChromeDriver only supports Chrome version 120")
+        return types.SimpleNamespace()
+
+    monkeypatch.setattr(webdriver, "Chrome", chrome)
+    return started
+
+def test_stale_cached_driver_is_resolved_again(driver_cache, monkeypatch):
+    started = fake_chrome(monkeypatch, {driver_cache.stale})
+
+    browser_pool.create_browser()
+
+    assert started == [driver_cache.stale, driver_cache.fresh]
+    assert json.loads(driver_cache.cache_path.read_text()) == {"path": driver_cache.fresh}
+
+def test_pinned_driver_is_never_replaced(driver_cache, monkeypatch):
+    monkeypatch.setattr(browser_pool, "CHROMEDRIVER_PATH", driver_cache.stale)
+    started = fake_chrome(monkeypatch, {driver_cache.stale})
+
+    with pytest.raises(SessionNotCreatedException):
+        browser_pool.create_browser()
+    assert started == [driver_cache.stale]
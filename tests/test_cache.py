@@ -0,0 +1,61 @@
+import pytest
+
+from agent.cache import CommentCache
+from utils.ledger import InteractionLedger
+
+SCHEMA = {"type": "ARRAY", "items": {"type": "OBJECT"}}
+CANDIDATES = [{"comment": "First"}, {"comment": "Second"}]
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = InteractionLedger(str(tmp_path / "ledger.sqlite3"))
+    yield ledger
+    ledger.close()
+
+def test_identical_prompts_share_an_entry():
+    cache = CommentCache()
+    cache.put(SCHEMA, "Nice   photo ", CANDIDATES)
+    assert cache.get(SCHEMA, "nice photo") == CANDIDATES
+    assert cache.get({"type": "OBJECT"}, "nice photo") is None
+    assert cache.stats()["hits"] == 1
+
+def test_least_recently_used_entry_is_evicted():
+    cache = CommentCache(max_entries=2)
+    cache.put(SCHEMA, "a", [1])
+    cache.put(SCHEMA, "b", [2])
+    cache.get(SCHEMA, "a")
+    cache.put(SCHEMA, "c", [3])
+    assert cache.get(SCHEMA, "b") is None
+    assert cache.get(SCHEMA, "a") == [1]
+
+def test_expired_entries_are_not_returned(monkeypatch):
+    cache = CommentCache(ttl=60)
+    monkeypatch.setattr("agent.cache.time.time", lambda: 1000.0)
+    cache.put(SCHEMA, "a", [1])
+    monkeypatch.setattr("agent.cache.time.time", lambda: 1061.0)
+    assert cache.get(SCHEMA, "a") is None
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    CommentCache(cache_dir=str(tmp_path)).put(SCHEMA, "a", [1])
+    cache = CommentCache(cache_dir=str(tmp_path))
+    assert cache.get(SCHEMA, "a") == [1]
+    assert cache.disk_hits == 1
+
+def test_pick_skips_texts_only_once_they_are_posted(ledger):
+    cache = CommentCache(ledger=ledger)
+    assert cache.pick(CANDIDATES, "account") == CANDIDATES[0]
+    assert cache.pick(CANDIDATES, "account") == CANDIDATES[0]
+
+    cache.record_posted("account", "First")
+    assert cache.pick(CANDIDATES, "account") == CANDIDATES[1]
+    assert cache.pick(CANDIDATES, "other") == CANDIDATES[0]
+
+    cache.record_posted("account", "Second")
+    assert cache.pick(CANDIDATES, "account") is None
+
+def test_posted_texts_survive_a_restart(ledger, tmp_path):
+    CommentCache(ledger=ledger).record_posted("account", "First")
+    ledger.close()
+
+    cache = CommentCache(ledger=InteractionLedger(str(tmp_path / "ledger.sqlite3")))
+    assert cache.pick(CANDIDATES, "account") == CANDIDATES[1]
@@ -0,0 +1,42 @@
+import sys
+import time
+from types import SimpleNamespace
+
+from utils.checkpoint import CheckpointStore
+
+checkpoint_module = sys.modules[CheckpointStore.__module__]
+
+def freeze_time(monkeypatch, now):
+    monkeypatch.setattr(checkpoint_module, "time", SimpleNamespace(time=lambda: now, monotonic=time.monotonic))
+
+def test_saved_state_is_loaded_back(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints"))
+    store.save("user/name", {"post_index": 7, "processed": ["AAA"]})
+
+    state = store.load("user/name")
+    assert state["account"] == "user/name"
+    assert (state["post_index"], state["processed"]) == (7, ["AAA"])
+    assert CheckpointStore(str(tmp_path / "checkpoints")).load("other") is None
+
+def test_old_or_unreadable_checkpoints_are_ignored(tmp_path, monkeypatch):
+    store = CheckpointStore(str(tmp_path), max_age=3600)
+    freeze_time(monkeypatch, 1000.0)
+    store.save("account", {"post_index": 3})
+
+    freeze_time(monkeypatch, 1000.0 + 3599)
+    assert store.load("account")["post_index"] == 3
+    freeze_time(monkeypatch, 1000.0 + 3601)
+    assert store.load("account") is None
+
+    (tmp_path / "broken.json").write_text('{"post_index": ')
+    assert store.load("broken") is None
+
+def test_clear_deletes_the_checkpoint_and_makes_a_save_due(tmp_path):
+    store = CheckpointStore(str(tmp_path), interval=60)
+    store.save("account", {"post_index": 3})
+    assert not store.due("account")
+
+    store.clear("account")
+    assert store.load("account") is None
+    assert store.due("account")
+    store.clear("account")  # Nothing left to delete
@@ -0,0 +1,15 @@
+from bench.import_time import DEFERRED_MODULES, measure
+
+# Same budget as `python -m bench.import_time`
+BUDGET_MS = 250
+
+def test_main_imports_within_budget():
+    # Fastest of three imports, so a busy machine does not fail the check
+    total = min(measure()[0] for _ in range(3))
+    assert total / 1000 <= BUDGET_MS
+
+def test_main_defers_heavy_dependencies():
+    _, modules = measure()
+    loaded = [name for name in modules
+              if any(name == deferred or name.startswith(f"{deferred}.") for deferred in DEFERRED_MODULES)]
+    assert loaded == []
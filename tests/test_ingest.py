@@ -0,0 +1,35 @@
+from client.ingest import parse_feed_response
+
+def test_timeline_response_yields_records_in_feed_order():
+    data = {"feed_items": [
+        {"media_or_ad": {"pk": "111_22", "code": "AAA", "caption": {"text": "First"},
+                         "user": {"username": "alice"}, "has_liked": True}},
+        {"end_of_feed_demarcator": {"title": "You're all caught up"}},
+        {"media_or_ad": {"pk": 333, "code": "BBB", "caption": None, "user": {"username": "bob"}}},
+    ]}
+
+    assert parse_feed_response(data) == [
+        {"id": "111", "shortcode": "AAA", "caption": "First", "author": "alice", "has_liked": True},
+        {"id": "333", "shortcode": "BBB", "caption": None, "author": "bob", "has_liked": False},
+    ]
+
+def test_graphql_response_is_read_like_the_timeline():
+    data = {"data": {"xdt_api__v1__feed__timeline__connection": {"edges": [
+        {"node": {"media": {"id": "444", "shortcode": "CCC", "owner": {"username": "carol"}, "viewer_has_liked": True,
+                            "edge_media_to_caption": {"edges": [{"node": {"text": "Old shape"}}]}}}},
+    ]}}}
+
+    assert parse_feed_response(data) == [
+        {"id": "444", "shortcode": "CCC", "caption": "Old shape", "author": "carol", "has_liked": True},
+    ]
+
+def test_carousel_children_are_not_reported_on_their_own():
+    data = {"feed_items": [{"media_or_ad": {
+        "pk": "555", "code": "DDD", "caption": "Album", "user": {"username": "dave"},
+        "carousel_media": [{"pk": "556", "code": "DDD-1", "user": {"username": "dave"}}],
+    }}]}
+
+    assert [record["shortcode"] for record in parse_feed_response(data)] == ["DDD"]
+
+def test_payload_without_posts_yields_nothing():
+    assert parse_feed_response({"status": "ok", "items": [{"code": "X"}], "user": {"username": "eve"}}) == []
@@ -0,0 +1,64 @@
+import pytest
+
+from agent import keypool
+from agent.keypool import ApiKeyPool
+
+KEYS = ["key-a", "key-b", "key-c"]
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(keypool.time, "monotonic", lambda: clock["now"])
+    return clock
+
+def test_placeholder_keys_are_skipped():
+    pool = ApiKeyPool(["API_KEY_1", "", "real-key"])
+    assert [state.index for state in pool.keys] == [2]
+
+def test_least_loaded_key_is_picked_first(clock):
+    pool = ApiKeyPool(KEYS)
+    first, second, third = pool.acquire(), pool.acquire(), pool.acquire()
+    assert sorted(state.index for state in (first, second, third)) == [0, 1, 2]
+
+    pool.release(second, latency=0.5)
+    assert pool.acquire() is second
+
+def test_faster_key_is_preferred_when_load_is_equal(clock):
+    pool = ApiKeyPool(KEYS[:2])
+    slow, fast = pool.acquire(), pool.acquire()
+    pool.release(slow, latency=2.0)
+    pool.release(fast, latency=0.2)
+    assert pool.acquire() is fast
+
+def test_rate_limited_key_cools_down_exponentially(clock):
+    pool = ApiKeyPool(KEYS[:1], rate_limit_cooldown=60)
+    state = pool.acquire()
+    pool.release(state, rate_limited=True)
+    assert pool.acquire() is None
+
+    clock["now"] += 61
+    state = pool.acquire()
+    pool.release(state, rate_limited=True)
+    clock["now"] += 61
+    assert pool.acquire() is None  # Second 429 in a row: 120 seconds
+    clock["now"] += 60
+    assert pool.acquire() is state
+
+def test_exclude_and_quota_limit_the_candidates(clock):
+    pool = ApiKeyPool(KEYS[:2], quota=1, quota_window=60)
+    state = pool.acquire(exclude=(0,))
+    assert state.index == 1
+    pool.release(state, latency=0.1)
+
+    assert pool.acquire(exclude=(0,)) is None  # Key 1 used its quota
+    clock["now"] += 61
+    assert pool.acquire(exclude=(0,)) is state
+
+def test_repeated_failures_open_the_circuit(clock):
+    pool = ApiKeyPool(KEYS[:1], breaker_threshold=2, breaker_reset=30)
+    for _ in range(2):
+        pool.release(pool.acquire(), failed=True)
+    assert pool.acquire() is None
+
+    clock["now"] += 31
+    assert pool.acquire() is not None  # Half-open: one trial request
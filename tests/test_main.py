@@ -0,0 +1,33 @@
+import asyncio
+import os
+import signal
+import sys
+
+import main
+from client import runner
+from utils.pacing import Pacer
+
+def test_sigint_cancels_pending_pauses(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # run_agents creates ./cookies
+    pacer = Pacer()
+    monkeypatch.setattr(sys.modules[Pacer.__module__], "pacer", pacer)
+    monkeypatch.setattr(main, "METRICS_PORT", None)
+    monkeypatch.setattr(main, "METRICS_DUMP_PATH", None)
+    completed = []
+
+    async def load_instagram_accounts(path):
+        return []
+
+    async def run_instagram_accounts(accounts, max_sessions, resume=False):
+        os.kill(os.getpid(), signal.SIGINT)
+        completed.append(await pacer.sleep(30))
+        return {"accounts": [], "totals": {"accounts": 0, "failed": 0, "liked": 0, "commented": 0}}
+
+    monkeypatch.setattr(main, "load_instagram_accounts", load_instagram_accounts)
+    monkeypatch.setattr(runner, "run_instagram_accounts", run_instagram_accounts)
+    asyncio.run(asyncio.wait_for(main.run_agents(), 5))
+
+    assert completed == [False]
+    assert pacer.cancelled
+    # The handlers are removed with the loop's run
+    assert signal.getsignal(signal.SIGINT) is signal.default_int_handler
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from agent import prefetch
+from agent.prefetch import CommentPrefetcher
+
+SCHEMA = {"type": "ARRAY", "items": {"type": "OBJECT"}}
+
+@pytest.fixture
+def batches(monkeypatch):
+    """Replace run_agent_batch with requests that stay open until released"""
+    batches = []
+
+    async def run_agent_batch(schema, prompts):
+        batch = {"prompts": prompts, "release": asyncio.Event(), "cancelled": False}
+        batches.append(batch)
+        try:
+            await batch["release"].wait()
+        except asyncio.CancelledError:
+            batch["cancelled"] = True
+            raise
+        return [f"comment for {prompt}" for prompt in prompts]
+
+    async def run_agent(schema, prompt, stream=False):
+        return f"single comment for {prompt}"
+
+    monkeypatch.setattr(prefetch, "run_agent_batch", run_agent_batch)
+    monkeypatch.setattr(prefetch, "run_agent", run_agent)
+    return batches
+
+def test_posts_scheduled_together_share_one_request(batches):
+    async def run():
+        prefetcher = CommentPrefetcher(SCHEMA, max_pending=4, batch_size=2)
+        assert prefetcher.schedule_many([("a", "A"), ("b", "B"), ("c", "C")]) == 3
+        await asyncio.sleep(0)
+        for batch in batches:
+            batch["release"].set()
+        results = [await prefetcher.get(key, prompt) for key, prompt in (("b", "B"), ("a", "A"), ("c", "C"))]
+        return results, prefetcher
+
+    results, prefetcher = asyncio.run(run())
+    # The last post left over from the batches of two is generated on its own
+    assert [batch["prompts"] for batch in batches] == [["A", "B"]]
+    assert results == ["comment for B", "comment for A", "single comment for C"]
+    assert prefetcher.hits == 3
+
+def test_shared_request_is_cancelled_after_its_last_post(batches):
+    async def run():
+        prefetcher = CommentPrefetcher(SCHEMA, max_pending=2, batch_size=2)
+        prefetcher.schedule_many([("a", "A"), ("b", "B")])
+        await asyncio.sleep(0)
+
+        prefetcher.cancel("a")
+        await asyncio.sleep(0)
+        still_running = not batches[0]["cancelled"]
+
+        prefetcher.cancel("b")
+        await asyncio.sleep(0)
+        return still_running
+
+    assert asyncio.run(run())
+    assert batches[0]["cancelled"]
+
+def test_cancelling_one_post_keeps_the_other_result(batches):
+    async def run():
+        prefetcher = CommentPrefetcher(SCHEMA, max_pending=2, batch_size=2)
+        prefetcher.schedule_many([("a", "A"), ("b", "B")])
+        await asyncio.sleep(0)
+        prefetcher.cancel("a")
+        batches[0]["release"].set()
+        return await prefetcher.get("b", "B")
+
+    assert asyncio.run(run()) == "comment for B"
+
+def test_cancel_all_cancels_shared_requests(batches):
+    async def run():
+        prefetcher = CommentPrefetcher(SCHEMA, max_pending=2, batch_size=2)
+        prefetcher.schedule_many([("a", "A"), ("b", "B")])
+        await asyncio.sleep(0)
+        prefetcher.cancel_all()
+        await asyncio.sleep(0)
+        return prefetcher
+
+    assert len(asyncio.run(run())) == 0
+    assert batches[0]["cancelled"]
+
+def test_post_that_was_not_prefetched_is_generated_inline(monkeypatch):
+    calls = []
+
+    async def run_agent(schema, prompt, stream=False):
+        calls.append((prompt, stream))
+        return "inline"
+
+    monkeypatch.setattr(prefetch, "run_agent", run_agent)
+    prefetcher = CommentPrefetcher(SCHEMA)
+
+    assert asyncio.run(prefetcher.get("a", "A")) == "inline"
+    assert calls == [("A", True)]
+    assert prefetcher.misses == 1
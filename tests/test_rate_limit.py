@@ -0,0 +1,72 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils.rate_limit import RateLimiter, SlidingWindow, TokenBucket
+
+def test_token_bucket_allows_a_burst_then_refills():
+    bucket = TokenBucket(rate=1 / 10, capacity=2)
+    state = None
+    for _ in range(2):
+        assert bucket.wait_time(state, 100.0) == 0
+        state = bucket.consume(state, 100.0)
+
+    assert bucket.wait_time(state, 100.0) == pytest.approx(10.0)
+    assert bucket.wait_time(state, 105.0) == pytest.approx(5.0)
+    assert bucket.wait_time(state, 110.0) == 0
+
+def test_token_bucket_never_exceeds_its_capacity():
+    bucket = TokenBucket(rate=1, capacity=3)
+    state = bucket.consume(None, 0.0)
+    assert bucket._tokens(state, 1000.0) == 3
+
+def test_sliding_window_waits_for_the_oldest_action_to_leave():
+    window = SlidingWindow(limit=2, window=60)
+    state = window.consume(None, 0.0)
+    state = window.consume(state, 10.0)
+
+    assert window.wait_time(state, 20.0) == pytest.approx(40.0)
+    assert window.wait_time(state, 60.0) == 0
+
+def test_sliding_window_drops_expired_timestamps():
+    window = SlidingWindow(limit=5, window=60)
+    state = window.consume([0.0, 10.0], 100.0)
+    assert state == [100.0]
+
+def test_rate_limiter_shares_state_through_files(tmp_path):
+    policies = {"comment": [TokenBucket(rate=1 / 3600, capacity=1)]}
+    first = RateLimiter(str(tmp_path), policies)
+    second = RateLimiter(str(tmp_path), policies)
+
+    assert first.try_acquire("account", "comment") == 0
+    assert second.try_acquire("account", "comment") > 0
+    assert second.wait_time("other", "comment") == 0
+
+def test_rate_limiter_allows_actions_without_policies(tmp_path):
+    limiter = RateLimiter(str(tmp_path), {"comment": [TokenBucket(rate=1, capacity=1)]})
+    assert limiter.try_acquire("account", "like") == 0
+    assert list(tmp_path.iterdir()) == []
+
+def test_rate_limiter_keeps_an_explicitly_empty_policy_set(tmp_path):
+    limiter = RateLimiter(str(tmp_path), {})
+    assert limiter.policies == {}
+    assert all(limiter.try_acquire("account", "comment") == 0 for _ in range(10))
+
+def test_rate_limiter_applies_roster_overrides_per_account(tmp_path):
+    limiter = RateLimiter(str(tmp_path))
+    limiter.configure({"username": "slow", "rate_limits": {"comment": {"burst": 1}}})
+    limiter.configure({"username": "default"})
+
+    assert limiter.try_acquire("slow", "comment") == 0
+    assert limiter.try_acquire("slow", "comment") > 0
+    assert limiter.try_acquire("default", "comment") == 0
+    assert limiter.try_acquire("default", "comment") == 0
+
+def test_rate_limiter_takes_the_file_lock_off_the_event_loop(tmp_path, monkeypatch):
+    limiter = RateLimiter(str(tmp_path), {})
+    threads = []
+    monkeypatch.setattr(limiter, "try_acquire", lambda account, action: threads.append(threading.get_ident()) or 0)
+
+    assert asyncio.run(limiter.acquire("account", "like"))
+    assert threads and threads[0] != threading.get_ident()
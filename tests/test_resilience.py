@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+import pytest
+from google.api_core import exceptions
+
+from agent.resilience import (Backoff, CircuitBreaker, Exhausted, InvalidResponse, KeyRejected, RateLimited,
+                              Rejected, Timeout, Unavailable, classify)
+
+@pytest.mark.parametrize("error, failure_type", [
+    (asyncio.TimeoutError(), Timeout),
+    (json.JSONDecodeError("Expecting value", "", 0), InvalidResponse),
+    (exceptions.ResourceExhausted("quota"), RateLimited),
+    (exceptions.ServiceUnavailable("down"), Unavailable),
+    (exceptions.InternalServerError("oops"), Unavailable),
+    (exceptions.PermissionDenied("denied"), KeyRejected),
+    (exceptions.InvalidArgument("API key not valid"), KeyRejected),
+    (exceptions.InvalidArgument("bad schema"), Rejected),
+    (RuntimeError("HTTP 429 Too Many Requests"), RateLimited),
+    (RuntimeError("HTTP 503"), Unavailable),
+    (RuntimeError("boom"), Rejected),
+])
+def test_classify(error, failure_type):
+    failure = classify(error)
+    assert type(failure) is failure_type
+    assert failure.error is error
+
+def test_only_transient_failures_are_retried():
+    assert classify(exceptions.ServiceUnavailable("down")).retryable
+    assert not classify(exceptions.InvalidArgument("bad schema")).retryable
+
+def test_exhausted_keeps_the_last_failure():
+    last = RateLimited("quota")
+    exhausted = Exhausted("No API key available.", last)
+    assert exhausted.last is last
+    assert str(exhausted) == "No API key available."
+
+def test_backoff_delays_are_jittered_and_capped():
+    backoff = Backoff(base=1, factor=2, cap=5)
+    for attempt in range(10):
+        delays = [backoff.delay(attempt) for _ in range(50)]
+        assert all(0 <= delay <= min(5, 2 ** attempt) for delay in delays)
+    assert len({backoff.delay(3) for _ in range(20)}) > 1
+
+def test_circuit_opens_after_repeated_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    assert not breaker.record_failure(0)
+    assert not breaker.record_failure(1)
+    assert breaker.record_failure(2)
+    assert not breaker.available(10)
+    assert breaker.available(32)
+
+def test_half_open_circuit_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure(0)
+    breaker.on_acquire(30)
+    assert breaker.state == "half_open"
+    assert not breaker.available(30)
+
+    # A failed trial opens the circuit again, a successful one closes it
+    assert breaker.record_failure(31)
+    assert not breaker.available(40)
+    breaker.on_acquire(61)
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.available(61)
+
+def test_abandoned_trial_frees_the_half_open_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure(0)
+    breaker.on_acquire(30)
+    breaker.abandon()
+    assert breaker.available(30)
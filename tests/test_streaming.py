@@ -0,0 +1,115 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import agent
+from agent.streaming import CandidateStream, JsonArrayParser
+
+def test_parser_returns_items_as_they_complete():
+    parser = JsonArrayParser()
+    assert parser.feed('[{"comment": "a, [b]"') == []
+    assert parser.feed('}, {"comment": "c \\"quoted\\" }"') == [{"comment": "a, [b]"}]
+    assert parser.feed("}, 3]") == [{"comment": 'c "quoted" }'}, 3]
+    assert parser.finished
+
+def test_parser_handles_one_character_chunks():
+    text = '[{"a": [1, 2]}, "x]", 4, {"b": {}}]'
+    parser = JsonArrayParser()
+    items = []
+    for character in text:
+        items.extend(parser.feed(character))
+    assert items == [{"a": [1, 2]}, "x]", 4, {"b": {}}]
+
+def test_parser_rejects_a_malformed_item():
+    parser = JsonArrayParser()
+    with pytest.raises(ValueError):
+        parser.feed('[{"a": 1,}]')
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+        # Shaped like a GenerateContentResponse chunk
+        self.candidates = [SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text=text)]))]
+
+async def stream(*texts):
+    for text in texts:
+        yield Chunk(text)
+
+def test_candidate_stream_returns_the_first_valid_item_early():
+    async def run():
+        candidates = CandidateStream(stream('[{"bad": 1}, {"comment": "a"}', ', {"comment": "b"}]'),
+                                     lambda item: "comment" in item)
+        first = await candidates.first()
+        assert not candidates.done
+        return first, await candidates.rest()
+
+    first, rest = asyncio.run(run())
+    assert first == {"comment": "a"}
+    assert rest == [{"comment": "a"}, {"comment": "b"}]
+
+def test_candidate_stream_decodes_a_non_array_response():
+    async def run():
+        candidates = CandidateStream(stream('{"comment":', ' "a"}'))
+        return await candidates.first()
+
+    assert asyncio.run(run()) == {"comment": "a"}
+
+class Call:
+    """Streaming call that sends its chunks, then hangs until cancelled (or ends)"""
+
+    def __init__(self, *texts, hang=True):
+        self.texts = list(texts)
+        self.hang = hang
+        self.cancelled = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.texts:
+            return Chunk(self.texts.pop(0))
+        if not self.hang:
+            raise StopAsyncIteration
+        await asyncio.Event().wait()
+
+    def cancel(self):
+        self.cancelled = True
+
+def test_candidate_stream_cancels_the_call():
+    call = Call('[{"comment": "a"}')
+    candidates = CandidateStream(call)
+    assert asyncio.run(candidates.first()) == {"comment": "a"}
+
+    candidates.cancel()
+    assert call.cancelled and candidates.done
+
+def test_finish_stream_cancels_a_stream_past_the_deadline(monkeypatch):
+    released = []
+    monkeypatch.setattr(agent, "api_key_pool", SimpleNamespace(release=lambda state, latency: released.append(latency)))
+    call = Call('[{"comment": "a"}')
+
+    async def run():
+        candidates = CandidateStream(call)
+        await candidates.first()
+        started = time.monotonic()
+        await agent._finish_stream(candidates, {}, "prompt", None, started, started + 0.05, cache_response=False)
+
+    asyncio.run(run())
+    assert call.cancelled
+    assert released == [None]
+
+def test_stream_without_a_valid_candidate_is_cancelled(monkeypatch):
+    call = Call('[{"bad": 1}]', hang=False)
+
+    async def stream_generate_content(request, retry, timeout):
+        return call
+
+    client = SimpleNamespace(stream_generate_content=stream_generate_content)
+    monkeypatch.setattr(agent, "api_key_pool", SimpleNamespace(get_client=lambda state: client,
+                                                               build_request=lambda schema, prompt: None))
+    schema = {"type": "ARRAY", "items": {"type": "OBJECT", "required": ["comment"]}}
+
+    assert asyncio.run(agent._generate(None, schema, "prompt", stream=True, timeout=1)) == (None, None)
+    assert call.cancelled
@@ -1,43 +1,72 @@
 import os
 import json
-import time
 from pathlib import Path
 from config.logger import logger
-from secret import gemini_api_keys
+from secret import gemini_api_keys, IGusername, IGpassword
+from utils.action_log import action_log
+from utils.session_store import session_store
 
-async def instagram_cookies_exist():
-    """Check if Instagram cookies exist and are valid
+def get_cookies_path(username=None):
+    """Get the cookie file path for an Instagram account
     
+    Args:
+        username: Account username, or None for the default single-account file
+        
     Returns:
-        bool: True if cookies exist and are valid, False otherwise
+        str: Path of the account's cookie file
     """
-    try:
-        cookies_path = "./cookies/Instagramcookies.json"
-        # Check if the file exists
-        if not os.path.exists(cookies_path):
-            return False
-        
-        with open(cookies_path, "r") as f:
-            cookies = json.load(f)
+    if not username:
+        return "./cookies/Instagramcookies.json"
+    return f"./cookies/{username}_Instagramcookies.json"
 
-        # Find the sessionid cookie
-        session_id_cookie = next((cookie for cookie in cookies if cookie.get('name') == 'sessionid'), None)
-
-        # If sessionid cookie is not found, return false
-        if not session_id_cookie:
-            return False
-
-        # Check if the sessionid cookie has expired
-        current_timestamp = int(time.time())
-        return session_id_cookie.get('expires') > current_timestamp
+async def load_instagram_accounts(accounts_path):
+    """Load the Instagram account roster
+    
+    The roster is a JSON list of objects with `username` and `password` keys and an
+    optional `cookies_path`. If the file does not exist, the single account from
+    secret.py is used.
+    
+    Args:
+        accounts_path: Path of the roster JSON file
+        
+    Returns:
+        list: Account dicts with username, password and cookies_path
+    """
+    if not os.path.exists(accounts_path):
+        return [{
+            'username': IGusername,
+            'password': IGpassword,
+            'cookies_path': get_cookies_path(),
+        }]
+    
+    try:
+        with open(accounts_path, "r") as f:
+            roster = json.load(f)
     except Exception as error:
-        if isinstance(error, FileNotFoundError):
-            # File does not exist
-            logger.warning("Cookies file does not exist.")
-            return False
-        else:
-            logger.error(f"Error checking cookies: {error}")
-            return False
+        logger.error(f"Error reading accounts file {accounts_path}: {error}")
+        raise Exception("Failed to load accounts.")
+    
+    accounts = []
+    for entry in roster:
+        if not entry.get('username') or not entry.get('password'):
+            logger.warning(f"Skipping account entry without username or password in {accounts_path}")
+            continue
+        accounts.append({
+            **entry,
+            'cookies_path': entry.get('cookies_path') or get_cookies_path(entry['username']),
+        })
+    return accounts
+
+async def instagram_cookies_exist(cookies_path="./cookies/Instagramcookies.json"):
+    """Check if Instagram cookies exist and are valid
+    
+    Args:
+        cookies_path: Path of the account's cookie file
+    
+    Returns:
+        bool: True if cookies exist and are valid, False otherwise
+    """
+    return await session_store.has_valid_session(cookies_path)
 
 async def save_cookies(cookies_path, cookies):
     """Save cookies to a file
@@ -46,16 +75,7 @@ async def save_cookies(cookies_path, cookies):
         cookies_path: Path to save cookies to
         cookies: Cookies to save
     """
-    try:
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(cookies_path), exist_ok=True)
-        
-        with open(cookies_path, "w") as f:
-            json.dump(cookies, f, indent=2)
-        logger.info("Cookies saved successfully.")
-    except Exception as error:
-        logger.error(f"Error saving cookies: {error}")
-        raise Exception("Failed to save cookies.")
+    await session_store.save(cookies_path, cookies)
 
 async def load_cookies(cookies_path):
     """Load cookies from a file
@@ -64,33 +84,9 @@ async def load_cookies(cookies_path):
         cookies_path: Path to load cookies from
         
     Returns:
-        list: Loaded cookies or empty list if file doesn't exist
+        list: Loaded cookies (with an integer `expiry`) or empty list if file doesn't exist
     """
-    try:
-        # Check if the file exists
-        if not os.path.exists(cookies_path):
-            return []
-        
-        # Read and parse the cookies file
-        with open(cookies_path, "r") as f:
-            cookies = json.load(f)
-            
-        # Fix expiry format issues - convert to integer if it exists
-        for cookie in cookies:
-            if 'expires' in cookie and cookie['expires'] is not None:
-                try:
-                    cookie['expiry'] = int(cookie['expires'])
-                    # Remove the original expires field to avoid conflicts
-                    del cookie['expires']
-                except (ValueError, TypeError):
-                    # If conversion fails, remove the expires field
-                    if 'expires' in cookie:
-                        del cookie['expires']
-                        
-        return cookies
-    except Exception as error:
-        logger.error(f"Cookies file does not exist or cannot be read: {error}")
-        return []
+    return await session_store.load(cookies_path)
 
 # Function to get the next API key in the list
 def get_next_api_key(current_api_key_index):
@@ -120,98 +116,48 @@ def setup_handle_error(error, context):
     else:
         logger.error(f"An unknown error occurred in {context}: {error}")
 
-# Function to save tweet data to tweetData.json
+# Function to save tweet data to the action log
 async def save_tweet_data(tweet_content, image_url, time_tweeted):
-    """Save tweet data to a file
+    """Save tweet data to the action log
     
     Args:
         tweet_content: Content of the tweet
         image_url: URL of the image in the tweet
         time_tweeted: Time the tweet was posted
     """
-    tweet_data_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'tweetData.json')
-    tweet_data = {
-        'tweetContent': tweet_content,
-        'imageUrl': image_url or None,
-        'timeTweeted': time_tweeted,
-    }
-
     try:
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(tweet_data_path), exist_ok=True)
-        
-        # Check if the file exists
-        if os.path.exists(tweet_data_path):
-            # Read the existing data
-            with open(tweet_data_path, 'r') as f:
-                data = json.load(f)
-            # Append the new tweet data
-            data.append(tweet_data)
-            # Write the updated data back to the file
-            with open(tweet_data_path, 'w') as f:
-                json.dump(data, f, indent=2)
-        else:
-            # File does not exist, create it with the new tweet data
-            with open(tweet_data_path, 'w') as f:
-                json.dump([tweet_data], f, indent=2)
+        action_log.append(
+            'tweet',
+            tweetContent=tweet_content,
+            imageUrl=image_url or None,
+            timeTweeted=time_tweeted,
+        )
     except Exception as error:
         logger.error(f'Error saving tweet data: {error}')
         raise error
 
-# Function to check if the first object's time in tweetData.json is more than 24 hours old and delete the file if necessary
+# Function to drop tweets older than 24 hours from the action log
 async def check_and_delete_old_tweet_data():
-    """Check and delete old tweet data"""
-    tweet_data_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'tweetData.json')
-
+    """Remove expired entries from the action log
+    
+    Entries leave the 24 hour window one by one, so this only compacts the file.
+    """
     try:
-        # Check if the file exists
-        if not os.path.exists(tweet_data_path):
-            return
-            
-        # Read the existing data
-        with open(tweet_data_path, 'r') as f:
-            data = json.load(f)
-
-        if data and len(data) > 0:
-            first_tweet_time = time.mktime(time.strptime(data[0]['timeTweeted'], '%Y-%m-%dT%H:%M:%S.%fZ'))
-            current_time = time.time()
-            time_difference = current_time - first_tweet_time
-
-            # Check if the time difference is more than 24 hours (86400000 milliseconds)
-            if time_difference > 86400:
-                os.remove(tweet_data_path)
-                logger.info('tweetData.json file deleted because the first tweet is more than 24 hours old.')
+        action_log.compact()
     except Exception as error:
         if not isinstance(error, FileNotFoundError):
             logger.error(f'Error checking tweet data: {error}')
             raise error
 
-# Function to check if the tweetData.json file has 17 or more objects
+# Function to check if fewer than 17 tweets were sent in the last 24 hours
 async def can_send_tweet():
     """Check if a tweet can be sent
     
     Returns:
         bool: True if a tweet can be sent, False otherwise
     """
-    tweet_data_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'tweetData.json')
-
     try:
-        # Check if the file exists
-        if not os.path.exists(tweet_data_path):
-            return True
-            
-        # Read the existing data
-        with open(tweet_data_path, 'r') as f:
-            data = json.load(f)
-
-        # Check if the file has 17 or more objects
-        if len(data) >= 17:
-            return False
-        return True
+        return action_log.count('tweet') < 17
     except Exception as error:
-        if isinstance(error, FileNotFoundError):
-            # File does not exist, so it's safe to send a tweet
-            return True
-        else:
-            logger.error(f'Error checking tweet data: {error}')
-            raise error
\ No newline at end of file
+        logger.error(f'Error checking tweet data: {error}')
+        raise error
@@ -0,0 +1,181 @@
+import calendar
+import json
+import os
+import time
+from collections import deque
+from config.logger import logger
+
+def parse_entry(line):
+    """Parse a line of the log
+
+    Returns:
+        tuple: (action, account, timestamp), or None if the line is blank or malformed
+    """
+    if not line.strip():
+        return None
+    try:
+        entry = json.loads(line)
+        return entry["action"], entry.get("account"), float(entry["timestamp"])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+class ActionLog:
+    """Append-only JSONL log of bot actions with in-memory sliding windows
+
+    Every action (tweet, like, comment...) is one appended line. The file is read once,
+    after which the timestamps of each (action, account) pair inside the window are
+    kept in a deque, so appends and quota checks are O(1) amortized. Entries expire
+    one by one as they leave the window; the file is rewritten only when most of its
+    lines have expired. Tweets recorded in the former `legacy_tweets_path` JSON file
+    are moved into the log the first time it is read.
+    """
+
+    def __init__(self, path, window=86400, legacy_tweets_path=None):
+        self.path = path
+        self.window = window
+        self.legacy_tweets_path = legacy_tweets_path
+        self._windows = {}  # (action, account) -> deque of timestamps
+        self._loaded = False
+        self._total_lines = 0
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+
+        if self.legacy_tweets_path and os.path.exists(self.legacy_tweets_path):
+            self._migrate_legacy_tweets()
+        if not os.path.exists(self.path):
+            return
+
+        cutoff = time.time() - self.window
+        with open(self.path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                self._total_lines += 1
+                parsed = parse_entry(line)
+                if parsed is None:
+                    logger.warning(f"Skipping malformed line in {self.path}")
+                    continue
+                action, account, timestamp = parsed
+                if timestamp >= cutoff:
+                    self._window(action, account).append(timestamp)
+
+    def _migrate_legacy_tweets(self):
+        """Append the tweets of the former JSON file to the log, then set the file aside"""
+        path = self.legacy_tweets_path
+        try:
+            with open(path, "r") as f:
+                tweets = json.load(f)
+        except (OSError, ValueError) as error:
+            logger.warning(f"Could not migrate {path}: {error}")
+            return
+
+        # The old file was deleted as a whole, so undated tweets count from its last change
+        fallback = os.path.getmtime(path)
+        lines = []
+        for tweet in tweets if isinstance(tweets, list) else []:
+            if not isinstance(tweet, dict):
+                continue
+            try:
+                timestamp = calendar.timegm(time.strptime(tweet["timeTweeted"], "%Y-%m-%dT%H:%M:%S.%fZ"))
+            except (KeyError, TypeError, ValueError):
+                timestamp = fallback
+            lines.append(json.dumps({"action": "tweet", "account": None, "timestamp": timestamp, **tweet}) + "\n")
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as f:
+            f.writelines(lines)
+        os.replace(path, f"{path}.migrated")
+        logger.info(f"Moved {len(lines)} tweets from {os.path.basename(path)} to {os.path.basename(self.path)}.")
+
+    def _window(self, action, account):
+        return self._windows.setdefault((action, account), deque())
+
+    def _prune(self, window, now):
+        cutoff = now - self.window
+        while window and window[0] < cutoff:
+            window.popleft()
+
+    @property
+    def live_count(self):
+        return sum(len(window) for window in self._windows.values())
+
+    def append(self, action, account=None, timestamp=None, **data):
+        """Append an action to the log
+
+        Args:
+            action: Action name (e.g. "tweet", "like", "comment")
+            account: Account that performed the action
+            timestamp: Unix time of the action, defaults to now
+            **data: Extra fields stored with the entry
+        """
+        self._load()
+        timestamp = timestamp or time.time()
+        entry = {"action": action, "account": account, "timestamp": timestamp, **data}
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        self._total_lines += 1
+
+        window = self._window(action, account)
+        window.append(timestamp)
+        self._prune(window, time.time())
+
+        # Rewrite the file once expired lines outnumber live ones
+        if self._total_lines > 1000 and self._total_lines > 2 * self.live_count:
+            self.compact()
+
+    def count(self, action, account=None):
+        """Count the actions inside the window
+
+        Args:
+            action: Action name
+            account: Account that performed the actions
+
+        Returns:
+            int: Number of matching actions in the last `window` seconds
+        """
+        self._load()
+        window = self._window(action, account)
+        self._prune(window, time.time())
+        return len(window)
+
+    def oldest(self, action, account=None):
+        """Get the timestamp of the oldest action inside the window, or None"""
+        self._load()
+        window = self._window(action, account)
+        self._prune(window, time.time())
+        return window[0] if window else None
+
+    def compact(self):
+        """Rewrite the log keeping only the entries inside the window"""
+        self._load()
+        if not os.path.exists(self.path):
+            return
+
+        cutoff = time.time() - self.window
+        live_lines = []
+        with open(self.path, "r") as f:
+            for line in f:
+                parsed = parse_entry(line)
+                if parsed is not None and parsed[2] >= cutoff:
+                    live_lines.append(line)
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(live_lines)
+        os.replace(tmp_path, self.path)
+
+        removed = self._total_lines - len(live_lines)
+        self._total_lines = len(live_lines)
+        for window in self._windows.values():
+            self._prune(window, time.time())
+        if removed:
+            logger.info(f"Removed {removed} expired entries from {os.path.basename(self.path)}.")
+
+# Shared log of tweets and Instagram actions
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+action_log = ActionLog(os.path.join(DATA_DIR, 'actions.jsonl'), legacy_tweets_path=os.path.join(DATA_DIR, 'tweetData.json'))
@@ -0,0 +1,79 @@
+import json
+import os
+import re
+import time
+from config.logger import logger
+from secret import CHECKPOINT_DIR, CHECKPOINT_INTERVAL
+from utils.fileio import atomic_write_json
+
+class CheckpointStore:
+    """Per-account checkpoints of an interaction session
+
+    The interaction loop saves its state (last processed post, processed post keys,
+    counters and comments generated ahead) at most every `interval` seconds and
+    when it stops. Quota usage is not part of it: the action log and the rate
+    limiter already persist it. Each account has one JSON file, replaced atomically,
+    so a crash or a host restart leaves the last complete checkpoint behind. A run
+    started with --resume continues from it instead of re-walking the feed and
+    regenerating comments; a run that finishes deletes its checkpoint.
+    """
+
+    def __init__(self, directory, interval=30, max_age=86400):
+        self.directory = directory
+        self.interval = interval
+        self.max_age = max_age
+        self._saved_at = {}  # account -> time.monotonic() of its last save
+
+    def _path(self, account):
+        safe_account = re.sub(r"[^A-Za-z0-9_.-]", "_", account or "default")
+        return os.path.join(self.directory, f"{safe_account}.json")
+
+    def due(self, account):
+        """Whether the account's last checkpoint is older than the save interval"""
+        saved_at = self._saved_at.get(account)
+        return saved_at is None or time.monotonic() - saved_at >= self.interval
+
+    def save(self, account, state):
+        """Atomically replace the account's checkpoint
+
+        Args:
+            account: Username of the account
+            state: JSON-serializable session state
+        """
+        try:
+            atomic_write_json(self._path(account), {"account": account, "saved_at": time.time(), **state})
+            self._saved_at[account] = time.monotonic()
+        except Exception as error:
+            logger.warning(f"Could not save checkpoint for {account}: {str(error)}")
+
+    def load(self, account):
+        """Get the account's checkpoint
+
+        Returns:
+            dict: The saved state, or None if there is none or it is older than max_age
+        """
+        try:
+            with open(self._path(account), "r") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logger.warning(f"Ignoring unreadable checkpoint for {account}")
+            return None
+
+        age = time.time() - state.get("saved_at", 0)
+        if age > self.max_age:
+            logger.info(f"Ignoring checkpoint for {account} from {age / 3600:.0f} hours ago.")
+            return None
+        return state
+
+    def clear(self, account):
+        """Delete the account's checkpoint once its session has finished"""
+        self._saved_at.pop(account, None)
+        try:
+            os.remove(self._path(account))
+        except FileNotFoundError:
+            pass
+
+# Shared checkpoint store for every account in this process
+checkpoint_store = CheckpointStore(CHECKPOINT_DIR, CHECKPOINT_INTERVAL)
@@ -0,0 +1,42 @@
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, writes are still atomic but unlocked
+    fcntl = None
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on `path + ".lock"` across processes"""
+    if fcntl is None:
+        yield
+        return
+
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def atomic_write_json(path, data):
+    """Write JSON to a temporary file and rename it over `path`
+
+    A crash mid-write leaves the previous file intact instead of a truncated one.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,123 @@
+import os
+import sqlite3
+import threading
+import time
+from config.logger import logger
+from secret import LEDGER_PATH, LEDGER_RETENTION_DAYS
+
+class InteractionLedger:
+    """Persistent record of the posts each account already liked or commented on
+
+    Rows live in SQLite, while every (account, post id, action) inside the retention
+    window is also kept in an in-memory hash index, so `has()` is O(1) and never
+    touches the disk. The database is opened lazily on first use and entries older
+    than the retention window are dropped when it is opened and on `compact()`.
+    `has()` is also called from the threads running WebDriver calls (the feed
+    tracker's skip check), so the database is opened under a lock.
+    """
+
+    def __init__(self, db_path, retention_days=30):
+        self.db_path = db_path
+        self.retention = retention_days * 86400
+        self._connection = None
+        self._connect_lock = threading.Lock()
+        self._actions = set()  # (account, post_id, action)
+        self._posts = set()  # (account, post_id)
+
+    def _connect(self):
+        if self._connection is not None:
+            return self._connection
+
+        with self._connect_lock:
+            if self._connection is not None:
+                return self._connection
+
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.db_path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS interactions ("
+                "account TEXT NOT NULL, post_id TEXT NOT NULL, action TEXT NOT NULL, timestamp REAL NOT NULL, "
+                "PRIMARY KEY (account, post_id, action))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS interactions_timestamp ON interactions (timestamp)")
+            connection.commit()
+
+            # Published only once the index is loaded, so has() never sees it half-built
+            self._compact(connection, vacuum=False)
+            self._connection = connection
+        logger.info(f"Interaction ledger loaded with {len(self._actions)} entries.")
+        return connection
+
+    def _load_index(self, connection):
+        self._actions.clear()
+        self._posts.clear()
+        for account, post_id, action in connection.execute("SELECT account, post_id, action FROM interactions"):
+            self._actions.add((account, post_id, action))
+            self._posts.add((account, post_id))
+
+    def has(self, account, post_id, action=None):
+        """Check if an account already performed an action on a post
+
+        Args:
+            account: Username of the account
+            post_id: Shortcode of the post
+            action: Action name (e.g. "like", "comment"), or None for any action
+
+        Returns:
+            bool: True if the interaction is recorded
+        """
+        self._connect()
+        if action is None:
+            return (account, post_id) in self._posts
+        return (account, post_id, action) in self._actions
+
+    def record(self, account, post_id, action, timestamp=None):
+        """Record that an account performed an action on a post
+
+        Args:
+            account: Username of the account
+            post_id: Shortcode of the post
+            action: Action name (e.g. "like", "comment")
+            timestamp: Unix time of the action, defaults to now
+        """
+        connection = self._connect()
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO interactions (account, post_id, action, timestamp) VALUES (?, ?, ?, ?)",
+                (account, post_id, action, timestamp or time.time()),
+            )
+            connection.commit()
+        except sqlite3.Error as error:
+            logger.error(f"Error recording {action} on post {post_id} in the ledger: {error}")
+            return
+
+        self._actions.add((account, post_id, action))
+        self._posts.add((account, post_id))
+
+    def compact(self, vacuum=True):
+        """Drop entries older than the retention window and rebuild the index
+
+        Args:
+            vacuum: Whether to also reclaim the freed disk space
+        """
+        self._compact(self._connect(), vacuum)
+
+    def _compact(self, connection, vacuum):
+        cutoff = time.time() - self.retention
+        deleted = connection.execute("DELETE FROM interactions WHERE timestamp < ?", (cutoff,)).rowcount
+        connection.commit()
+        if vacuum:
+            connection.execute("VACUUM")
+        if deleted:
+            logger.info(f"Removed {deleted} expired entries from the interaction ledger.")
+        self._load_index(connection)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+# Shared ledger of every account's interactions
+interaction_ledger = InteractionLedger(LEDGER_PATH, LEDGER_RETENTION_DAYS)
@@ -0,0 +1,252 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config.logger import logger
+from utils.fileio import atomic_write_json
+
+# Upper bounds (in seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _percentile(ordered, q):
+    if not ordered:
+        return None
+    # Nearest-rank percentile
+    return ordered[max(1, math.ceil(q / 100 * len(ordered))) - 1]
+
+class Counter:
+    """Monotonic counter"""
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class Histogram:
+    """Bucketed distribution of observed values
+
+    Buckets are cumulative like Prometheus histograms. The most recent samples are
+    also kept (up to `max_samples`) so p50/p95 can be read without a Prometheus server.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, max_samples=2048):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = deque(maxlen=max_samples)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.samples.append(value)
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[index] += 1
+
+    def quantile(self, q):
+        """Get the q-th percentile (0-100) of the recent samples, or None"""
+        return _percentile(sorted(self.samples), q)
+
+class MetricsRegistry:
+    """In-process counters and histograms with Prometheus and JSON exports
+
+    Metrics are identified by a name and a set of labels, and created on first use.
+    `span()` times a block of code into the `stage_duration_seconds` histogram, which
+    is how the Instagram loop reports where each post's time goes. The registry can
+    be scraped over HTTP in the Prometheus text format (`serve()`) or dumped to a JSON
+    file periodically (`run_dump()`).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # name -> {label key: Counter}
+        self._histograms = {}  # name -> {label key: Histogram}
+        self._help = {}
+        self._server = None
+
+    def counter(self, name, help="", **labels):
+        """Get (or create) the counter with this name and labels"""
+        with self._lock:
+            if help:
+                self._help.setdefault(name, help)
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = Counter()
+            return series[key]
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS, **labels):
+        """Get (or create) the histogram with this name and labels"""
+        with self._lock:
+            if help:
+                self._help.setdefault(name, help)
+            series = self._histograms.setdefault(name, {})
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = Histogram(buckets)
+            return series[key]
+
+    @contextmanager
+    def span(self, stage, **labels):
+        """Time a block of code as one occurrence of a stage
+
+        The duration is recorded with an `outcome` label of "ok", or "error" when the
+        block raised (the exception is re-raised).
+
+        Args:
+            stage: Stage name (e.g. "login", "like", "typing")
+            **labels: Extra labels such as the account
+        """
+        started = time.monotonic()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException:
+            outcome = "error"
+            raise
+        finally:
+            self.histogram("stage_duration_seconds", "Duration of each stage of the bot",
+                           stage=stage, outcome=outcome, **labels).observe(time.monotonic() - started)
+
+    def summarize(self, name, by, **filters):
+        """Get count, p50 and p95 of a histogram, merging its series by one label
+
+        Args:
+            name: Histogram name
+            by: Label whose values group the series (e.g. "stage")
+            **filters: Label values a series must have to be included
+
+        Returns:
+            dict: label value -> {"count", "p50", "p95"}
+        """
+        filters = {label: str(value) for label, value in filters.items()}
+        samples = {}
+        with self._lock:
+            for key, histogram in self._histograms.get(name, {}).items():
+                labels = dict(key)
+                if any(labels.get(label) != value for label, value in filters.items()):
+                    continue
+                samples.setdefault(labels.get(by), []).extend(histogram.samples)
+        summary = {}
+        for group, values in samples.items():
+            ordered = sorted(values)
+            summary[group] = {"count": len(ordered), "p50": _percentile(ordered, 50), "p95": _percentile(ordered, 95)}
+        return summary
+
+    def stage_summary(self, outcome="ok"):
+        """Get count, p50 and p95 of every stage across accounts"""
+        return self.summarize("stage_duration_seconds", "stage", outcome=outcome)
+
+    def snapshot(self):
+        """Get every metric as JSON-serializable data"""
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "counters": {
+                    name: [{"labels": dict(key), "value": counter.value} for key, counter in series.items()]
+                    for name, series in self._counters.items()
+                },
+                "histograms": {
+                    name: [{
+                        "labels": dict(key),
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "p50": histogram.quantile(50),
+                        "p95": histogram.quantile(95),
+                    } for key, histogram in series.items()]
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def render_prometheus(self):
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, counter in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {counter.value}")
+
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    for bound, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', f'{bound:g}')])} {bucket_count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump_json(self, path):
+        """Atomically write a snapshot of every metric to a JSON file"""
+        atomic_write_json(path, self.snapshot())
+
+    async def run_dump(self, path, interval=60):
+        """Dump the metrics to a JSON file every `interval` seconds until cancelled"""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    self.dump_json(path)
+                except Exception as error:
+                    logger.warning(f"Could not dump metrics: {str(error)}")
+        finally:
+            # Leave the final numbers behind when the run stops
+            try:
+                self.dump_json(path)
+            except Exception as error:
+                logger.warning(f"Could not dump metrics: {str(error)}")
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve the Prometheus text format on http://host:port/metrics from a background thread"""
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                payload = registry.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{self._server.server_port}/metrics")
+        return self._server.server_port
+
+    def shutdown(self):
+        """Stop the metrics endpoint"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+# Shared registry for every account and the agent
+metrics = MetricsRegistry()
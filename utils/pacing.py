@@ -0,0 +1,91 @@
+import asyncio
+import random
+import time
+from config.logger import logger
+
+class Pacer:
+    """Awaitable delays on one shared clock so pauses never block the event loop
+
+    Every wait is an asyncio wait, so other coroutines (LLM calls, other accounts,
+    telemetry flushes) keep running while the bot is idling between actions.
+    Calling cancel() wakes every pending wait at once, which is how a run is
+    stopped without waiting out its remaining delays. Every delay is multiplied by
+    `scale`, which the offline benchmark sets to 0 to measure the bot without its
+    humanizing pauses.
+    """
+
+    def __init__(self, clock=time.monotonic, scale=1.0):
+        self.clock = clock
+        self.scale = scale
+        self.started_at = clock()
+        self.total_waited = 0.0
+        self._cancel_event = None
+
+    def _event(self):
+        # Created lazily so the event belongs to the loop started by asyncio.run()
+        if self._cancel_event is None:
+            self._cancel_event = asyncio.Event()
+        return self._cancel_event
+
+    def now(self):
+        """Returns the current time of the shared clock"""
+        return self.clock()
+
+    def elapsed(self):
+        """Returns the seconds elapsed since the pacer was created"""
+        return self.clock() - self.started_at
+
+    @property
+    def cancelled(self):
+        return self._cancel_event is not None and self._cancel_event.is_set()
+
+    def cancel(self):
+        """Wake every pending wait and make further waits return immediately"""
+        self._event().set()
+
+    def reset(self):
+        """Allow waits again after a cancel()"""
+        if self._cancel_event is not None:
+            self._cancel_event.clear()
+
+    async def sleep(self, seconds):
+        """Wait for the given number of seconds without blocking the event loop
+
+        Args:
+            seconds: Number of seconds to wait
+
+        Returns:
+            bool: True if the full delay elapsed, False if the wait was cancelled
+        """
+        seconds *= self.scale
+        if seconds <= 0:
+            return not self.cancelled
+
+        event = self._event()
+        if event.is_set():
+            return False
+
+        started = self.clock()
+        try:
+            await asyncio.wait_for(event.wait(), timeout=seconds)
+            logger.debug("Pacing wait cancelled.")
+            return False
+        except asyncio.TimeoutError:
+            return True
+        finally:
+            self.total_waited += self.clock() - started
+
+    async def jitter(self, low, high):
+        """Wait for a random delay between low and high seconds
+
+        Args:
+            low: Minimum delay in seconds
+            high: Maximum delay in seconds
+
+        Returns:
+            bool: True if the full delay elapsed, False if the wait was cancelled
+        """
+        return await self.sleep(random.uniform(low, high))
+
+# Shared pacer used by the Instagram client and the agent
+pacer = Pacer()
@@ -0,0 +1,206 @@
+import asyncio
+import json
+import os
+import re
+import time
+from config.logger import logger
+from secret import RATE_LIMIT_DIR, RATE_LIMIT_BUDGETS
+from utils.pacing import pacer
+from utils.fileio import file_lock, atomic_write_json
+
+class SlidingWindow:
+    """Allow at most `limit` actions in any `window` seconds"""
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self.name = f"window_{limit}_per_{window}s"
+
+    def wait_time(self, state, now):
+        timestamps = [timestamp for timestamp in (state or []) if timestamp > now - self.window]
+        if len(timestamps) < self.limit:
+            return 0
+        # Wait until enough of the oldest actions leave the window
+        return timestamps[len(timestamps) - self.limit] + self.window - now
+
+    def consume(self, state, now):
+        timestamps = [timestamp for timestamp in (state or []) if timestamp > now - self.window]
+        timestamps.append(now)
+        return timestamps
+
+class TokenBucket:
+    """Allow bursts of up to `capacity` actions, refilled at `rate` actions per second"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.name = f"bucket_{capacity}_at_{rate:g}_per_s"
+
+    def _tokens(self, state, now):
+        if not state:
+            return float(self.capacity)
+        return min(self.capacity, state["tokens"] + (now - state["updated"]) * self.rate)
+
+    def wait_time(self, state, now):
+        tokens = self._tokens(state, now)
+        if tokens >= 1:
+            return 0
+        return (1 - tokens) / self.rate
+
+    def consume(self, state, now):
+        return {"tokens": self._tokens(state, now) - 1, "updated": now}
+
+def build_policies(budgets):
+    """Build the policies of each action from its budget
+
+    Args:
+        budgets: Dict of action -> {"per_hour", "burst", "per_day"}
+
+    Returns:
+        dict: Action -> list of policies (a token bucket and a 24 hour window)
+    """
+    return {
+        action: [TokenBucket(rate=budget["per_hour"] / 3600, capacity=budget["burst"]),
+                 SlidingWindow(budget["per_day"], 86400)]
+        for action, budget in budgets.items()
+    }
+
+# Default budgets per account (RATE_LIMIT_* settings)
+DEFAULT_POLICIES = build_policies(RATE_LIMIT_BUDGETS)
+
+class RateLimiter:
+    """Rate limits per (account, action type), shared by every process on the host
+
+    The state of each (account, action) pair lives in a small JSON file that is only
+    read and written under an exclusive file lock, so concurrent runs of the same
+    account never exceed its budget together. An action is allowed only when every
+    policy configured for it allows it.
+    """
+
+    def __init__(self, state_dir, policies=None):
+        self.state_dir = state_dir
+        self.policies = policies if policies is not None else DEFAULT_POLICIES
+        self.account_policies = {}  # username -> policies overriding self.policies
+
+    def configure(self, account):
+        """Apply the budgets of an account's roster entry
+
+        A `"rate_limits"` object in the entry overrides single fields of the default
+        budgets, e.g. `{"comment": {"per_hour": 10, "burst": 2}}`.
+
+        Args:
+            account: Account dict from the roster
+        """
+        overrides = account.get("rate_limits")
+        if not overrides:
+            self.account_policies.pop(account["username"], None)
+            return
+        budgets = {action: {**budget, **overrides.get(action, {})} for action, budget in RATE_LIMIT_BUDGETS.items()}
+        self.account_policies[account["username"]] = build_policies(budgets)
+
+    def _policies(self, account, action):
+        return self.account_policies.get(account, self.policies).get(action)
+
+    def _state_path(self, account, action):
+        safe_account = re.sub(r"[^A-Za-z0-9_.-]", "_", account or "default")
+        return os.path.join(self.state_dir, f"{safe_account}_{action}.json")
+
+    def _load_state(self, path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def wait_time(self, account, action):
+        """Get the seconds until the action fits the account's budget, without taking it"""
+        policies = self._policies(account, action)
+        if not policies:
+            return 0
+        state = self._load_state(self._state_path(account, action))
+        now = time.time()
+        return max(policy.wait_time(state.get(policy.name), now) for policy in policies)
+
+    def try_acquire(self, account, action):
+        """Take one action from the budget if every policy allows it now
+
+        Blocks on the state file's lock; from the event loop, call it through
+        asyncio.to_thread().
+
+        Args:
+            account: Username of the account
+            action: Action type (e.g. "like", "comment")
+
+        Returns:
+            float: 0 if the action was acquired, otherwise the seconds to wait
+        """
+        policies = self._policies(account, action)
+        if not policies:
+            return 0
+
+        path = self._state_path(account, action)
+        os.makedirs(self.state_dir, exist_ok=True)
+        with file_lock(path):
+            state = self._load_state(path)
+            now = time.time()
+            wait = max(policy.wait_time(state.get(policy.name), now) for policy in policies)
+            if wait > 0:
+                return wait
+
+            for policy in policies:
+                state[policy.name] = policy.consume(state.get(policy.name), now)
+            atomic_write_json(path, state)
+            return 0
+
+    async def acquire(self, account, action, max_wait=None):
+        """Wait until the action fits the account's budget, then take it
+
+        Args:
+            account: Username of the account
+            action: Action type (e.g. "like", "comment")
+            max_wait: Give up instead of waiting longer than this many seconds
+
+        Returns:
+            bool: True if the action was acquired, False if waiting was abandoned
+        """
+        while True:
+            wait = await asyncio.to_thread(self.try_acquire, account, action)
+            if wait == 0:
+                return True
+            if max_wait is not None and wait > max_wait:
+                logger.warning(f"{action} budget of {account} exhausted for the next {wait:.0f} seconds.")
+                return False
+
+            logger.info(f"{action} budget of {account} reached, waiting {wait:.1f} seconds...")
+            if not await pacer.sleep(wait):
+                return False
+
+    async def wait_available(self, account, action, max_wait=None):
+        """Wait until the action fits the account's budget, without taking it
+
+        Lets a caller do the expensive preparation of an action (e.g. generating a
+        comment) only when it can be performed, and take the budget with try_acquire()
+        once it actually is.
+
+        Args:
+            account: Username of the account
+            action: Action type (e.g. "like", "comment")
+            max_wait: Give up instead of waiting longer than this many seconds
+
+        Returns:
+            bool: True if the action fits the budget now, False if waiting was abandoned
+        """
+        while True:
+            wait = await asyncio.to_thread(self.wait_time, account, action)
+            if wait == 0:
+                return True
+            if max_wait is not None and wait > max_wait:
+                logger.warning(f"{action} budget of {account} exhausted for the next {wait:.0f} seconds.")
+                return False
+
+            logger.info(f"{action} budget of {account} reached, waiting {wait:.1f} seconds...")
+            if not await pacer.sleep(wait):
+                return False
+
+# Shared rate limiter for every account in this process (and other processes on the host)
+rate_limiter = RateLimiter(RATE_LIMIT_DIR)
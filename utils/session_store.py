@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+import time
+from config.logger import logger
+from secret import IG_BASE_URL
+from utils.fileio import atomic_write_json, file_lock
+
+def normalize_cookie(cookie):
+    """Return a copy of a cookie with its expiry as an integer `expiry` field
+
+    Cookies saved by Selenium use `expiry`, older cookie files use `expires`.
+    """
+    cookie = dict(cookie)
+    expires = cookie.pop('expires', None)
+    if cookie.get('expiry') is None and expires is not None:
+        cookie['expiry'] = expires
+    if cookie.get('expiry') is not None:
+        try:
+            cookie['expiry'] = int(cookie['expiry'])
+        except (ValueError, TypeError):
+            del cookie['expiry']
+    return cookie
+
+class SessionStore:
+    """In-memory cache of each account's cookies, backed by atomic cookie files
+
+    Each cookie file is read at most once per process; validity checks use the cached
+    sessionid expiry. Writes go through a temporary file and a rename under a file
+    lock, so concurrent processes never see a truncated file. Cookies are injected
+    into the browser in bulk through CDP.
+    """
+
+    def __init__(self):
+        self._sessions = {}  # cookies path -> list of normalized cookies
+
+    async def load(self, cookies_path):
+        """Load an account's cookies, reading the file only the first time
+
+        Args:
+            cookies_path: Path of the account's cookie file
+
+        Returns:
+            list: Normalized cookies, or an empty list if there are none
+        """
+        cookies = self._sessions.get(cookies_path)
+        if cookies is not None:
+            return cookies
+
+        cookies = []
+        try:
+            if os.path.exists(cookies_path):
+                with open(cookies_path, "r") as f:
+                    cookies = [normalize_cookie(cookie) for cookie in json.load(f)]
+        except Exception as error:
+            logger.error(f"Cookies file does not exist or cannot be read: {error}")
+
+        self._sessions[cookies_path] = cookies
+        return cookies
+
+    async def has_valid_session(self, cookies_path):
+        """Check if an account has a sessionid cookie that has not expired
+
+        Args:
+            cookies_path: Path of the account's cookie file
+
+        Returns:
+            bool: True if the session cookie exists and is valid, False otherwise
+        """
+        cookies = await self.load(cookies_path)
+        session_id_cookie = next((cookie for cookie in cookies if cookie.get('name') == 'sessionid'), None)
+        if not session_id_cookie or session_id_cookie.get('expiry') is None:
+            return False
+        return session_id_cookie['expiry'] > int(time.time())
+
+    async def save(self, cookies_path, cookies):
+        """Atomically save an account's cookies and update the cache
+
+        Args:
+            cookies_path: Path of the account's cookie file
+            cookies: Cookies to save
+        """
+        try:
+            with file_lock(cookies_path):
+                atomic_write_json(cookies_path, cookies)
+        except Exception as error:
+            logger.error(f"Error saving cookies: {error}")
+            raise Exception("Failed to save cookies.")
+
+        self._sessions[cookies_path] = [normalize_cookie(cookie) for cookie in cookies]
+        logger.info("Cookies saved successfully.")
+
+    def invalidate(self, cookies_path):
+        """Forget the cached cookies of an account"""
+        self._sessions.pop(cookies_path, None)
+
+    async def inject(self, browser, cookies_path, url=IG_BASE_URL):
+        """Set an account's cookies in the browser with a single CDP call
+
+        Falls back to adding the cookies one by one (which needs the browser to be on
+        the cookies' domain) when CDP is not available.
+
+        Args:
+            browser: Selenium WebDriver instance
+            cookies_path: Path of the account's cookie file
+            url: Page to open before the per-cookie fallback
+        """
+        cookies = await self.load(cookies_path)
+        cdp_cookies = []
+        for cookie in cookies:
+            cdp_cookie = {
+                'name': cookie['name'],
+                'value': cookie['value'],
+                'domain': cookie['domain'],
+                'path': cookie.get('path', '/'),
+                'secure': cookie.get('secure', False),
+                'httpOnly': cookie.get('httpOnly', False),
+            }
+            if cookie.get('sameSite') in ('Strict', 'Lax', 'None'):
+                cdp_cookie['sameSite'] = cookie['sameSite']
+            if cookie.get('expiry') is not None:
+                cdp_cookie['expires'] = cookie['expiry']
+            cdp_cookies.append(cdp_cookie)
+
+        try:
+            await asyncio.to_thread(browser.execute_cdp_cmd, "Network.setCookies", {"cookies": cdp_cookies})
+            return
+        except Exception as error:
+            logger.warning(f"Could not set cookies through CDP, adding them one by one: {str(error)}")
+
+        # Navigate to the cookies' domain first (required to set cookies)
+        await asyncio.to_thread(browser.get, url)
+        for cookie in cookies:
+            # Some cookie attributes might cause issues, so we only set the essential ones
+            cookie_dict = {
+                'name': cookie['name'],
+                'value': cookie['value'],
+                'domain': cookie['domain'],
+                'path': cookie.get('path', '/'),
+            }
+            if cookie.get('expiry') is not None:
+                cookie_dict['expiry'] = cookie['expiry']
+            await asyncio.to_thread(browser.add_cookie, cookie_dict)
+
+# Shared session store used by every account
+session_store = SessionStore()